@@ -0,0 +1,119 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Runtime configuration, overridable with CRIBBAGE_* environment variables."""
+
+    model_config = SettingsConfigDict(env_prefix="CRIBBAGE_")
+
+    # SQLAlchemy URLs; default to SQLite files under data/
+    database_url: str | None = None
+    archive_database_url: str | None = None
+    # Process-private in-memory databases (for tests and benchmarks); ignores
+    # the URLs above and loses everything on exit
+    database_in_memory: bool = False
+    # Games spread over this many SQLite databases by a hash of their code,
+    # each with its own write lock (1 keeps the single file). The game URL
+    # gets the shard number appended to its file name, or put in place of
+    # "{shard}". Choose it before the first game: changing it moves nothing.
+    database_shards: int = 1
+
+    # SQLite storage profile, applied to every connection
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_busy_timeout_ms: float = 5000.0
+    sqlite_cache_size_kb: int = 64 * 1024
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    # Connections kept per pool (writes, GET endpoints, archive); as many
+    # again may be opened under load
+    sqlite_pool_size: int = 8
+    # Seconds between PRAGMA optimize runs
+    sqlite_optimize_interval: float = 3600.0
+
+    # WebSocket heartbeat: seconds between server pings, and how long a socket
+    # may stay silent before it is treated as dead and reaped.
+    ws_ping_interval: float = 20.0
+    ws_idle_timeout: float = 60.0
+    ws_reap_batch_size: int = 200
+    # Games with no connect or game message for this long are hibernated:
+    # their sockets closed (code 4003) and in-process state dropped until a
+    # player comes back. 0 disables.
+    hibernate_after_minutes: float = 30.0
+    ws_max_connections: int = 10_000
+    # Per-connection token bucket: frames a second on average, and how many
+    # may arrive at once. Frames over the limit are refused unprocessed.
+    ws_rate_limit: float = 10.0
+    ws_rate_burst: int = 20
+
+    # Graceful restart: on SIGTERM, seconds to wait for running actions and
+    # the window clients are told to spread their reconnects over; on
+    # startup, games played within prewarm_minutes are loaded (0 disables)
+    drain_timeout: float = 10.0
+    drain_reconnect_window: float = 10.0
+    prewarm_minutes: float = 30.0
+
+    # Spectators: frames buffered per spectator before it is resynced from a
+    # snapshot instead, and the audience cap per game.
+    spectator_queue_size: int = 64
+    spectator_max_per_game: int = 1000
+
+    # Session tokens accepted per /api/games/active request
+    active_games_max_tokens: int = 200
+
+    # Game codes whose serialized GameInfo is kept for conditional GETs
+    game_info_cache_size: int = 10_000
+
+    # Archival: how often the job runs and how many games it moves per batch.
+    # Finished games (and ones abandoned in play) are archived after a grace
+    # period (so the final score screen still loads), waiting games once
+    # abandoned past the TTL. Archived games are purged after the retention
+    # period; 0 keeps them forever.
+    archive_enabled: bool = True
+    archive_interval: float = 300.0
+    archive_batch_size: int = 100
+    archive_finished_after_minutes: float = 60.0
+    archive_waiting_ttl_hours: float = 24.0
+    archive_retention_days: float = 365.0
+
+    # Group commit: WebSocket actions share one writer transaction, committed
+    # once per window or when max_batch actions are waiting on it. Ignored
+    # with database_shards above 1.
+    group_commit_enabled: bool = False
+    group_commit_window_ms: float = 3.0
+    group_commit_max_batch: int = 64
+
+    # Times an action is re-run after losing a race on its game's version
+    # before the client is told to retry
+    action_conflict_retries: int = 3
+
+    # Turn clocks: seconds a player has to discard, cut or play before the
+    # server moves for them (0 disables), and how many clock moves in a row,
+    # with nobody connected, abandon the game. The clocks share one timer
+    # wheel ticking every timer_wheel_tick seconds.
+    turn_clock_seconds: float = 0.0
+    turn_clock_abandon_moves: int = 12
+    timer_wheel_tick: float = 0.5
+
+    # Tables one bulk provisioning request (or tournament round) may create
+    bulk_tables_max: int = 2000
+
+    # POST /api/analyze: hands per request, canonical hands cached, and the
+    # work (in hand scores; a 6-card deal is 690) a batch's cache misses may
+    # take on the event loop before going to a pool of analyze_workers
+    # processes (default: one per core; 0 keeps everything inline)
+    analyze_max_hands: int = 200
+    analyze_cache_size: int = 50_000
+    analyze_inline_max: int = 1000
+    analyze_workers: int | None = None
+
+    # Admin endpoints require this value in X-Admin-Token; unset disables them
+    admin_token: str | None = None
+    # Where sampled profiles are written; defaults to data/profiles
+    profile_dir: str | None = None
+
+    # Span tracing to a JSON-lines file; defaults to data/traces.jsonl
+    trace_enabled: bool = False
+    trace_file: str | None = None
+
+
+settings = Settings()
@@ -1,25 +1,183 @@
+import asyncio
+import logging
+import sqlite3
+
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from pathlib import Path
 
+from .config import settings
+from .sharding import SHARD_IDS, shard_url, sharded_sessionmaker, token_index
+
+logger = logging.getLogger(__name__)
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
-DATABASE_URL = f"sqlite+aiosqlite:///{DATA_DIR}/cribbage.db"
+# Games spread over this many databases; see sharding.py
+SHARDED = len(SHARD_IDS) > 1
+if settings.database_in_memory:
+    # memdb databases are shared by name across the process's connections
+    # and live as long as one of them is open, so keep one open for good.
+    # Unlike shared-cache :memory:, they honour busy_timeout.
+    _game_db = "cribbage-{shard}" if SHARDED else "cribbage"
+    DATABASE_URL = f"sqlite+aiosqlite:///file:/{_game_db}?vfs=memdb&uri=true"
+    ARCHIVE_DATABASE_URL = "sqlite+aiosqlite:///file:/cribbage-archive?vfs=memdb&uri=true"
+    _memdb_anchors = [
+        sqlite3.connect(f"file:/{name}?vfs=memdb", uri=True, check_same_thread=False)
+        for name in (
+            *(_game_db.format(shard=shard) for shard in SHARD_IDS),
+            "cribbage-archive",
+        )
+    ]
+else:
+    DATABASE_URL = settings.database_url or f"sqlite+aiosqlite:///{DATA_DIR}/cribbage.db"
+    # Finished games move here so the hot tables only hold live games
+    ARCHIVE_DATABASE_URL = (
+        settings.archive_database_url or f"sqlite+aiosqlite:///{DATA_DIR}/archive.db"
+    )
+
+
+def configure_sqlite(engine, read_only: bool = False):
+    """Apply the storage profile to every new connection of ``engine``."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the writer; NORMAL only fsyncs at
+        # checkpoints, which in WAL mode is still safe against corruption.
+        # memdb ignores the journal mode and keeps its own.
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA cache_size={-int(settings.sqlite_cache_size_kb)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
 
-engine = create_async_engine(DATABASE_URL, echo=False)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+def create_engine(url: str, read_only: bool = False):
+    # aiosqlite defaults to NullPool, opening (and configuring) a fresh
+    # connection for every session; keep them instead
+    engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.sqlite_pool_size,
+        max_overflow=settings.sqlite_pool_size,
+    )
+    configure_sqlite(engine, read_only)
+    return engine
+
+
+if SHARDED:
+    # One engine (and so one write lock) per shard, behind sessions that
+    # route each statement to the shards it can touch
+    engines = {shard: create_engine(shard_url(DATABASE_URL, shard)) for shard in SHARD_IDS}
+    async_session = sharded_sessionmaker(engines)
+    read_session = sharded_sessionmaker({
+        shard: create_engine(shard_url(DATABASE_URL, shard), read_only=True)
+        for shard in SHARD_IDS
+    })
+else:
+    engine = create_engine(DATABASE_URL)
+    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    # Separate pool for GET endpoints, so reads never queue for a connection
+    # behind writes and can't write by accident
+    read_engine = create_engine(DATABASE_URL, read_only=True)
+    read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+    engines = {SHARD_IDS[0]: engine}
+
+archive_engine = create_engine(ARCHIVE_DATABASE_URL)
+archive_session = async_sessionmaker(
+    archive_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
 class Base(DeclarativeBase):
     pass
 
 
+class ArchiveBase(DeclarativeBase):
+    pass
+
+
+def _add_missing_columns(conn):
+    """create_all never alters existing tables, so add new columns by hand.
+
+    New columns must be nullable (existing rows get NULL) or carry an
+    integer/boolean default.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+            ddl += column.type.compile(dialect=conn.dialect)
+            if not column.nullable and column.default is not None and column.default.is_scalar:
+                ddl += f" NOT NULL DEFAULT {int(column.default.arg)}"
+            conn.exec_driver_sql(ddl)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
 async def init_db():
     from . import models  # noqa: F401
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    for target in engines.values():
+        async with target.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_add_missing_columns)
+    async with archive_engine.begin() as conn:
+        await conn.run_sync(ArchiveBase.metadata.create_all)
+    if SHARDED:
+        await token_index.load(engines)
 
 
 async def get_session():
     async with async_session() as session:
         yield session
+
+
+async def get_read_session():
+    async with read_session() as session:
+        yield session
+
+
+async def optimize_db():
+    """Refresh the query planner's statistics.
+
+    A database that has never been analyzed gets a full ANALYZE; after that
+    ``PRAGMA optimize`` only re-analyzes tables whose statistics look stale.
+    """
+    for target in (*engines.values(), archive_engine):
+        if target.dialect.name != "sqlite":
+            continue
+        async with target.connect() as conn:
+            result = await conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if result.first() is None:
+                await conn.exec_driver_sql("ANALYZE")
+            await conn.exec_driver_sql("PRAGMA optimize")
+            await conn.commit()
+
+
+async def run_optimizer():
+    """Periodically keep the planner's statistics current."""
+    while True:
+        await asyncio.sleep(settings.sqlite_optimize_interval)
+        try:
+            await optimize_db()
+        except Exception:
+            logger.exception("Database optimize failed")
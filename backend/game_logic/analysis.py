@@ -0,0 +1,105 @@
+"""Hand analysis for the analyzer API: scores, averages over the cut, and
+discard rankings.
+
+Analyses only depend on cards up to a renaming of suits, so requests are
+reduced to a canonical form first (``canonical``), analyzed there, and
+the result's cards renamed back (``relabel``). Everything here is pure
+and picklable, so it can run in worker processes.
+"""
+from itertools import combinations, permutations
+from math import comb
+
+from .deck import SUITS, create_deck
+from .scoring import count_fifteens, count_pairs, score_hand
+
+DECK = create_deck()
+CARDS = frozenset(DECK)
+
+
+def validate(cards: list[str], cut: str | None) -> None:
+    if len(cards) not in (4, 5, 6):
+        raise ValueError("A hand has 4 cards, or 5 or 6 for a deal to discard from")
+    unknown = [card for card in cards + ([cut] if cut else []) if card not in CARDS]
+    if unknown:
+        raise ValueError(f"Unknown cards: {', '.join(unknown)}")
+    if len(set(cards)) != len(cards) or cut in cards:
+        raise ValueError("A card appears twice")
+
+
+def canonical(cards: list[str], cut: str | None) -> tuple[tuple[tuple[str, ...], str | None], dict[str, str]]:
+    """The suit renaming of (cards, cut) that sorts first, and the map from
+    its suits back to the caller's."""
+    present = sorted({card[1] for card in cards + ([cut] if cut else [])})
+    best = None
+    for names in permutations(SUITS, len(present)):
+        rename = dict(zip(present, names))
+        key = (
+            tuple(sorted(card[0] + rename[card[1]] for card in cards)),
+            cut[0] + rename[cut[1]] if cut else None,
+        )
+        if best is None or key < best[0]:
+            best = (key, rename)
+    key, rename = best
+    return key, {new: old for old, new in rename.items()}
+
+
+def relabel(result, suits: dict[str, str]):
+    """A copy of ``result`` with every card's suit mapped through ``suits``."""
+    if isinstance(result, dict):
+        return {key: relabel(value, suits) for key, value in result.items()}
+    if isinstance(result, list):
+        return [relabel(value, suits) for value in result]
+    if isinstance(result, str) and result in CARDS:
+        return result[0] + suits[result[1]]
+    return result
+
+
+def cost(cards: int, cut: bool) -> int:
+    """Roughly how many hand scores an analysis takes."""
+    return comb(cards, 4) * (1 if cut else 52 - cards)
+
+
+def analyze(cards: tuple[str, ...], cut: str | None, is_crib: bool) -> dict:
+    """Score four cards with a cut, average them over every cut, or rank
+    each way of discarding from a five- or six-card deal.
+
+    For a deal, ``is_crib`` means the crib is the player's own, so points
+    the thrown cards make together count for rather than against a keep.
+    """
+    if len(cards) == 4:
+        if cut:
+            return {"kind": "score", "score": score_hand(list(cards), cut, is_crib)}
+        totals = _totals(list(cards), cards, is_crib)
+        return {
+            "kind": "average",
+            "average": round(sum(totals) / len(totals), 3),
+            "min": min(totals),
+            "max": max(totals),
+        }
+
+    sign = 1 if is_crib else -1
+    discards = []
+    for keep in combinations(cards, 4):
+        thrown = [card for card in cards if card not in keep]
+        totals = _totals(list(keep), cards, False, cut)
+        average = sum(totals) / len(totals)
+        crib_points = count_fifteens(thrown) * 2 + count_pairs(thrown) * 2
+        discards.append({
+            "keep": list(keep),
+            "discard": thrown,
+            "average": round(average, 3),
+            "crib_points": crib_points,
+            "value": round(average + sign * crib_points, 3),
+        })
+    discards.sort(key=lambda d: -d["value"])
+    return {"kind": "discard", "discards": discards}
+
+
+def _totals(keep: list[str], seen: tuple[str, ...], is_crib: bool, cut: str | None = None) -> list[int]:
+    cuts = [cut] if cut else [card for card in DECK if card not in seen]
+    return [score_hand(keep, c, is_crib)["total"] for c in cuts]
+
+
+def analyze_many(requests: list[tuple[tuple[str, ...], str | None, bool]]) -> list[dict]:
+    """``analyze`` over a list of (cards, cut, is_crib), for a worker process."""
+    return [analyze(*request) for request in requests]
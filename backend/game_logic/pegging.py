@@ -95,6 +95,37 @@ def score_peg_runs(cards: list[str]) -> int:
     return 0
 
 
+def replay_peg_points(peg_history: list[dict], complete: bool = True) -> dict[int, int]:
+    """
+    Rebuild pegging points per seat from a round's peg history.
+    Mirrors the live rules: "reset" entries mark a 31 or an all-Go (which
+    pays the last player a Go point), and the final card pays 1 unless 31.
+    Pass ``complete=False`` for a round still being pegged, whose last card
+    so far has not earned that point.
+    """
+    points: dict[int, int] = {}
+    sequence: list[str] = []
+    count = 0
+    last_seat = None
+
+    for entry in peg_history:
+        if "card" in entry:
+            result = score_peg_play(sequence, entry["card"])
+            points[entry["seat"]] = points.get(entry["seat"], 0) + result["points"]
+            sequence.append(entry["card"])
+            count = result["new_count"]
+            last_seat = entry["seat"]
+        elif entry.get("type") == "reset":
+            if count != 31 and last_seat is not None:
+                points[last_seat] = points.get(last_seat, 0) + score_go()
+            sequence = []
+            count = 0
+
+    if complete and sequence and count != 31 and last_seat is not None:
+        points[last_seat] = points.get(last_seat, 0) + score_last_card()
+    return points
+
+
 def score_last_card() -> int:
     """Last card played (not 31) = 1 point"""
     return 1
@@ -1,51 +1,133 @@
-from itertools import combinations
-from collections import Counter
-from .deck import card_value, card_rank_order
+from .deck import card_value, card_rank_order, create_deck
+
+# Cards are scored by position: bit i of a mask stands for cards[i]. For
+# each input size, every subset of two to five positions (26 of them for a
+# hand plus cut), the positions in each, and the run candidates (three or
+# more positions) longest first. Built up to a hand plus cut at import and
+# grown on demand for longer inputs.
+SUBSETS: dict[int, list[int]] = {}
+POSITIONS: list[tuple[int, ...]] = []
+SIZES: list[int] = []
+# Each mask is built from the mask without its lowest position
+LOWEST: list[int] = []
+REST: list[int] = []
+PAIR_MASKS: dict[int, list[int]] = {}
+RUN_MASKS: dict[int, list[int]] = {}
+CARD_VALUES = {card: card_value(card) for card in create_deck()}
+RANK_BITS = {card: 1 << card_rank_order(card) for card in create_deck()}
+
+
+def _grow_tables(n: int):
+    """Extend the mask tables to inputs of up to ``n`` cards."""
+    for mask in range(len(SIZES), 1 << n):
+        POSITIONS.append(tuple(i for i in range(mask.bit_length()) if mask >> i & 1))
+        SIZES.append(mask.bit_count())
+        LOWEST.append((mask & -mask).bit_length() - 1)
+        REST.append(mask & (mask - 1))
+    for size in range(len(SUBSETS), n + 1):
+        SUBSETS[size] = [mask for mask in range(1 << size) if 2 <= mask.bit_count() <= 5]
+        PAIR_MASKS[size] = [mask for mask in SUBSETS[size] if mask.bit_count() == 2]
+        RUN_MASKS[size] = sorted(
+            (mask for mask in range(1 << size) if mask.bit_count() >= 3),
+            key=lambda mask: -mask.bit_count(),
+        )
+
+
+_grow_tables(5)
 
 
 def score_hand(hand: list[str], cut_card: str, is_crib: bool = False) -> dict:
     """
     Score a 4-card hand with the cut card.
-    Returns breakdown: { fifteens, pairs, runs, flush, nobs, total }
+    Returns breakdown: { fifteens, pairs, runs, flush, nobs, total, groups },
+    where groups lists the cards behind each category's points.
     """
     all_cards = hand + [cut_card]
+    sums, rank_masks = subset_tables(all_cards)
 
-    fifteens = count_fifteens(all_cards)
-    pairs = count_pairs(all_cards)
-    runs = count_runs(all_cards)
+    fifteens = _fifteen_masks(all_cards, sums)
+    pairs = _pair_masks(all_cards, rank_masks)
+    runs = _run_masks(all_cards, rank_masks)
     flush = count_flush(hand, cut_card, is_crib)
     nobs = count_nobs(hand, cut_card)
+    run_points = sum(SIZES[mask] for mask in runs)
+
+    def cards(masks):
+        return [[all_cards[i] for i in POSITIONS[mask]] for mask in masks]
 
     return {
-        "fifteens": fifteens * 2,
-        "pairs": pairs * 2,
-        "runs": runs,
+        "fifteens": len(fifteens) * 2,
+        "pairs": len(pairs) * 2,
+        "runs": run_points,
         "flush": flush,
         "nobs": nobs,
-        "total": fifteens * 2 + pairs * 2 + runs + flush + nobs,
+        "total": len(fifteens) * 2 + len(pairs) * 2 + run_points + flush + nobs,
+        "groups": {
+            "fifteens": cards(fifteens),
+            "pairs": cards(pairs),
+            "runs": cards(runs),
+            "flush": all_cards if flush == 5 else hand if flush else [],
+            "nobs": [f"J{cut_card[1]}"] if nobs else [],
+        },
     }
 
 
+def subset_tables(cards: list[str]) -> tuple[list[int], list[int]]:
+    """Pip total and set of ranks (bit r for rank r) of every subset of
+    ``cards``, indexed by mask. Each entry extends a smaller subset by its
+    lowest card, so the whole table takes one addition per subset."""
+    if len(cards) >= len(SUBSETS):
+        _grow_tables(len(cards))
+    values = [CARD_VALUES[c] for c in cards]
+    ranks = [RANK_BITS[c] for c in cards]
+    size = 1 << len(cards)
+    sums = [0] * size
+    rank_masks = [0] * size
+    for mask in range(1, size):
+        i, rest = LOWEST[mask], REST[mask]
+        sums[mask] = sums[rest] + values[i]
+        rank_masks[mask] = rank_masks[rest] | ranks[i]
+    return sums, rank_masks
+
+
+def _fifteen_masks(cards: list[str], sums: list[int]) -> list[int]:
+    return [mask for mask in SUBSETS[len(cards)] if sums[mask] == 15]
+
+
+def _pair_masks(cards: list[str], rank_masks: list[int]) -> list[int]:
+    return [mask for mask in PAIR_MASKS[len(cards)] if rank_masks[mask].bit_count() == 1]
+
+
+def _run_masks(cards: list[str], rank_masks: list[int]) -> list[int]:
+    """The runs that score: every combination of cards spelling the
+    best-paying block of three or more consecutive ranks (a hand plus cut
+    only has room for one). Duplicated ranks give one run per combination."""
+    ranks = rank_masks[-1]
+    if not ranks & ranks >> 1 & ranks >> 2:
+        # No three consecutive ranks anywhere in the hand
+        return []
+    blocks: dict[int, list[int]] = {}
+    for mask in RUN_MASKS[len(cards)]:
+        run = rank_masks[mask]
+        if run.bit_count() != SIZES[mask]:
+            continue
+        # Consecutive ranks are a solid block of bits, and only a whole
+        # block counts: no rank just above or below it in the hand
+        block = run >> ((run & -run).bit_length() - 1)
+        if block & (block + 1) or ranks & (run << 1 | run >> 1) & ~run:
+            continue
+        blocks.setdefault(run, []).append(mask)
+    return max(blocks.values(), key=lambda runs: SIZES[runs[0]] * len(runs), default=[])
+
+
 def count_fifteens(cards: list[str]) -> int:
     """Count combinations summing to 15"""
-    count = 0
-    values = [card_value(c) for c in cards]
-    for r in range(2, 6):
-        for combo in combinations(values, r):
-            if sum(combo) == 15:
-                count += 1
-    return count
+    return len(_fifteen_masks(cards, subset_tables(cards)[0]))
 
 
 def count_pairs(cards: list[str]) -> int:
     """Count pairs (each pair = 1 counted, worth 2 points)"""
-    ranks = [c[0] for c in cards]
-    counter = Counter(ranks)
-    pairs = 0
-    for count in counter.values():
-        # n cards of same rank = n*(n-1)/2 pairs
-        pairs += count * (count - 1) // 2
-    return pairs
+    return len(_pair_masks(cards, subset_tables(cards)[1]))
 
 
 def count_runs(cards: list[str]) -> int:
@@ -53,32 +135,7 @@ def count_runs(cards: list[str]) -> int:
     Count runs (3+ consecutive ranks).
     Handles duplicate cards creating multiple runs.
     """
-    ranks = [card_rank_order(c) for c in cards]
-    rank_counts = Counter(ranks)
-
-    # Find all unique ranks present
-    unique_ranks = sorted(rank_counts.keys())
-
-    best_run_points = 0
-
-    # Try to find runs starting from each rank
-    for start_idx in range(len(unique_ranks)):
-        # Find the longest consecutive sequence from this start
-        run_length = 1
-        multiplier = rank_counts[unique_ranks[start_idx]]
-
-        for i in range(start_idx + 1, len(unique_ranks)):
-            if unique_ranks[i] == unique_ranks[i - 1] + 1:
-                run_length += 1
-                multiplier *= rank_counts[unique_ranks[i]]
-            else:
-                break
-
-        if run_length >= 3:
-            points = run_length * multiplier
-            best_run_points = max(best_run_points, points)
-
-    return best_run_points
+    return sum(SIZES[mask] for mask in _run_masks(cards, subset_tables(cards)[1]))
 
 
 def count_flush(hand: list[str], cut: str, is_crib: bool) -> int:
@@ -0,0 +1,99 @@
+"""Two-player games between strategies, without a server or database.
+
+Games are played and scored the way GameService plays them: six cards
+each, two to the crib, His Heels on the cut, pegging with Go and last
+card, then hands from the non-dealer round to the dealer and the crib,
+with the game ending once a scored hand or crib reaches 121.
+
+Each round's shuffle and cut come from a generator seeded with the deal
+seed and the round number, and strategy choices from a separate one, so
+``play_duplicate`` can replay the same cards with the players' seats
+swapped: whatever luck seat 0 had in one game, the other player has in
+the next.
+"""
+import random
+
+from .deck import create_deck, deal_hands
+from .pegging import score_go, score_last_card, score_peg_play, valid_peg_plays
+from .scoring import check_his_heels, score_hand
+from .strategies import Strategy
+
+WINNING_SCORE = 121
+
+
+def play_game(strategies: list[Strategy], deal_seed: int, play_seed: int) -> list[int]:
+    """Final scores by seat for strategies[0] in seat 0 against
+    strategies[1] in seat 1; seat 0 deals first."""
+    play_rng = random.Random(play_seed)
+    scores = [0, 0]
+    dealer = 0
+    round_number = 0
+    while True:
+        round_number += 1
+        deal_rng = random.Random(f"{deal_seed}:{round_number}")
+        deck = create_deck()
+        deal_rng.shuffle(deck)
+        hands, remaining = deal_hands(deck, 2)
+
+        crib = []
+        for seat in (0, 1):
+            thrown = strategies[seat].discard(list(hands[seat]), 2, seat == dealer, play_rng)
+            crib.extend(thrown)
+            hands[seat] = [card for card in hands[seat] if card not in thrown]
+
+        cut = remaining[deal_rng.randrange(len(remaining))]
+        scores[dealer] += check_his_heels(cut)
+
+        pone = 1 - dealer
+        for seat, points in enumerate(_peg(strategies, hands, pone, play_rng)):
+            scores[seat] += points
+
+        for seat in (pone, dealer):
+            scores[seat] += score_hand(hands[seat], cut)["total"]
+            if scores[seat] >= WINNING_SCORE:
+                return scores
+        scores[dealer] += score_hand(crib, cut, is_crib=True)["total"]
+        if scores[dealer] >= WINNING_SCORE:
+            return scores
+        dealer = pone
+
+
+def _peg(strategies: list[Strategy], kept: list[list[str]], first: int, rng: random.Random) -> list[int]:
+    """Pegging points by seat for one round."""
+    hands = [list(hand) for hand in kept]
+    points = [0, 0]
+    sequence: list[str] = []
+    count = 0
+    turn = first
+    last = None
+    while hands[0] or hands[1]:
+        plays = valid_peg_plays(hands[turn], count)
+        if plays:
+            card = strategies[turn].peg(plays, list(hands[turn]), list(sequence), count, rng)
+            result = score_peg_play(sequence, card)
+            points[turn] += result["points"]
+            hands[turn].remove(card)
+            sequence.append(card)
+            count = result["new_count"]
+            last = turn
+            if count == 31:
+                sequence, count = [], 0
+            turn = 1 - turn
+        elif valid_peg_plays(hands[1 - turn], count):
+            # Go: the other player keeps playing
+            turn = 1 - turn
+        else:
+            points[last] += score_go()
+            sequence, count = [], 0
+            turn = 1 - last
+    if sequence:
+        points[last] += score_last_card()
+    return points
+
+
+def play_duplicate(a: Strategy, b: Strategy, deal_seed: int, play_seed: int) -> tuple[list[int], list[int]]:
+    """Both games of a duplicate pair, each as [a's score, b's score]: first
+    with a in seat 0, then with b in seat 0 on the same deals."""
+    first = play_game([a, b], deal_seed, play_seed)
+    second = play_game([b, a], deal_seed, play_seed + 1)
+    return first, second[::-1]
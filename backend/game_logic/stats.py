@@ -0,0 +1,119 @@
+import json
+
+from .pegging import replay_peg_points
+
+COUNTERS = (
+    "games_played",
+    "games_won",
+    "skunks_given",
+    "skunks_received",
+    "hands_scored",
+    "hand_points",
+    "cribs_scored",
+    "crib_points",
+    "rounds_pegged",
+    "pegging_points",
+)
+
+SKUNK_LINE = 91
+
+
+def stat_key(name: str) -> str:
+    """Players have no accounts, so stats are keyed by normalized name."""
+    return name.strip().lower()
+
+
+class StatsDelta:
+    """Counter increments per player, ready to be added to player_stats."""
+
+    def __init__(self):
+        self.rows: dict[str, dict] = {}
+
+    def _row(self, name: str) -> dict:
+        key = stat_key(name)
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = {"name": name, "highest_hand": 0}
+            row.update((c, 0) for c in COUNTERS)
+        return row
+
+    def hand(self, name: str, points: int):
+        row = self._row(name)
+        row["hands_scored"] += 1
+        row["hand_points"] += points
+        row["highest_hand"] = max(row["highest_hand"], points)
+
+    def crib(self, name: str, points: int):
+        row = self._row(name)
+        row["cribs_scored"] += 1
+        row["crib_points"] += points
+
+    def pegging(self, name: str, points: int):
+        row = self._row(name)
+        row["rounds_pegged"] += 1
+        row["pegging_points"] += points
+
+    def game(self, players: list[tuple[str, int | None, int]], is_teams: bool):
+        """Record a finished game from (name, team, final score) per player."""
+        winner = max(range(len(players)), key=lambda i: players[i][2])
+        won = [
+            i == winner or (is_teams and players[i][1] == players[winner][1])
+            for i in range(len(players))
+        ]
+        skunk = any(p[2] < SKUNK_LINE for p, w in zip(players, won) if not w)
+        for (name, _, score), w in zip(players, won):
+            row = self._row(name)
+            row["games_played"] += 1
+            if w:
+                row["games_won"] += 1
+                row["skunks_given"] += int(skunk)
+            else:
+                row["skunks_received"] += int(score < SKUNK_LINE)
+
+    def merge(self, other: "StatsDelta"):
+        for theirs in other.rows.values():
+            row = self._row(theirs["name"])
+            for c in COUNTERS:
+                row[c] += theirs[c]
+            row["highest_hand"] = max(row["highest_hand"], theirs["highest_hand"])
+
+
+def replay_game(game: dict) -> StatsDelta:
+    """
+    Rebuild the stats a game contributed from its stored history.
+    ``game`` holds raw rows (JSON columns still encoded) so the decoding
+    happens in whichever process runs this.
+    """
+    delta = StatsDelta()
+    names = {p["id"]: p["name"] for p in game["players"]}
+    by_seat = {p["seat"]: p["name"] for p in game["players"]}
+
+    for rnd in game["rounds"]:
+        hands = rnd["hands"]
+        # Only rounds that reached hand scoring count
+        if not any(h["hand_score"] is not None for h in hands):
+            continue
+        for h in hands:
+            if h["hand_score"] is not None and h["player_id"] in names:
+                delta.hand(names[h["player_id"]], h["hand_score"])
+
+        # Rounds from before crib scores were stored have no crib to count
+        if rnd["crib_score"] is not None and rnd["dealer_seat"] in by_seat:
+            delta.crib(by_seat[rnd["dealer_seat"]], rnd["crib_score"])
+
+        if all(h["peg_points"] is not None for h in hands):
+            for h in hands:
+                if h["player_id"] in names:
+                    delta.pegging(names[h["player_id"]], h["peg_points"])
+        else:
+            # Rounds dealt before peg_points existed are replayed
+            peg_points = replay_peg_points(json.loads(rnd["peg_history"]))
+            for seat, name in by_seat.items():
+                delta.pegging(name, peg_points.get(seat, 0))
+
+    if game["status"] == "finished":
+        delta.game(
+            [(p["name"], p["team"], p["score"]) for p in game["players"]],
+            game["is_teams"],
+        )
+    return delta
@@ -0,0 +1,105 @@
+"""Bot strategies for discarding and pegging, for self-play.
+
+A strategy is any object with ``discard`` and ``peg`` methods (see
+Strategy). The built-in ones are registered by name in STRATEGIES;
+``load_strategy`` also accepts ``package.module:attribute`` for a strategy
+defined elsewhere (a class is instantiated, an instance used as is).
+"""
+import importlib
+import random
+from itertools import combinations
+
+from .deck import card_value, create_deck
+from .pegging import score_peg_play
+from .scoring import count_fifteens, count_pairs, count_runs, score_hand
+
+
+class Strategy:
+    """Plays at random: the baseline the others are measured against."""
+
+    name = "random"
+
+    def discard(self, hand: list[str], count: int, is_dealer: bool, rng: random.Random) -> list[str]:
+        """Cards from ``hand`` to put in the crib (``count`` of them)."""
+        return rng.sample(hand, count)
+
+    def peg(
+        self, plays: list[str], hand: list[str], sequence: list[str], count: int, rng: random.Random
+    ) -> str:
+        """One of ``plays`` (the legal cards in ``hand``) to play on
+        ``sequence``, the cards played since the count was last reset."""
+        return rng.choice(plays)
+
+
+def _keep_points(keep: list[str]) -> int:
+    """Points four kept cards score before the cut."""
+    points = count_fifteens(keep) * 2 + count_pairs(keep) * 2 + count_runs(keep)
+    if len({card[1] for card in keep}) == 1:
+        points += 4
+    return points
+
+
+def _crib_points(thrown: list[str]) -> int:
+    """Points the thrown cards make between themselves."""
+    return count_fifteens(thrown) * 2 + count_pairs(thrown) * 2
+
+
+class GreedyStrategy(Strategy):
+    """Keeps the four cards worth most before the cut, counting the thrown
+    cards for or against it depending on whose crib it is, and pegs for the
+    most points now, avoiding counts of 5 and 21."""
+
+    name = "greedy"
+
+    def discard(self, hand, count, is_dealer, rng):
+        sign = 1 if is_dealer else -1
+
+        def value(thrown):
+            keep = [card for card in hand if card not in thrown]
+            return self.keep_value(keep) + sign * _crib_points(list(thrown))
+
+        return list(max(combinations(hand, count), key=value))
+
+    def keep_value(self, keep: list[str]) -> float:
+        return _keep_points(keep)
+
+    def peg(self, plays, hand, sequence, count, rng):
+        def value(card):
+            result = score_peg_play(sequence, card)
+            # A ten-card on 5 or 21 hands the opponent 15 or 31
+            risky = result["new_count"] in (5, 21)
+            return result["points"], not risky, card_value(card)
+
+        return max(plays, key=value)
+
+
+class ExpectedStrategy(GreedyStrategy):
+    """Like greedy, but values a keep by its average score over every cut
+    it could see (about 700 hand scores per discard)."""
+
+    name = "expected"
+
+    _deck = create_deck()
+
+    def discard(self, hand, count, is_dealer, rng):
+        self._cuts = [card for card in self._deck if card not in hand]
+        return super().discard(hand, count, is_dealer, rng)
+
+    def keep_value(self, keep):
+        return sum(score_hand(keep, cut)["total"] for cut in self._cuts) / len(self._cuts)
+
+
+STRATEGIES: dict[str, type[Strategy]] = {
+    cls.name: cls for cls in (Strategy, GreedyStrategy, ExpectedStrategy)
+}
+
+
+def load_strategy(spec: str) -> Strategy:
+    """A registered strategy by name, or one given as ``module:attribute``."""
+    if spec in STRATEGIES:
+        return STRATEGIES[spec]()
+    if ":" not in spec:
+        raise ValueError(f"Unknown strategy {spec!r}; choose from {', '.join(STRATEGIES)} or module:attr")
+    module, attribute = spec.split(":", 1)
+    strategy = getattr(importlib.import_module(module), attribute)
+    return strategy() if isinstance(strategy, type) else strategy
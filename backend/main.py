@@ -1,17 +1,55 @@
-from contextlib import asynccontextmanager
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
-from .database import init_db
-from .routers import games, websocket
+from .config import settings
+from .database import init_db, optimize_db, run_optimizer
+from .routers import admin, analyze, games, stats, tournaments, websocket
+from .services.analysis_service import analyzer
+from .services.archive_service import run_archiver
+from .services.drain import drainer, prewarm
+from .services import group_commit
+from .services.metrics import Gauge, registry
+from .services.profiler import ProfilingMiddleware
+from .services.tournament_service import run_tournament_scheduler
+from .services.tracing import tracer
+from .services.turn_clock import turn_clocks
+from .services.websocket_manager import manager, run_heartbeat
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await optimize_db()
+    if group_commit.ENABLED:
+        await group_commit.group_committer.start()
+    await prewarm()
+    drainer.install()
+    tasks = [
+        asyncio.create_task(run_heartbeat()),
+        asyncio.create_task(run_optimizer()),
+        asyncio.create_task(run_tournament_scheduler()),
+    ]
+    if turn_clocks.enabled:
+        await turn_clocks.restore()
+        tasks.append(asyncio.create_task(turn_clocks.run(websocket.expire_turn)))
+    if settings.archive_enabled:
+        tasks.append(asyncio.create_task(run_archiver()))
     yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    if group_commit.ENABLED:
+        await group_commit.group_committer.close()
+    analyzer.close()
+    await optimize_db()
+    tracer.exporter.close()
 
 
 app = FastAPI(title="Cribbage", lifespan=lifespan)
@@ -34,10 +72,53 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(games.router, prefix="/api")
+app.include_router(stats.router, prefix="/api")
+app.include_router(analyze.router, prefix="/api")
+app.include_router(tournaments.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 app.include_router(websocket.router)
 
+
+registry.register(Gauge(
+    "cribbage_live_connections", "Seated players with an open socket",
+    lambda: manager.connection_count,
+))
+registry.register(Gauge(
+    "cribbage_live_games", "Games with at least one open socket",
+    lambda: manager.game_count,
+))
+registry.register(Gauge(
+    "cribbage_turn_clocks", "Turn clocks running",
+    lambda: len(turn_clocks.wheel),
+))
+registry.register(Gauge(
+    "cribbage_spectators", "Open spectator sockets",
+    lambda: manager.spectator_count,
+))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/api/health")
+async def health(response: Response):
+    if drainer.active:
+        # Tell load balancers to stop sending traffic here
+        response.status_code = 503
+    return {
+        "status": "draining" if drainer.active else "ok",
+        "live_connections": manager.connection_count,
+        "tracked_games": manager.game_count,
+        "spectators": manager.spectator_count,
+    }
+
 # Serve static files (frontend build) if available
 static_path = Path(__file__).parent.parent / "frontend" / "dist"
 if static_path.exists():
@@ -1,9 +1,9 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, Integer, Boolean, Text, ForeignKey, DateTime
+from sqlalchemy import String, Integer, Boolean, Text, ForeignKey, DateTime, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from pydantic import BaseModel
-from .database import Base
+from pydantic import BaseModel, Field
+from .database import ArchiveBase, Base
 
 
 class GameDB(Base):
@@ -19,10 +19,22 @@ class GameDB(Base):
     current_turn_seat: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     peg_count: Mapped[int] = mapped_column(Integer, default=0)
     cut_card: Mapped[Optional[str]] = mapped_column(String(3), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Pass the turn for players who cannot play instead of waiting for "go"
+    auto_go: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Set for tournament tables; the round is 1 for the opening tables
+    tournament_id: Mapped[Optional[str]] = mapped_column(
+        String(36), nullable=True, index=True
+    )
+    tournament_round: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+    # Bumped by every UPDATE, which only applies if the row still has the
+    # version it was read at; see GameService._claim
+    version: Mapped[int] = mapped_column(Integer, default=0)
 
     players: Mapped[list["PlayerDB"]] = relationship(
         back_populates="game", cascade="all, delete-orphan"
@@ -31,6 +43,8 @@ class GameDB(Base):
         back_populates="game", cascade="all, delete-orphan"
     )
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class PlayerDB(Base):
     __tablename__ = "players"
@@ -61,6 +75,8 @@ class RoundDB(Base):
     deck_state: Mapped[str] = mapped_column(Text, default="[]")
     crib_cards: Mapped[str] = mapped_column(Text, default="[]")
     peg_history: Mapped[str] = mapped_column(Text, default="[]")
+    cut_card: Mapped[Optional[str]] = mapped_column(String(3), nullable=True)
+    crib_score: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     game: Mapped["GameDB"] = relationship(back_populates="rounds")
@@ -79,15 +95,95 @@ class PlayerHandDB(Base):
     current_cards: Mapped[str] = mapped_column(Text, default="[]")
     pegged_cards: Mapped[str] = mapped_column(Text, default="[]")
     hand_score: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # NULL for hands dealt before the column existed; their pegging is
+    # replayed from the round's peg history instead
+    peg_points: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, default=0)
 
     round: Mapped["RoundDB"] = relationship(back_populates="hands")
     player: Mapped["PlayerDB"] = relationship(back_populates="hands")
 
 
+class PlayerStatsDB(Base):
+    """Running totals per player name, updated as hands and games are scored."""
+
+    __tablename__ = "player_stats"
+
+    name_key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    games_played: Mapped[int] = mapped_column(Integer, default=0)
+    games_won: Mapped[int] = mapped_column(Integer, default=0)
+    skunks_given: Mapped[int] = mapped_column(Integer, default=0)
+    skunks_received: Mapped[int] = mapped_column(Integer, default=0)
+    hands_scored: Mapped[int] = mapped_column(Integer, default=0)
+    hand_points: Mapped[int] = mapped_column(Integer, default=0)
+    highest_hand: Mapped[int] = mapped_column(Integer, default=0)
+    cribs_scored: Mapped[int] = mapped_column(Integer, default=0)
+    crib_points: Mapped[int] = mapped_column(Integer, default=0)
+    rounds_pegged: Mapped[int] = mapped_column(Integer, default=0)
+    pegging_points: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class TournamentDB(Base):
+    """Single-elimination event: each table's winner moves on to a table of
+    the next round as soon as enough of them are waiting."""
+
+    __tablename__ = "tournaments"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    code: Mapped[str] = mapped_column(String(8), unique=True, index=True)
+    name: Mapped[str] = mapped_column(String(100))
+    table_size: Mapped[int] = mapped_column(Integer, default=2)
+    auto_go: Mapped[bool] = mapped_column(Boolean, default=True)
+    status: Mapped[str] = mapped_column(String(20), default="running")
+    winner_name: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class TournamentEntryDB(Base):
+    """One entrant. ``round`` is the round they are playing or waiting for,
+    ``game_id``/``player_id`` their current seat (None while waiting)."""
+
+    __tablename__ = "tournament_entries"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    tournament_id: Mapped[str] = mapped_column(ForeignKey("tournaments.id"), index=True)
+    name: Mapped[str] = mapped_column(String(50))
+    # Lets the entrant look up their current table across rounds
+    token: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    round: Mapped[int] = mapped_column(Integer, default=1)
+    game_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, index=True)
+    player_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    eliminated: Mapped[bool] = mapped_column(Boolean, default=False)
+    qualified_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedGameDB(ArchiveBase):
+    """A finished or abandoned game, stored as one zlib-compressed JSON blob."""
+
+    __tablename__ = "archived_games"
+
+    code: Mapped[str] = mapped_column(String(8), primary_key=True)
+    game_id: Mapped[str] = mapped_column(String(36), index=True)
+    status: Mapped[str] = mapped_column(String(20))
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    ended_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+
+
 # Pydantic schemas for API
 class CreateGameRequest(BaseModel):
     player_count: int
     player_name: str
+    auto_go: bool = True
 
 
 class JoinGameRequest(BaseModel):
@@ -131,3 +227,91 @@ class ActiveGameInfo(BaseModel):
 
 class ActiveGamesRequest(BaseModel):
     session_tokens: list[str]
+
+
+class BulkTablesRequest(BaseModel):
+    # Player names per table, in seat order; every table starts full
+    tables: list[list[str]] = Field(min_length=1)
+    auto_go: bool = True
+
+
+class SeatInfo(BaseModel):
+    name: str
+    seat: int
+    session_token: str
+
+
+class TableInfo(BaseModel):
+    game_id: str
+    game_code: str
+    seats: list[SeatInfo]
+
+
+class CreateTournamentRequest(BaseModel):
+    name: str = Field(max_length=100)
+    players: list[str] = Field(min_length=2)
+    table_size: int = 2
+    auto_go: bool = True
+
+
+class TournamentEntryInfo(BaseModel):
+    name: str
+    token: str
+    round: int
+    eliminated: bool
+    game_code: str | None
+    session_token: str | None
+
+
+class TournamentTable(BaseModel):
+    game_code: str
+    round: int
+    status: str
+    players: list[PlayerInfo]
+
+
+class TournamentInfo(BaseModel):
+    code: str
+    name: str
+    status: str
+    table_size: int
+    winner_name: str | None
+    entrants: int
+    remaining: int
+    tables: list[TournamentTable]
+
+
+class CreateTournamentResponse(BaseModel):
+    code: str
+    entries: list[TournamentEntryInfo]
+
+
+class AnalyzeHand(BaseModel):
+    # Four cards to score, or a 5- or 6-card deal to rank discards for
+    cards: list[str]
+    cut: str | None = None
+    # Four cards are scored as a crib; for a deal, the crib is the player's own
+    is_crib: bool = False
+
+
+class AnalyzeRequest(BaseModel):
+    hands: list[AnalyzeHand] = Field(min_length=1)
+
+
+class AnalyzeResponse(BaseModel):
+    # Per hand, in order: {"kind": "score" | "average" | "discard", ...}
+    # or {"error": ...}
+    results: list[dict]
+
+
+class PlayerStats(BaseModel):
+    name: str
+    games_played: int
+    games_won: int
+    win_rate: float
+    skunks_given: int
+    skunks_received: int
+    average_hand: float
+    average_crib: float
+    average_pegging: float
+    highest_hand: int
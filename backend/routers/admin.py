@@ -0,0 +1,117 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import (
+    BulkTablesRequest,
+    CreateTournamentRequest,
+    CreateTournamentResponse,
+    SeatInfo,
+    TableInfo,
+    TournamentEntryInfo,
+)
+from ..services.drain import refuse_while_draining
+from ..services.game_service import GameService
+from ..services.group_commit import get_action_session
+from ..services.profiler import profiler
+from ..services.tournament_service import TournamentService
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+class StartProfileRequest(BaseModel):
+    sample_every: int = Field(default=100, ge=1)
+    game_code: str | None = None
+    max_captures: int = Field(default=100, ge=0)
+
+
+@router.get("/profile")
+async def profile_status():
+    return profiler.status()
+
+
+@router.post("/profile/start")
+async def start_profile(request: StartProfileRequest):
+    """Sample every Nth action, or every action of game_code when given."""
+    profiler.start(request.sample_every, request.game_code, request.max_captures)
+    return profiler.status()
+
+
+@router.post("/profile/stop")
+async def stop_profile():
+    profiler.stop()
+    return profiler.status()
+
+
+@router.post(
+    "/tables", response_model=list[TableInfo], dependencies=[Depends(refuse_while_draining)]
+)
+async def create_tables(
+    request: BulkTablesRequest, session: AsyncSession = Depends(get_action_session)
+):
+    """Create full, dealt tables with pre-assigned seats in one transaction."""
+    if len(request.tables) > settings.bulk_tables_max:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.bulk_tables_max} tables per request",
+        )
+    try:
+        games = GameService(session).create_tables(request.tables, auto_go=request.auto_go)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await session.commit()
+    return [
+        TableInfo(
+            game_id=game.id,
+            game_code=game.code,
+            seats=[
+                SeatInfo(name=p.name, seat=p.seat, session_token=p.session_token)
+                for p in game.players
+            ],
+        )
+        for game in games
+    ]
+
+
+@router.post(
+    "/tournaments",
+    response_model=CreateTournamentResponse,
+    dependencies=[Depends(refuse_while_draining)],
+)
+async def create_tournament(
+    request: CreateTournamentRequest, session: AsyncSession = Depends(get_action_session)
+):
+    """Start a tournament, seating its opening round in one transaction."""
+    if len(request.players) > settings.bulk_tables_max * request.table_size:
+        raise HTTPException(status_code=400, detail="Too many players")
+    try:
+        tournament, seats = await TournamentService(session).create_tournament(
+            request.name, request.players, request.table_size, request.auto_go
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return CreateTournamentResponse(
+        code=tournament.code,
+        entries=[
+            TournamentEntryInfo(
+                name=entry.name,
+                token=entry.token,
+                round=entry.round,
+                eliminated=False,
+                game_code=game.code,
+                session_token=player.session_token,
+            )
+            for entry, game, player in seats
+        ],
+    )
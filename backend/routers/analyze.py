@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException
+
+from ..config import settings
+from ..models import AnalyzeRequest, AnalyzeResponse
+from ..services.analysis_service import analyzer
+
+router = APIRouter(tags=["analyze"])
+
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_hands(request: AnalyzeRequest):
+    """Score hands, average them over the cut, or rank a deal's discards."""
+    if len(request.hands) > settings.analyze_max_hands:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.analyze_max_hands} hands per request",
+        )
+    results = await analyzer.analyze(
+        [(hand.cards, hand.cut, hand.is_crib) for hand in request.hands]
+    )
+    return AnalyzeResponse(results=results)
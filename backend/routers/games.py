@@ -1,8 +1,12 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from functools import partial
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
+from ..config import settings
+from ..database import archive_session, get_read_session, read_session
 from ..models import (
     CreateGameRequest,
     JoinGameRequest,
@@ -12,19 +16,30 @@ from ..models import (
     ActiveGameInfo,
     ActiveGamesRequest,
 )
+from ..services.archive_service import ArchiveService
+from ..services.concurrency import GameConflict, run_action
+from ..services.drain import refuse_while_draining
+from ..services.export_service import EXPORTABLE_STATUSES, ExportService
+from ..services.game_cache import etag_matches, game_info_cache, make_etag
 from ..services.game_service import GameService
+from ..services.group_commit import get_action_session
+from ..services.message_guard import game_views
 from ..services.websocket_manager import manager
+from .admin import require_admin
+from .websocket import broadcast_game_state
 
 router = APIRouter(prefix="/games", tags=["games"])
 
 
-@router.post("", response_model=GameResponse)
+@router.post("", response_model=GameResponse, dependencies=[Depends(refuse_while_draining)])
 async def create_game(
-    data: CreateGameRequest, session: AsyncSession = Depends(get_session)
+    data: CreateGameRequest, session: AsyncSession = Depends(get_action_session)
 ):
     service = GameService(session)
     try:
-        game, player = await service.create_game(data.player_count, data.player_name)
+        game, player = await service.create_game(
+            data.player_count, data.player_name, auto_go=data.auto_go
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     return GameResponse(
@@ -36,16 +51,22 @@ async def create_game(
 
 
 @router.post("/{game_code}/join", response_model=GameResponse)
-async def join_game(
-    game_code: str,
-    data: JoinGameRequest,
-    session: AsyncSession = Depends(get_session),
-):
-    service = GameService(session)
+async def join_game(game_code: str, data: JoinGameRequest):
+    # Two joins racing for the last seat conflict on the game's version;
+    # the loser is re-run and finds the game full
     try:
-        game, player = await service.join_game(game_code, data.player_name)
+        return await run_action(partial(_join_game, game_code, data), "join")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except GameConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+async def _join_game(game_code: str, data: JoinGameRequest, session: AsyncSession):
+    service = GameService(session)
+    game, player = await service.join_game(game_code, data.player_name)
+    # The last join deals; seated players' frames are checked against this
+    game_views.record(game)
 
     # Notify existing players about new player
     await manager.broadcast_to_game(
@@ -58,43 +79,9 @@ async def join_game(
         },
     )
 
-    # If game started, send state to all connected players
+    # If game started, send the deal to the table and its spectators
     if game.status == "playing":
-        current_round = await service.get_current_round(game)
-        for p in game.players:
-            ws = manager.get_connection(p.session_token)
-            if ws:
-                hand_cards = []
-                if current_round:
-                    hand = await service.get_player_hand(current_round.id, p.id)
-                    if hand:
-                        hand_cards = json.loads(hand.current_cards)
-                await ws.send_json({
-                    "type": "state_sync",
-                    "game": {
-                        "code": game.code,
-                        "status": game.status,
-                        "phase": game.current_phase,
-                        "player_count": game.player_count,
-                        "current_dealer_seat": game.current_dealer_seat,
-                        "current_turn_seat": game.current_turn_seat,
-                        "peg_count": game.peg_count,
-                        "cut_card": game.cut_card,
-                        "players": [
-                            {
-                                "id": pl.id,
-                                "name": pl.name,
-                                "seat": pl.seat,
-                                "score": pl.score,
-                                "connected": pl.is_connected,
-                            }
-                            for pl in sorted(game.players, key=lambda x: x.seat)
-                        ],
-                    },
-                    "your_hand": hand_cards,
-                    "your_seat": p.seat,
-                    "your_id": p.id,
-                })
+        await broadcast_game_state(game, service)
 
     return GameResponse(
         game_id=game.id,
@@ -104,15 +91,66 @@ async def join_game(
     )
 
 
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def export_games(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    status: str | None = None,
+):
+    """Stream every finished or abandoned game created in [since, until)
+    as NDJSON."""
+    return StreamingResponse(
+        _ndjson_history(since=since, until=until, status=status),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/{game_code}/export")
+async def export_game(
+    game_code: str, session: AsyncSession = Depends(get_read_session)
+):
+    """Stream one finished or abandoned game's full history as NDJSON."""
+    async with archive_session() as archive:
+        status = await ExportService(session, archive).get_status(game_code)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    if status not in EXPORTABLE_STATUSES:
+        raise HTTPException(status_code=409, detail="Game is still in progress")
+    return StreamingResponse(
+        _ndjson_history(code=game_code), media_type="application/x-ndjson"
+    )
+
+
+async def _ndjson_history(**filters):
+    # The request's session is closed before the body streams, so the
+    # generator needs its own.
+    async with read_session() as session, archive_session() as archive:
+        async for record in ExportService(session, archive).stream_history(**filters):
+            yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
 @router.get("/{game_code}", response_model=GameInfo)
 async def get_game_info(
-    game_code: str, session: AsyncSession = Depends(get_session)
+    game_code: str,
+    if_none_match: str | None = Header(default=None),
+    session: AsyncSession = Depends(get_read_session),
 ):
+    # Waiting-room clients poll this; check the game's persisted version and
+    # answer from the cache while it still matches, without loading the game.
     service = GameService(session)
+    etag = await service.get_game_etag(game_code)
+    if etag is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    if etag_matches(if_none_match, etag):
+        return _game_info_response(b"", etag, if_none_match)
+    entry = game_info_cache.get(game_code, etag)
+    if entry:
+        return _game_info_response(entry.body, entry.etag, if_none_match)
+
     game = await service.get_game_by_code(game_code)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    return GameInfo(
+    body = GameInfo(
         code=game.code,
         status=game.status,
         player_count=game.player_count,
@@ -128,14 +166,39 @@ async def get_game_info(
         ],
         current_phase=game.current_phase,
         current_dealer_seat=game.current_dealer_seat,
-    )
+    ).model_dump_json().encode()
+
+    # Tag the body with the state it was built from, which a commit since
+    # the check above may have moved on
+    etag = make_etag(game.id, game.version, (p.seat for p in game.players if p.is_connected))
+    entry = game_info_cache.put(game_code, game.id, etag, body)
+    return _game_info_response(entry.body, entry.etag, if_none_match)
+
+
+def _game_info_response(body: bytes, etag: str, if_none_match: str | None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/{game_code}/archive")
+async def get_archived_game(
+    game_code: str, session: AsyncSession = Depends(get_read_session)
+):
+    """Full history of a game that has been moved to the archive."""
+    async with archive_session() as archive:
+        game = await ArchiveService(session, archive).get_archived_game(game_code)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Archived game not found")
+    return game
 
 
 @router.post("/{game_code}/reconnect", response_model=GameResponse)
 async def reconnect(
     game_code: str,
     session_token: str,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_action_session),
 ):
     service = GameService(session)
     try:
@@ -155,27 +218,22 @@ async def reconnect(
 @router.post("/active", response_model=list[ActiveGameInfo])
 async def get_active_games(
     data: ActiveGamesRequest,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Get all active games for the given session tokens."""
     service = GameService(session)
-    games = []
-
-    for token in data.session_tokens[:20]:  # Limit to 20 tokens
-        player = await service.get_player_by_token(token)
-        if player and player.game.status != "finished":
-            game = player.game
-            games.append(
-                ActiveGameInfo(
-                    code=game.code,
-                    status=game.status,
-                    player_count=game.player_count,
-                    current_players=len(game.players),
-                    your_name=player.name,
-                    your_seat=player.seat,
-                    current_phase=game.current_phase,
-                    updated_at=game.updated_at.isoformat(),
-                )
-            )
-
-    return games
+    tokens = data.session_tokens[:settings.active_games_max_tokens]
+    rows = await service.get_active_games_for_tokens(tokens)
+    return [
+        ActiveGameInfo(
+            code=row.code,
+            status=row.status,
+            player_count=row.player_count,
+            current_players=row.current_players,
+            your_name=row.name,
+            your_seat=row.seat,
+            current_phase=row.current_phase,
+            updated_at=row.updated_at.isoformat(),
+        )
+        for row in rows
+    ]
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_read_session
+from ..models import PlayerStats
+from ..services.stats_service import StatsService
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("/{player_name}", response_model=PlayerStats)
+async def get_player_stats(
+    player_name: str, session: AsyncSession = Depends(get_read_session)
+):
+    stats = await StatsService(session).get_player_stats(player_name)
+    if not stats:
+        raise HTTPException(status_code=404, detail="No stats for player")
+    return stats
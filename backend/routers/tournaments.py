@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_read_session
+from ..models import PlayerInfo, TournamentEntryInfo, TournamentInfo, TournamentTable
+from ..services.tournament_service import TournamentService
+
+router = APIRouter(prefix="/tournaments", tags=["tournaments"])
+
+
+@router.get("/{code}", response_model=TournamentInfo)
+async def get_tournament(
+    code: str, round: int | None = None, session: AsyncSession = Depends(get_read_session)
+):
+    """Bracket so far; ``round`` limits the tables to one round."""
+    service = TournamentService(session)
+    tournament = await service.get_tournament(code)
+    if not tournament:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+    entrants, remaining = await service.count_entries(tournament)
+    tables = await service.get_tables(tournament, round)
+    return TournamentInfo(
+        code=tournament.code,
+        name=tournament.name,
+        status=tournament.status,
+        table_size=tournament.table_size,
+        winner_name=tournament.winner_name,
+        entrants=entrants,
+        remaining=remaining,
+        tables=[
+            TournamentTable(
+                game_code=game.code,
+                round=game.tournament_round,
+                status=game.status,
+                players=[
+                    PlayerInfo(name=p.name, seat=p.seat, connected=p.is_connected, score=p.score)
+                    for p in sorted(game.players, key=lambda p: p.seat)
+                ],
+            )
+            for game in tables
+        ],
+    )
+
+
+@router.get("/{code}/entries/{token}", response_model=TournamentEntryInfo)
+async def get_entry(code: str, token: str, session: AsyncSession = Depends(get_read_session)):
+    """Where an entrant should be sitting now."""
+    row = await TournamentService(session).get_entry(code, token)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    entry, session_token, game_code = row
+    seated = entry.game_id is not None and not entry.eliminated
+    return TournamentEntryInfo(
+        name=entry.name,
+        token=entry.token,
+        round=entry.round,
+        eliminated=entry.eliminated,
+        game_code=game_code if seated else None,
+        session_token=session_token if seated else None,
+    )
@@ -1,9 +1,21 @@
 import json
+import time
 from datetime import datetime
+from functools import partial
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session, async_session
+from ..config import settings
+from ..database import get_session, async_session, read_session
+from ..services import metrics
+from ..services.concurrency import GameConflict, run_action
+from ..services.drain import SERVICE_RESTART, drainer
+from ..services.game_cache import hand_cache
+from ..services.message_guard import MESSAGE_TYPES, TokenBucket, game_views, precheck
+from ..services.profiler import profiler
+from ..services.tournament_service import notify_game_finished
+from ..services.tracing import tracer
+from ..services.turn_clock import due_moves, turn_clocks
 from ..services.websocket_manager import manager
 from ..services.game_service import GameService
 
@@ -21,50 +33,74 @@ async def websocket_endpoint(websocket: WebSocket, game_code: str):
     if not session_token:
         await websocket.close(code=4001, reason="Missing session token")
         return
+    if drainer.active:
+        await websocket.close(code=SERVICE_RESTART, reason="Server restarting")
+        return
 
-    async with async_session() as session:
-        service = GameService(session)
-        player = await service.get_player_by_token(session_token)
-
-        if not player:
-            await websocket.close(code=4001, reason="Invalid session token")
-            return
-
-        if player.game.code != game_code:
-            await websocket.close(code=4001, reason="Game code mismatch")
-            return
-
-        await manager.connect(websocket, player.game_id, session_token)
-
-        player.is_connected = True
-        player.last_seen = datetime.utcnow()
-        await session.commit()
-
-        # Notify others of connection
-        await manager.broadcast_to_game(
-            player.game_id,
-            {
-                "type": "player_status",
-                "player_id": player.id,
-                "name": player.name,
-                "seat": player.seat,
-                "connected": True,
-            },
-            exclude_token=session_token,
+    try:
+        player, refusal = await run_action(
+            partial(_take_seat, session_token, game_code), "connect"
         )
+    except GameConflict:
+        player, refusal = None, (1013, "Server busy")
+    if refusal:
+        await websocket.close(code=refusal[0], reason=refusal[1])
+        return
 
-        # Send current state to connecting player
-        await send_player_state(websocket, player, service)
+    await manager.connect(websocket, player.game_id, session_token)
 
-        try:
-            while True:
-                data = await websocket.receive_json()
+    # Notify others of connection
+    await manager.broadcast_to_game(
+        player.game_id,
+        {
+            "type": "player_status",
+            "player_id": player.id,
+            "name": player.name,
+            "seat": player.seat,
+            "connected": True,
+        },
+        exclude_token=session_token,
+    )
+
+    # Send current state to connecting player
+    async with read_session() as session:
+        await send_player_state(websocket, player, GameService(session))
+
+    # No session is held while the socket is open; each message opens its
+    # own, unless the frame is refused up front (see message_guard)
+    bucket = TokenBucket(settings.ws_rate_limit, settings.ws_rate_burst)
+    try:
+        while True:
+            data = await websocket.receive_json()
+            manager.touch(session_token)
+            if isinstance(data, dict) and data.get("type") == "pong":
+                continue
+            if drainer.active:
+                refusal = ("draining", "Server is restarting")
+            elif bucket.take():
+                refusal = precheck(data, player.seat, game_views.get(player.game_id))
+            else:
+                refusal = ("rate_limited", "Too many messages")
+            if refusal:
+                metrics.ws_rejected.inc(refusal[0])
+                await websocket.send_json({"type": "error", "message": refusal[1]})
+                continue
+            # Only frames that get through count as activity, so refused
+            # spam doesn't keep a game awake or reset its turn clock
+            manager.mark_active(player.game_id)
+            turn_clocks.player_active(player.game_id)
+            with drainer.track():
                 await handle_message(data, session_token, game_code, websocket)
-        except WebSocketDisconnect:
-            manager.disconnect(session_token)
-            player.is_connected = False
-            player.last_seen = datetime.utcnow()
-            await session.commit()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # The heartbeat may already have reaped this socket and marked
+        # the player disconnected; only clean up if we still own it.
+        if manager.disconnect(session_token, websocket):
+            await run_action(
+                lambda session: GameService(session).mark_tokens_disconnected([session_token]),
+                "disconnect",
+            )
 
             await manager.broadcast_to_game(
                 player.game_id,
@@ -78,193 +114,403 @@ async def websocket_endpoint(websocket: WebSocket, game_code: str):
             )
 
 
-async def send_player_state(websocket: WebSocket, player, service: GameService):
-    game = player.game
-    current_round = await service.get_current_round(game)
+async def _take_seat(session_token: str, game_code: str, session: AsyncSession):
+    """Mark the player connected; returns (player, None) or (None, (close code, reason))."""
+    player = await GameService(session).get_player_by_token(session_token)
+    if not player:
+        return None, (4001, "Invalid session token")
+    if player.game.code != game_code:
+        return None, (4001, "Game code mismatch")
+    if manager.is_full():
+        return None, (1013, "Server busy")
+
+    player.is_connected = True
+    player.last_seen = datetime.utcnow()
+    await session.commit()
+    game_views.record(player.game)
+    return player, None
+
+
+@router.websocket("/ws/{game_code}/watch")
+async def spectator_endpoint(websocket: WebSocket, game_code: str):
+    """Read-only stream of a game's public events."""
+    if drainer.active:
+        await websocket.close(code=SERVICE_RESTART, reason="Server restarting")
+        return
+    async with read_session() as session:
+        game = await GameService(session).get_game_by_code(game_code)
+    if not game:
+        await websocket.close(code=4004, reason="Game not found")
+        return
 
-    hand_cards = []
-    if current_round:
-        hand = await service.get_player_hand(current_round.id, player.id)
-        if hand:
-            hand_cards = json.loads(hand.current_cards)
+    async def load_snapshot() -> dict:
+        async with read_session() as session:
+            game = await GameService(session).get_game_by_code(game_code)
+        return spectator_state(public_game_state(game))
 
-    state = {
+    spectator = await manager.add_spectator(websocket, game.id, load_snapshot)
+    if spectator is None:
+        return
+    try:
+        # Spectators are read-only; anything they send is ignored.
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.remove_spectator(game.id, spectator)
+
+
+def public_game_state(game) -> dict:
+    """Game state visible to everyone at the table, without any hands."""
+    return {
+        "code": game.code,
+        "status": game.status,
+        "phase": game.current_phase,
+        "player_count": game.player_count,
+        "auto_go": game.auto_go,
+        "current_dealer_seat": game.current_dealer_seat,
+        "current_turn_seat": game.current_turn_seat,
+        "peg_count": game.peg_count,
+        "cut_card": game.cut_card,
+        "players": [
+            {
+                "id": p.id,
+                "name": p.name,
+                "seat": p.seat,
+                "score": p.score,
+                "connected": p.is_connected,
+            }
+            for p in sorted(game.players, key=lambda p: p.seat)
+        ],
+    }
+
+
+def spectator_state(public: dict) -> dict:
+    """The state_sync spectators get: the public state and no hand."""
+    return {
         "type": "state_sync",
-        "game": {
-            "code": game.code,
-            "status": game.status,
-            "phase": game.current_phase,
-            "player_count": game.player_count,
-            "current_dealer_seat": game.current_dealer_seat,
-            "current_turn_seat": game.current_turn_seat,
-            "peg_count": game.peg_count,
-            "cut_card": game.cut_card,
-            "players": [
-                {
-                    "id": p.id,
-                    "name": p.name,
-                    "seat": p.seat,
-                    "score": p.score,
-                    "connected": p.is_connected,
-                }
-                for p in sorted(game.players, key=lambda p: p.seat)
-            ],
-        },
+        "game": public,
+        "your_hand": [],
+        "your_seat": None,
+        "spectator": True,
+    }
+
+
+async def player_state(player, service: GameService) -> dict:
+    game = player.game
+    hand_cards = hand_cache.get(game.id, game.version, player.id)
+    if hand_cards is None:
+        hand_cards = []
+        current_round = await service.get_current_round(game)
+        if current_round:
+            hand = await service.get_player_hand(current_round.id, player.id)
+            if hand:
+                hand_cards = json.loads(hand.current_cards)
+
+    return {
+        "type": "state_sync",
+        "game": public_game_state(game),
         "your_hand": hand_cards,
         "your_seat": player.seat,
         "your_id": player.id,
     }
-    await websocket.send_json(state)
+
+
+async def send_player_state(websocket: WebSocket, player, service: GameService):
+    await websocket.send_json(await player_state(player, service))
 
 
 async def handle_message(data: dict, session_token: str, game_code: str, websocket: WebSocket):
+    start = time.perf_counter()
+    msg_type = _metric_msg_type(data.get("type"))
+    try:
+        if tracer.enabled:
+            with tracer.start_as_current_span(f"ws.{msg_type}", {
+                "game.code": game_code,
+                "action.seq": tracer.next_action_seq(),
+            }):
+                await _profiled_message(data, session_token, game_code, websocket, msg_type)
+        else:
+            await _profiled_message(data, session_token, game_code, websocket, msg_type)
+    finally:
+        metrics.ws_message_seconds.observe(time.perf_counter() - start, msg_type)
+
+
+async def _profiled_message(data: dict, session_token: str, game_code: str, websocket: WebSocket, msg_type: str):
+    if profiler.armed:
+        with profiler.capture("ws", msg_type, game_code):
+            await _handle_message(data, session_token, game_code, websocket)
+    else:
+        await _handle_message(data, session_token, game_code, websocket)
+
+
+# Anything but a known message type is bucketed to keep labels bounded
+def _metric_msg_type(msg_type) -> str:
+    return msg_type if msg_type in MESSAGE_TYPES else "unknown"
+
+
+async def _handle_message(data: dict, session_token: str, game_code: str, websocket: WebSocket):
+    try:
+        await run_action(
+            partial(_apply_message, data, session_token, websocket),
+            _metric_msg_type(data.get("type")),
+        )
+    except GameConflict as e:
+        await websocket.send_json({"type": "error", "message": str(e), "retriable": True})
+
+
+async def _apply_message(data: dict, session_token: str, websocket: WebSocket, session: AsyncSession):
     msg_type = data.get("type")
+    service = GameService(session)
+    player = await service.get_player_by_token(session_token)
 
-    async with async_session() as session:
-        service = GameService(session)
-        player = await service.get_player_by_token(session_token)
+    if not player:
+        await websocket.send_json({"type": "error", "message": "Invalid session"})
+        return
 
-        if not player:
-            await websocket.send_json({"type": "error", "message": "Invalid session"})
-            return
+    game = player.game
 
-        game = player.game
+    try:
+        if msg_type == "start_game":
+            if game.status != "waiting":
+                raise ValueError("Game already started")
+            if len(game.players) < game.player_count:
+                raise ValueError("Not enough players")
+            await service.start_round(game)
+            game_views.record(game)
+            await broadcast_game_state(game, service)
+
+        elif msg_type == "discard":
+            cards = data.get("cards", [])
+            result = await service.process_discard(player, cards)
+            game_views.record(game)
+            await websocket.send_json({
+                "type": "hand_updated",
+                "cards": result["remaining_cards"],
+            })
+            await manager.broadcast_to_game(
+                game.id,
+                {
+                    "type": "discard_complete",
+                    "player_seat": player.seat,
+                    "all_discarded": result["all_discarded"],
+                },
+            )
+            if result["all_discarded"]:
+                await broadcast_phase_change(game)
 
-        try:
-            if msg_type == "start_game":
-                if game.status != "waiting":
-                    raise ValueError("Game already started")
-                if len(game.players) < game.player_count:
-                    raise ValueError("Not enough players")
-                await service.start_round(game)
-                await broadcast_game_state(game, service)
-
-            elif msg_type == "discard":
-                cards = data.get("cards", [])
-                result = await service.process_discard(player, cards)
-                await websocket.send_json({
-                    "type": "hand_updated",
-                    "cards": result["remaining_cards"],
-                })
-                await manager.broadcast_to_game(
-                    game.id,
-                    {
-                        "type": "discard_complete",
-                        "player_seat": player.seat,
-                        "all_discarded": result["all_discarded"],
-                    },
-                )
-                if result["all_discarded"]:
-                    await broadcast_phase_change(game)
-
-            elif msg_type == "cut":
-                result = await service.process_cut(player)
-                await manager.broadcast_to_game(
-                    game.id,
-                    {
-                        "type": "cut_card",
-                        "card": result["cut_card"],
-                        "dealer_points": result["dealer_points"],
-                    },
-                )
+        elif msg_type == "cut":
+            result = await service.process_cut(player)
+            game_views.record(game)
+            await manager.broadcast_to_game(
+                game.id,
+                {
+                    "type": "cut_card",
+                    "card": result["cut_card"],
+                    "dealer_points": result["dealer_points"],
+                },
+            )
+            await broadcast_phase_change(game)
+            # Send valid plays to the player whose turn it is
+            await send_valid_plays_to_current_player(game, service)
+
+        elif msg_type == "peg":
+            card = data.get("card")
+            if not card:
+                raise ValueError("No card specified")
+            result = await service.process_peg(player, card)
+            game_views.record(game)
+            await manager.broadcast_to_game(
+                game.id,
+                {
+                    "type": "peg_play",
+                    "player_seat": result["player_seat"],
+                    "card": result["card"],
+                    "count": result["new_count"],
+                    "points": result["points"],
+                    "breakdown": result["breakdown"],
+                },
+            )
+            await broadcast_auto_gos(game, result["auto_gos"])
+            if result["phase"] == "hand_scoring":
+                await broadcast_round_transition(game, result)
+                if game.status == "finished" and game.tournament_id:
+                    notify_game_finished(game.tournament_id)
+            else:
                 await broadcast_phase_change(game)
-                # Send valid plays to the player whose turn it is
                 await send_valid_plays_to_current_player(game, service)
 
-            elif msg_type == "peg":
-                card = data.get("card")
-                if not card:
-                    raise ValueError("No card specified")
-                result = await service.process_peg(player, card)
-                await manager.broadcast_to_game(
-                    game.id,
-                    {
-                        "type": "peg_play",
-                        "player_seat": result["player_seat"],
-                        "card": result["card"],
-                        "count": result["new_count"],
-                        "points": result["points"],
-                        "breakdown": result["breakdown"],
-                    },
-                )
-                if result["phase"] == "hand_scoring":
-                    await broadcast_phase_change(game)
-                    # Auto-score hands
-                    score_results = await service.score_hands(game)
-                    for score_result in score_results:
-                        await manager.broadcast_to_game(
-                            game.id,
-                            {
-                                "type": "hand_scored" if not score_result.get("is_crib") else "crib_scored",
-                                "player_seat": score_result["player_seat"],
-                                "player_name": score_result["player_name"],
-                                "cards": score_result["cards"],
-                                "score": score_result["score"],
-                                "new_total": score_result["new_total"],
-                            },
-                        )
-                    if game.status == "finished":
-                        winner = max(game.players, key=lambda p: p.score)
-                        await manager.broadcast_to_game(
-                            game.id,
-                            {
-                                "type": "game_over",
-                                "winner_seat": winner.seat,
-                                "winner_name": winner.name,
-                                "final_scores": [p.score for p in sorted(game.players, key=lambda p: p.seat)],
-                            },
-                        )
-                    else:
-                        # Start new round
-                        await service.start_round(game)
-                        await broadcast_game_state(game, service)
-                else:
-                    await broadcast_phase_change(game)
-                    await send_valid_plays_to_current_player(game, service)
-
-            elif msg_type == "go":
-                result = await service.process_go(player)
-                await manager.broadcast_to_game(
-                    game.id,
-                    {
-                        "type": "peg_go",
-                        "player_seat": result["player_seat"],
-                    },
-                )
-                if result["phase"] != "pegging":
-                    await broadcast_phase_change(game)
-                else:
-                    await send_valid_plays_to_current_player(game, service)
-
-            elif msg_type == "sync":
-                await send_player_state(websocket, player, service)
-
+        elif msg_type == "go":
+            result = await service.process_go(player)
+            game_views.record(game)
+            await manager.broadcast_to_game(
+                game.id,
+                {
+                    "type": "peg_go",
+                    "player_seat": result["player_seat"],
+                },
+            )
+            await broadcast_auto_gos(game, result["auto_gos"])
+            if result["phase"] != "pegging":
+                await broadcast_phase_change(game)
             else:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": f"Unknown message type: {msg_type}",
-                })
+                await send_valid_plays_to_current_player(game, service)
+
+        elif msg_type == "sync":
+            game_views.record(game)
+            await send_player_state(websocket, player, service)
+
+        else:
+            await websocket.send_json({
+                "type": "error",
+                "message": f"Unknown message type: {msg_type}",
+            })
+
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+
+
+class _ClockSeat:
+    """Stands in for a player's socket while the turn clock moves for them:
+    replies reach the player if connected, and errors (the player got their
+    own move in first) are dropped."""
+
+    def __init__(self, session_token: str):
+        self.session_token = session_token
+
+    async def send_json(self, message: dict):
+        if message.get("type") != "error":
+            await manager.send_personal(self.session_token, message)
+
 
-        except ValueError as e:
-            await websocket.send_json({"type": "error", "message": str(e)})
+async def expire_turn(game_id: str, version: int):
+    """A turn clock ran out: make the moves the game is waiting on, as if
+    the players had sent them, or abandon a game nobody is playing."""
+    async with read_session() as session:
+        game, moves = await due_moves(session, game_id, version)
+    if not moves:
+        return
+    if (
+        turn_clocks.note_clock_move(game_id) > settings.turn_clock_abandon_moves
+        and not game.tournament_id
+        and game_id not in manager.active_connections
+    ):
+        game = await run_action(partial(_abandon, game.code), "clock")
+        await broadcast_phase_change(game)
+        return
+
+    seats = {p.session_token: p.seat for p in game.players}
+    for session_token, data in moves:
+        metrics.turn_clock_moves.inc(data["type"])
+        await manager.broadcast_to_game(
+            game_id,
+            {"type": "turn_expired", "player_seat": seats[session_token], "move": data["type"]},
+        )
+        try:
+            await run_action(
+                partial(_apply_message, data, session_token, _ClockSeat(session_token)), "clock"
+            )
+        except GameConflict:
+            pass
+
+
+async def _abandon(game_code: str, session: AsyncSession):
+    service = GameService(session)
+    game = await service.get_game_by_code(game_code)
+    if game.status == "playing":
+        await service.abandon_game(game)
+    return game
+
+
+async def broadcast_auto_gos(game, seats: list[int]):
+    """Announce Gos the server declared for players who could not play"""
+    for seat in seats:
+        await manager.broadcast_to_game(
+            game.id, {"type": "peg_go", "player_seat": seat, "auto": True}
+        )
 
 
 async def broadcast_game_state(game, service: GameService):
-    for player in game.players:
-        ws = manager.get_connection(player.session_token)
-        if ws:
-            await send_player_state(ws, player, service)
+    """Send each connected player its state_sync, and spectators the public
+    one, e.g. after a new deal."""
+    messages = {
+        player.session_token: await player_state(player, service)
+        for player in game.players
+        if manager.get_connection(player.session_token)
+    }
+    await manager.send_to_players(game.id, messages, spectator_state(public_game_state(game)))
+
+
+def phase_change_message(game) -> dict:
+    return {
+        "type": "phase_change",
+        "phase": game.current_phase,
+        "turn_seat": game.current_turn_seat,
+        "dealer_seat": game.current_dealer_seat,
+    }
 
 
 async def broadcast_phase_change(game):
-    await manager.broadcast_to_game(
+    await manager.broadcast_to_game(game.id, phase_change_message(game))
+
+
+async def broadcast_round_transition(game, result: dict):
+    """Send each socket one round_transition frame for a hand that the last
+    peg scored (and, unless the game ended, re-dealt) in its commit.
+
+    The frame carries the events clients would otherwise receive one by one
+    (phase_change to hand_scoring, hand_scored, crib_scored, game_over) and,
+    when play continues, the state_sync for the new deal.
+    """
+    events = [{
+        "type": "phase_change",
+        "phase": "hand_scoring",
+        "turn_seat": result["next_turn_seat"],
+        "dealer_seat": result["dealer_seat"],
+    }]
+    next_round = result["next_round"]
+    for score_result in result["scores"]:
+        events.append({
+            "type": "hand_scored" if not score_result.get("is_crib") else "crib_scored",
+            "player_seat": score_result["player_seat"],
+            "player_name": score_result["player_name"],
+            "cards": score_result["cards"],
+            "score": score_result["score"],
+            "new_total": score_result["new_total"],
+        })
+
+    if next_round is None:
+        winner = max(game.players, key=lambda p: p.score)
+        events.append({
+            "type": "game_over",
+            "winner_seat": winner.seat,
+            "winner_name": winner.name,
+            "final_scores": [p.score for p in sorted(game.players, key=lambda p: p.seat)],
+        })
+        await manager.broadcast_to_game(game.id, {"type": "round_transition", "events": events})
+        return
+
+    public = public_game_state(game)
+    hands = {h.player_id: json.loads(h.dealt_cards) for h in next_round.hands}
+    hand_cache.put(game.id, game.version, hands)
+    await manager.send_to_players(
         game.id,
         {
-            "type": "phase_change",
-            "phase": game.current_phase,
-            "turn_seat": game.current_turn_seat,
-            "dealer_seat": game.current_dealer_seat,
+            p.session_token: {
+                "type": "round_transition",
+                "events": events,
+                "state": {
+                    "type": "state_sync",
+                    "game": public,
+                    "your_hand": hands.get(p.id, []),
+                    "your_seat": p.seat,
+                    "your_id": p.id,
+                },
+            }
+            for p in game.players
         },
+        {"type": "round_transition", "events": events, "state": spectator_state(public)},
     )
 
 
@@ -0,0 +1,105 @@
+"""Batched hand analysis behind POST /api/analyze.
+
+Results are cached per canonical hand (suits renamed, see
+game_logic.analysis), so the same hand in another suit, or asked again by
+another user, is free. A batch's cache misses run inline when they add up
+to a few milliseconds of work; bigger ones go to a process pool so they
+don't hold up the event loop (and every game on it).
+"""
+import asyncio
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from ..config import settings
+from ..game_logic import analysis
+from . import metrics
+
+# (canonical cards, canonical cut, is_crib)
+Key = tuple[tuple[str, ...], str | None, bool]
+
+
+class HandAnalyzer:
+    def __init__(self, cache_size: int, workers: int, inline_max: int):
+        self.cache_size = cache_size
+        self.workers = workers
+        self.inline_max = inline_max
+        self._cache: OrderedDict[Key, dict] = OrderedDict()
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def analyze(self, hands: list[tuple[list[str], str | None, bool]]) -> list[dict]:
+        """One result per (cards, cut, is_crib), or {"error": ...} for a
+        hand that isn't valid."""
+        keys: list[tuple[Key, dict[str, str]] | None] = []
+        errors: dict[int, str] = {}
+        found: dict[Key, dict] = {}
+        misses: dict[Key, None] = {}
+        for i, (cards, cut, is_crib) in enumerate(hands):
+            try:
+                analysis.validate(cards, cut)
+            except ValueError as e:
+                errors[i] = str(e)
+                keys.append(None)
+                continue
+            (canon_cards, canon_cut), suits = analysis.canonical(cards, cut)
+            key = (canon_cards, canon_cut, is_crib)
+            keys.append((key, suits))
+            if key in found:
+                continue
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                found[key] = self._cache[key]
+                metrics.analyze_cache.inc("hit")
+            elif key not in misses:
+                misses[key] = None
+                metrics.analyze_cache.inc("miss")
+
+        if misses:
+            for key, result in zip(misses, await self._run(list(misses))):
+                found[key] = result
+                self._remember(key, result)
+
+        results = []
+        for i, entry in enumerate(keys):
+            if entry is None:
+                results.append({"error": errors[i]})
+                continue
+            key, suits = entry
+            results.append(analysis.relabel(found[key], suits))
+        return results
+
+    async def _run(self, keys: list[Key]) -> list[dict]:
+        work = sum(analysis.cost(len(cards), cut is not None) for cards, cut, _ in keys)
+        if work <= self.inline_max or self.workers <= 0:
+            return analysis.analyze_many(keys)
+        if self._pool is None:
+            # Spawned, not forked: the server process has threads and sockets
+            self._pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        size = -(-len(keys) // self.workers)
+        chunks = [keys[i:i + size] for i in range(0, len(keys), size)]
+        done = await asyncio.gather(
+            *(loop.run_in_executor(self._pool, analysis.analyze_many, chunk) for chunk in chunks)
+        )
+        return [result for chunk in done for result in chunk]
+
+    def _remember(self, key: Key, result: dict):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+analyzer = HandAnalyzer(
+    settings.analyze_cache_size,
+    settings.analyze_workers if settings.analyze_workers is not None else os.cpu_count() or 1,
+    settings.analyze_inline_max,
+)
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, or_, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..config import settings
+from ..database import archive_session, async_session
+from ..models import ArchivedGameDB, GameDB, PlayerDB, PlayerHandDB, RoundDB, TournamentDB
+from ..sharding import per_shard
+from .game_cache import game_info_cache
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_game(game: GameDB) -> dict:
+    """Full history of a game with its JSON columns decoded."""
+    seats = {p.id: p.seat for p in game.players}
+    return {
+        "code": game.code,
+        "status": game.status,
+        "player_count": game.player_count,
+        "is_teams": game.is_teams,
+        "auto_go": game.auto_go,
+        "created_at": game.created_at.isoformat(),
+        "updated_at": game.updated_at.isoformat(),
+        "players": [
+            {"name": p.name, "seat": p.seat, "team": p.team, "score": p.score}
+            for p in sorted(game.players, key=lambda p: p.seat)
+        ],
+        "rounds": [
+            {
+                "round_number": r.round_number,
+                "dealer_seat": r.dealer_seat,
+                "cut_card": r.cut_card,
+                "crib_cards": json.loads(r.crib_cards),
+                "crib_score": r.crib_score,
+                "peg_history": json.loads(r.peg_history),
+                "hands": [
+                    {
+                        "seat": seats.get(h.player_id),
+                        "dealt_cards": json.loads(h.dealt_cards),
+                        "pegged_cards": json.loads(h.pegged_cards),
+                        "hand_score": h.hand_score,
+                        "peg_points": h.peg_points,
+                    }
+                    for h in sorted(r.hands, key=lambda h: seats.get(h.player_id, 0))
+                ],
+            }
+            for r in sorted(game.rounds, key=lambda r: r.round_number)
+        ],
+    }
+
+
+class ArchiveService:
+    def __init__(self, session: AsyncSession, archive: AsyncSession):
+        self.session = session
+        self.archive = archive
+
+    @staticmethod
+    def archivable():
+        """Games done with for good: finished or abandoned a while ago, or
+        left waiting past their TTL, and not a table of a running tournament
+        (which still looks its tables up by game id)."""
+        now = datetime.utcnow()
+        finished_before = now - timedelta(minutes=settings.archive_finished_after_minutes)
+        waiting_before = now - timedelta(hours=settings.archive_waiting_ttl_hours)
+        running = select(TournamentDB.id).where(TournamentDB.status == "running")
+        return and_(
+            or_(
+                and_(
+                    GameDB.status.in_(("finished", "abandoned")),
+                    GameDB.updated_at < finished_before,
+                ),
+                and_(GameDB.status == "waiting", GameDB.updated_at < waiting_before),
+            ),
+            or_(GameDB.tournament_id.is_(None), GameDB.tournament_id.not_in(running)),
+        )
+
+    async def find_archivable(self, limit: int) -> list[str]:
+        game_ids: list[str] = []
+        for stmt in per_shard(select(GameDB.id).where(self.archivable())):
+            result = await self.session.execute(stmt.limit(limit - len(game_ids)))
+            game_ids.extend(result.scalars().all())
+            if len(game_ids) >= limit:
+                break
+        return game_ids
+
+    async def archive_batch(self, limit: int) -> int:
+        """Move up to ``limit`` games to the archive. Returns how many moved."""
+        game_ids = await self.find_archivable(limit)
+        if not game_ids:
+            return 0
+
+        result = await self.session.execute(
+            select(GameDB)
+            .where(GameDB.id.in_(game_ids))
+            .options(
+                selectinload(GameDB.players),
+                selectinload(GameDB.rounds).selectinload(RoundDB.hands),
+            )
+        )
+        games = list(result.scalars().all())
+        now = datetime.utcnow()
+        rows = [
+            {
+                "code": game.code,
+                "game_id": game.id,
+                "status": game.status,
+                "created_at": game.created_at,
+                "ended_at": game.updated_at,
+                "archived_at": now,
+                "payload": zlib.compress(
+                    json.dumps(serialize_game(game), separators=(",", ":")).encode()
+                ),
+            }
+            for game in games
+        ]
+
+        # Write the archive first: a crash between the two commits leaves a
+        # game in both stores, and the next run simply archives it again.
+        stmt = insert(ArchivedGameDB).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ArchivedGameDB.code],
+            set_={c: stmt.excluded[c] for c in rows[0] if c != "code"},
+        )
+        await self.archive.execute(stmt)
+        await self.archive.commit()
+
+        # Only drop games still at the version that was archived and still
+        # archivable: one joined or played since then stays where it is.
+        result = await self.session.execute(
+            delete(GameDB)
+            .where(
+                tuple_(GameDB.id, GameDB.version).in_([(g.id, g.version) for g in games]),
+                self.archivable(),
+            )
+            .returning(GameDB.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = set(result.scalars().all())
+        if deleted:
+            round_ids = select(RoundDB.id).where(RoundDB.game_id.in_(deleted))
+            await self.session.execute(
+                delete(PlayerHandDB).where(PlayerHandDB.round_id.in_(round_ids))
+            )
+            await self.session.execute(delete(RoundDB).where(RoundDB.game_id.in_(deleted)))
+            await self.session.execute(delete(PlayerDB).where(PlayerDB.game_id.in_(deleted)))
+        await self.session.commit()
+        self.session.expunge_all()
+
+        kept = [game.id for game in games if game.id not in deleted]
+        if kept:
+            await self.archive.execute(
+                delete(ArchivedGameDB).where(ArchivedGameDB.game_id.in_(kept))
+            )
+            await self.archive.commit()
+        for game in games:
+            if game.id in deleted:
+                game_info_cache.evict(game.code)
+        return len(deleted)
+
+    async def get_archived_game(self, code: str) -> dict | None:
+        result = await self.archive.execute(
+            select(ArchivedGameDB.payload).where(ArchivedGameDB.code == code)
+        )
+        payload = result.scalar_one_or_none()
+        if payload is None:
+            return None
+        return json.loads(zlib.decompress(payload))
+
+    async def purge_expired(self) -> int:
+        if settings.archive_retention_days <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=settings.archive_retention_days)
+        result = await self.archive.execute(
+            delete(ArchivedGameDB).where(ArchivedGameDB.archived_at < cutoff)
+        )
+        await self.archive.commit()
+        return result.rowcount
+
+
+async def run_archiver():
+    """Periodically move finished and abandoned games out of the hot tables."""
+    while True:
+        await asyncio.sleep(settings.archive_interval)
+        try:
+            async with async_session() as session, archive_session() as archive:
+                service = ArchiveService(session, archive)
+                moved = 0
+                while True:
+                    batch = await service.archive_batch(settings.archive_batch_size)
+                    moved += batch
+                    if batch < settings.archive_batch_size:
+                        break
+                    # Let live traffic at the writer between batches
+                    await asyncio.sleep(0)
+                purged = await service.purge_expired()
+            if moved or purged:
+                logger.info("Archived %d games, purged %d", moved, purged)
+        except Exception:
+            logger.exception("Archive run failed")
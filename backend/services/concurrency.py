@@ -0,0 +1,52 @@
+"""Optimistic concurrency for game actions.
+
+GameDB carries a version that every UPDATE checks and bumps, and every
+action updates its game's row (GameService._claim). An action that read a
+game before a concurrent action on it committed therefore fails at flush
+with StaleDataError instead of silently overwriting the other's changes.
+Nothing has been committed or sent at that point, so the action is simply
+run again against fresh state. The same goes for SQLITE_BUSY: in WAL mode
+a transaction that read before another writer committed cannot become a
+writer itself, and fails at once rather than waiting out busy_timeout.
+After CRIBBAGE_ACTION_CONFLICT_RETRIES retries the caller gets GameConflict,
+which clients may resend.
+"""
+import asyncio
+import random
+import traceback
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..config import settings
+from . import metrics
+from .group_commit import action_session
+
+T = TypeVar("T")
+
+
+class GameConflict(Exception):
+    """The game kept changing under an action; it is safe to send again."""
+
+
+async def run_action(action: Callable[[AsyncSession], Awaitable[T]], label: str) -> T:
+    """Run ``action`` in a fresh action session, starting it over whenever
+    it loses a race with another action on the same game."""
+    for attempt in range(settings.action_conflict_retries + 1):
+        try:
+            async with action_session() as session:
+                return await action(session)
+        except (StaleDataError, OperationalError) as e:
+            if isinstance(e, OperationalError) and "database is locked" not in str(e.orig):
+                raise
+            # The failed statement's cursor is only reachable from the
+            # traceback; free it now, while its connection is idle, rather
+            # than from a GC pass on the event loop that may wait out
+            # another session's busy_timeout on the same connection
+            traceback.clear_frames(e.__traceback__)
+            metrics.action_conflicts.inc(label)
+            # Spread the losers out so they don't collide again
+            await asyncio.sleep(random.uniform(0, 0.002 * 2 ** attempt))
+    raise GameConflict("The game changed while your move was applied; please retry")
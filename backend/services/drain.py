@@ -0,0 +1,202 @@
+"""Graceful restarts: drain on SIGTERM, pre-warm on startup.
+
+On SIGTERM the server stops taking new games and sockets, waits for the
+actions already running to commit, marks every seated player disconnected
+in a few bulk UPDATEs, and closes each socket (code 1012) after telling
+its client when to come back: ``reconnect_after`` milliseconds, spread
+at random over CRIBBAGE_DRAIN_RECONNECT_WINDOW so the reconnects arrive
+as a trickle instead of all at once. Only then does uvicorn get the
+signal and shut down as usual. A second SIGTERM, or SIGINT, skips the
+drain.
+
+On startup, games played in the last CRIBBAGE_PREWARM_MINUTES have their
+current hands and phase loaded in bulk, so the reconnect wave's
+state_sync frames and message checks come from memory. Taking the seat
+still reads the player and game and commits the player as connected:
+that write has to happen anyway, and the game's state must be current
+whichever worker last changed it.
+"""
+import asyncio
+import json
+import logging
+import random
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from ..config import settings
+from ..database import read_session
+from ..models import GameDB, PlayerDB, PlayerHandDB, RoundDB
+from .game_cache import hand_cache
+from .game_service import GameService
+from .group_commit import action_session
+from .message_guard import game_views
+from .websocket_manager import encode, manager
+
+logger = logging.getLogger(__name__)
+
+# Closing code for "service restart"; clients should reconnect
+SERVICE_RESTART = 1012
+
+
+class Drainer:
+    def __init__(self):
+        self.active = False
+        self.inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: asyncio.Task | None = None
+
+    @contextmanager
+    def track(self):
+        """Count a running action, so the drain can wait for it."""
+        self.inflight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            if not self.inflight:
+                self._idle.set()
+
+    def install(self):
+        """Drain before passing SIGTERM on to the current handler (uvicorn's)."""
+        # Signal handlers can only be set from the main thread
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+        if not callable(previous):
+            return
+        loop = asyncio.get_running_loop()
+
+        def on_sigterm(sig, frame):
+            if self.active:
+                previous(sig, frame)
+                return
+            self.active = True
+            loop.call_soon_threadsafe(self._start, lambda: previous(sig, frame))
+
+        signal.signal(signal.SIGTERM, on_sigterm)
+
+    def _start(self, then):
+        async def drain_then_exit():
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Drain failed")
+            then()
+
+        self._task = asyncio.create_task(drain_then_exit())
+
+    async def drain(self):
+        self.active = True
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._idle.wait(), settings.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Drain: %d actions still running after %.0fs", self.inflight, settings.drain_timeout
+            )
+
+        # Forget the sockets first, so their handlers don't each write a
+        # disconnect on the way out
+        closing = []
+        for token in list(manager.session_games):
+            ws = manager.get_connection(token)
+            if ws is not None and manager.disconnect(token):
+                closing.append((token, ws))
+
+        tokens = [token for token, _ in closing]
+        batch_size = settings.ws_reap_batch_size
+        async with action_session() as session:
+            service = GameService(session)
+            for i in range(0, len(tokens), batch_size):
+                await service.mark_tokens_disconnected(tokens[i:i + batch_size])
+
+        spectators = [
+            spectator.websocket
+            for feed in manager.feeds.values()
+            for spectator in list(feed.spectators)
+        ]
+        window = settings.drain_reconnect_window * 1000
+        await asyncio.gather(
+            *(_send_off(ws, random.uniform(0, window)) for _, ws in closing),
+            *(_send_off(ws, random.uniform(0, window)) for ws in spectators),
+        )
+        logger.info(
+            "Drained %d players and %d spectators in %.1fs",
+            len(closing), len(spectators), time.monotonic() - start,
+        )
+
+
+async def _send_off(websocket, delay_ms: float):
+    try:
+        await websocket.send_text(encode({"type": "server_restart", "reconnect_after": round(delay_ms)}))
+        await websocket.close(code=SERVICE_RESTART, reason="Server restarting")
+    except Exception:
+        pass
+
+
+drainer = Drainer()
+
+
+def refuse_while_draining():
+    """Dependency for endpoints that create games: none start on a server
+    that is about to restart."""
+    if drainer.active:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is restarting",
+            headers={"Retry-After": str(round(settings.drain_reconnect_window))},
+        )
+
+
+async def prewarm() -> int:
+    """Load hands and phase for recently played games; returns how many."""
+    if settings.prewarm_minutes <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.prewarm_minutes)
+    async with read_session() as session:
+        games = (await session.execute(
+            select(GameDB)
+            .where(
+                GameDB.status == "playing",
+                GameDB.id.in_(select(PlayerDB.game_id).where(PlayerDB.last_seen >= cutoff)),
+            )
+            .options(selectinload(GameDB.players))
+        )).scalars().all()
+
+        batch_size = 500
+        for i in range(0, len(games), batch_size):
+            batch = {game.id: game for game in games[i:i + batch_size]}
+            # Each game's latest round and its hands
+            latest = (
+                select(RoundDB.game_id, RoundDB.id)
+                .where(RoundDB.game_id.in_(batch))
+                .order_by(RoundDB.game_id, RoundDB.round_number.desc())
+                .execution_options(per_shard_order=True)
+            )
+            rounds = {}
+            for game_id, round_id in (await session.execute(latest)).all():
+                rounds.setdefault(game_id, round_id)
+            hands: dict[str, dict[str, list[str]]] = {game_id: {} for game_id in rounds}
+            rows = await session.execute(
+                select(RoundDB.game_id, PlayerHandDB.player_id, PlayerHandDB.current_cards)
+                .select_from(PlayerHandDB)
+                .join(RoundDB, PlayerHandDB.round_id == RoundDB.id)
+                .where(PlayerHandDB.round_id.in_(rounds.values()))
+            )
+            for game_id, player_id, cards in rows.all():
+                hands[game_id][player_id] = json.loads(cards)
+            for game_id, game in batch.items():
+                if game_id in hands:
+                    hand_cache.put(game_id, game.version, hands[game_id])
+                game_views.record(game)
+    logger.info("Pre-warmed %d games", len(games))
+    return len(games)
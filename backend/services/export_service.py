@@ -0,0 +1,267 @@
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import ArchivedGameDB, GameDB, PlayerDB, PlayerHandDB, RoundDB
+from ..sharding import merge_sorted, per_shard
+
+# Rows fetched per cursor round trip while streaming
+STREAM_CHUNK_ROWS = 500
+# Archive blobs fetched per round trip; each is a whole game
+ARCHIVE_CHUNK_ROWS = 100
+
+# Only games nobody is playing any more are exported: a live game's
+# rounds would show every player's hand
+EXPORTABLE_STATUSES = ("finished", "abandoned")
+
+
+class ExportService:
+    """Streams game histories as plain dicts, one game or round at a time,
+    from the hot tables and, given an archive session, the archive."""
+
+    def __init__(self, session: AsyncSession, archive: AsyncSession | None = None):
+        self.session = session
+        self.archive = archive
+
+    async def get_status(self, code: str) -> str | None:
+        result = await self.session.execute(select(GameDB.status).where(GameDB.code == code))
+        status = result.scalar_one_or_none()
+        if status is None and self.archive is not None:
+            result = await self.archive.execute(
+                select(ArchivedGameDB.status).where(ArchivedGameDB.code == code)
+            )
+            status = result.scalar_one_or_none()
+        return status
+
+    async def stream_history(
+        self,
+        code: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        status: str | None = None,
+    ) -> AsyncIterator[dict]:
+        """Yield a "game" record, then one "round" record per round, per
+        finished or abandoned game, in order of creation. Games the
+        archiver has moved out of the hot tables are read back from their
+        archive blobs and merged in."""
+        filters = (code, since, until, status)
+        games = [self._hot_games(*filters)]
+        if self.archive is not None:
+            games.append(self._archived_games(*filters))
+        async for _, records in merge_sorted(games, key=lambda game: game[0]):
+            for record in records:
+                yield record
+
+    async def _hot_games(self, code, since, until, status) -> AsyncIterator[tuple]:
+        """((created_at, game id), records) per game in the hot tables.
+
+        Runs as one flat query over games x players x rounds x hands, read
+        through a cursor in chunks and grouped per round as it arrives, so
+        memory stays constant however many games match. With sharded
+        storage each shard streams its games and the streams are merged.
+        """
+        conditions = [GameDB.status.in_(EXPORTABLE_STATUSES)]
+        if code is not None:
+            conditions.append(GameDB.code == code)
+        if since is not None:
+            conditions.append(GameDB.created_at >= since)
+        if until is not None:
+            conditions.append(GameDB.created_at < until)
+        if status is not None:
+            conditions.append(GameDB.status == status)
+
+        stmt = (
+            select(
+                GameDB.id.label("game_id"),
+                GameDB.code,
+                GameDB.status,
+                GameDB.player_count,
+                GameDB.is_teams,
+                GameDB.created_at,
+                GameDB.updated_at,
+                PlayerDB.seat,
+                PlayerDB.name,
+                PlayerDB.team,
+                PlayerDB.score,
+                RoundDB.round_number,
+                RoundDB.dealer_seat,
+                RoundDB.cut_card,
+                RoundDB.crib_cards,
+                RoundDB.crib_score,
+                RoundDB.peg_history,
+                PlayerHandDB.dealt_cards,
+                PlayerHandDB.current_cards,
+                PlayerHandDB.pegged_cards,
+                PlayerHandDB.hand_score,
+                PlayerHandDB.peg_points,
+            )
+            .select_from(GameDB)
+            .join(PlayerDB, PlayerDB.game_id == GameDB.id)
+            .outerjoin(RoundDB, RoundDB.game_id == GameDB.id)
+            .outerjoin(
+                PlayerHandDB,
+                and_(
+                    PlayerHandDB.round_id == RoundDB.id,
+                    PlayerHandDB.player_id == PlayerDB.id,
+                ),
+            )
+            .where(*conditions)
+            .order_by(GameDB.created_at, GameDB.id, RoundDB.round_number, PlayerDB.seat)
+            .execution_options(yield_per=STREAM_CHUNK_ROWS)
+        )
+
+        # A game's rows all come from one shard, in order
+        result = merge_sorted(
+            [aiter(await self.session.stream(shard_stmt)) for shard_stmt in per_shard(stmt)],
+            key=lambda row: (row.created_at, row.game_id),
+        )
+        records: list[dict] = []
+        group: list = []
+        async for row in result:
+            if group and (row.game_id, row.round_number) != (
+                group[0].game_id,
+                group[0].round_number,
+            ):
+                records = _add_group(records, group)
+                if row.game_id != group[0].game_id:
+                    yield (group[0].created_at, group[0].game_id), records
+                    records = []
+                group = []
+            group.append(row)
+
+        if group:
+            yield (group[0].created_at, group[0].game_id), _add_group(records, group)
+
+    async def _archived_games(self, code, since, until, status) -> AsyncIterator[tuple]:
+        """((created_at, game id), records) per archived game."""
+        conditions = [ArchivedGameDB.status.in_(EXPORTABLE_STATUSES)]
+        if code is not None:
+            conditions.append(ArchivedGameDB.code == code)
+        if since is not None:
+            conditions.append(ArchivedGameDB.created_at >= since)
+        if until is not None:
+            conditions.append(ArchivedGameDB.created_at < until)
+        if status is not None:
+            conditions.append(ArchivedGameDB.status == status)
+
+        result = await self.archive.stream(
+            select(ArchivedGameDB.game_id, ArchivedGameDB.created_at, ArchivedGameDB.payload)
+            .where(*conditions)
+            .order_by(ArchivedGameDB.created_at, ArchivedGameDB.game_id)
+            .execution_options(yield_per=ARCHIVE_CHUNK_ROWS)
+        )
+        async for rows in result.partitions():
+            # A crash mid-archive can leave a game in both stores; the hot
+            # copy is the one exported
+            hot = set((await self.session.execute(
+                select(GameDB.id).where(GameDB.id.in_([row.game_id for row in rows]))
+            )).scalars())
+            for row in rows:
+                if row.game_id not in hot:
+                    game = json.loads(zlib.decompress(row.payload))
+                    yield (row.created_at, row.game_id), _archived_records(game)
+
+
+def _add_group(records: list[dict], group: list) -> list[dict]:
+    """``records`` with the game record (if it is the game's first group)
+    and the round record of one (game, round) group of rows."""
+    if not records:
+        records.append(_game_record(group))
+    if group[0].round_number is not None:
+        records.append(_round_record(group))
+    return records
+
+
+def _game_record(rows: list) -> dict:
+    first = rows[0]
+    return {
+        "type": "game",
+        "code": first.code,
+        "status": first.status,
+        "player_count": first.player_count,
+        "is_teams": first.is_teams,
+        "created_at": first.created_at.isoformat(),
+        "updated_at": first.updated_at.isoformat(),
+        "players": [
+            {"seat": r.seat, "name": r.name, "team": r.team, "score": r.score}
+            for r in rows
+        ],
+    }
+
+
+def _round_record(rows: list) -> dict:
+    first = rows[0]
+    hands = []
+    for r in rows:
+        if r.dealt_cards is None:
+            continue
+        dealt = json.loads(r.dealt_cards)
+        kept = json.loads(r.pegged_cards) + json.loads(r.current_cards)
+        hands.append({
+            "seat": r.seat,
+            "dealt": dealt,
+            "discarded": [c for c in dealt if c not in kept],
+            "kept": kept,
+            "hand_score": r.hand_score,
+            "peg_points": r.peg_points,
+        })
+    return {
+        "type": "round",
+        "code": first.code,
+        "round_number": first.round_number,
+        "dealer_seat": first.dealer_seat,
+        "cut_card": first.cut_card,
+        "hands": hands,
+        "crib": json.loads(first.crib_cards),
+        "crib_score": first.crib_score,
+        "pegging": json.loads(first.peg_history),
+    }
+
+
+def _archived_records(game: dict) -> list[dict]:
+    """The same records, rebuilt from a game's archive blob (see
+    archive_service.serialize_game)."""
+    records = [{
+        "type": "game",
+        "code": game["code"],
+        "status": game["status"],
+        "player_count": game["player_count"],
+        "is_teams": game["is_teams"],
+        "created_at": game["created_at"],
+        "updated_at": game["updated_at"],
+        "players": [
+            {"seat": p["seat"], "name": p["name"], "team": p["team"], "score": p["score"]}
+            for p in game["players"]
+        ],
+    }]
+    for r in game["rounds"]:
+        crib = r["crib_cards"]
+        hands = []
+        for h in r["hands"]:
+            dealt, pegged = h["dealt_cards"], h["pegged_cards"]
+            # The blob has no current cards: they are the kept ones not yet pegged
+            kept = pegged + [c for c in dealt if c not in crib and c not in pegged]
+            hands.append({
+                "seat": h["seat"],
+                "dealt": dealt,
+                "discarded": [c for c in dealt if c not in kept],
+                "kept": kept,
+                "hand_score": h["hand_score"],
+                "peg_points": h["peg_points"],
+            })
+        records.append({
+            "type": "round",
+            "code": game["code"],
+            "round_number": r["round_number"],
+            "dealer_seat": r["dealer_seat"],
+            "cut_card": r["cut_card"],
+            "hands": hands,
+            "crib": crib,
+            "crib_score": r["crib_score"],
+            "pegging": r["peg_history"],
+        })
+    return records
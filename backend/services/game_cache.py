@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from typing import Iterable, NamedTuple
+
+from ..config import settings
+
+
+def make_etag(game_id: str, version: int, connected_seats: Iterable[int]) -> str:
+    """ETag of a game's GameInfo, built only from persisted state so every
+    worker agrees on it. Every change to the game bumps GameDB.version
+    except players (dis)connecting, which the seat mask covers."""
+    mask = sum(1 << seat for seat in connected_seats)
+    return f'"{game_id[:8]}-{version}-{mask:x}"'
+
+
+class CachedGameInfo(NamedTuple):
+    game_id: str
+    etag: str
+    body: bytes
+
+
+class GameInfoCache:
+    """Serialized GameInfo per game code, valid while its ETag still matches
+    the game's persisted state."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedGameInfo] = OrderedDict()
+
+    def get(self, code: str, etag: str) -> CachedGameInfo | None:
+        entry = self._entries.get(code)
+        if entry is None or entry.etag != etag:
+            return None
+        self._entries.move_to_end(code)
+        return entry
+
+    def put(self, code: str, game_id: str, etag: str, body: bytes) -> CachedGameInfo:
+        entry = CachedGameInfo(game_id, etag, body)
+        self._entries[code] = entry
+        self._entries.move_to_end(code)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def evict(self, code: str):
+        self._entries.pop(code, None)
+
+    def evict_games(self, game_ids: set[str]):
+        for code in [code for code, entry in self._entries.items() if entry.game_id in game_ids]:
+            self.evict(code)
+
+
+game_info_cache = GameInfoCache(settings.game_info_cache_size)
+
+
+class HandCache:
+    """Players' current cards per game, valid at one GameDB.version.
+
+    Every action that changes a hand claims its game (GameService._claim),
+    so cards cached at a version stay right for as long as the game is
+    still at it. Lets a reconnecting player's state_sync skip the hand
+    query; filled when a round is dealt and by the startup pre-warm.
+    """
+
+    def __init__(self, max_games: int):
+        self.max_games = max_games
+        self._entries: OrderedDict[str, tuple[int, dict[str, list[str]]]] = OrderedDict()
+
+    def get(self, game_id: str, version: int, player_id: str) -> list[str] | None:
+        entry = self._entries.get(game_id)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(game_id)
+        return entry[1].get(player_id)
+
+    def put(self, game_id: str, version: int, hands: dict[str, list[str]]):
+        self._entries[game_id] = (version, hands)
+        self._entries.move_to_end(game_id)
+        while len(self._entries) > self.max_games:
+            self._entries.popitem(last=False)
+
+    def evict(self, game_id: str):
+        self._entries.pop(game_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+hand_cache = HandCache(settings.game_info_cache_size)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
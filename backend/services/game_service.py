@@ -2,14 +2,19 @@ import json
 import secrets
 from datetime import datetime
 from uuid import uuid4
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
 from ..models import GameDB, PlayerDB, RoundDB, PlayerHandDB
 from ..game_logic import deck, pegging, scoring
+from ..game_logic.stats import StatsDelta
+from .game_cache import make_etag
+from .metrics import instrumented
+from .stats_service import StatsService
 
 
+@instrumented
 class GameService:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -28,8 +33,14 @@ class GameService:
                 return h
         return None
 
+    def _claim(self, game: GameDB):
+        """Make this action's commit update the game row, so it only applies
+        if nobody else changed the game since we read it (StaleDataError
+        otherwise). Every action that changes a game must call this."""
+        game.updated_at = datetime.utcnow()
+
     async def create_game(
-        self, player_count: int, creator_name: str
+        self, player_count: int, creator_name: str, auto_go: bool = True
     ) -> tuple[GameDB, PlayerDB]:
         if player_count not in (2, 3, 4):
             raise ValueError("Player count must be 2, 3, or 4")
@@ -41,6 +52,7 @@ class GameService:
             player_count=player_count,
             is_teams=(player_count == 4),
             current_phase="waiting",
+            auto_go=auto_go,
         )
 
         player = PlayerDB(
@@ -59,6 +71,48 @@ class GameService:
         await self.session.refresh(player)
         return game, player
 
+    def create_tables(
+        self,
+        seatings: list[list[str]],
+        auto_go: bool = True,
+        tournament_id: str | None = None,
+        tournament_round: int | None = None,
+    ) -> list[GameDB]:
+        """Add full, dealt games to the session without committing, one per
+        list of player names (in seat order), so any number of tables costs
+        one transaction and no refreshes."""
+        games = []
+        for names in seatings:
+            if len(names) not in (2, 3, 4):
+                raise ValueError("Tables must seat 2, 3, or 4 players")
+            game = GameDB(
+                id=str(uuid4()),
+                code=secrets.token_urlsafe(6)[:8],
+                status="playing",
+                player_count=len(names),
+                is_teams=(len(names) == 4),
+                current_dealer_seat=0,
+                current_phase="discard",
+                peg_count=0,
+                auto_go=auto_go,
+                tournament_id=tournament_id,
+                tournament_round=tournament_round,
+            )
+            for seat, name in enumerate(names):
+                game.players.append(PlayerDB(
+                    id=str(uuid4()),
+                    session_token=secrets.token_hex(32),
+                    name=name[:50],
+                    seat=seat,
+                    team=seat % 2 if game.is_teams else None,
+                    score=0,
+                    is_connected=False,
+                ))
+            self.session.add(game)
+            self._deal_round(game)
+            games.append(game)
+        return games
+
     async def get_game_by_code(self, code: str) -> GameDB | None:
         result = await self.session.execute(
             select(GameDB)
@@ -67,6 +121,19 @@ class GameService:
         )
         return result.scalar_one_or_none()
 
+    async def get_game_etag(self, code: str) -> str | None:
+        """The GameInfo ETag from the game's persisted version and
+        connected seats, without loading the game."""
+        result = await self.session.execute(
+            select(GameDB.id, GameDB.version, PlayerDB.seat, PlayerDB.is_connected)
+            .outerjoin(PlayerDB, PlayerDB.game_id == GameDB.id)
+            .where(GameDB.code == code)
+        )
+        rows = result.all()
+        if not rows:
+            return None
+        return make_etag(rows[0].id, rows[0].version, (r.seat for r in rows if r.is_connected))
+
     async def get_player_by_token(self, token: str) -> PlayerDB | None:
         result = await self.session.execute(
             select(PlayerDB)
@@ -78,6 +145,41 @@ class GameService:
         )
         return result.scalar_one_or_none()
 
+    async def get_active_games_for_tokens(self, tokens: list[str]) -> list:
+        """Unfinished games for a set of session tokens, in one query.
+
+        Returns rows with only the fields ActiveGameInfo needs, in the
+        order the tokens were given.
+        """
+        if not tokens:
+            return []
+        seated = aliased(PlayerDB)
+        current_players = (
+            select(func.count(seated.id))
+            .where(seated.game_id == GameDB.id)
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            select(
+                PlayerDB.session_token,
+                PlayerDB.name,
+                PlayerDB.seat,
+                GameDB.code,
+                GameDB.status,
+                GameDB.player_count,
+                GameDB.current_phase,
+                GameDB.updated_at,
+                current_players.label("current_players"),
+            )
+            .join(GameDB, PlayerDB.game_id == GameDB.id)
+            .where(
+                PlayerDB.session_token.in_(tokens),
+                GameDB.status.not_in(("finished", "abandoned")),
+            )
+        )
+        rows = {row.session_token: row for row in result}
+        return [rows[t] for t in dict.fromkeys(tokens) if t in rows]
+
     async def join_game(
         self, game_code: str, player_name: str
     ) -> tuple[GameDB, PlayerDB]:
@@ -105,22 +207,22 @@ class GameService:
         # Reload game with updated players list
         await self.session.refresh(game, ["players"])
 
-        # Start game if full
-        game_started = False
+        # Start game if full, dealing in the same commit
+        self._claim(game)
         if len(game.players) == game.player_count:
             game.status = "playing"
-            game_started = True
+            self._deal_round(game)
 
         await self.session.commit()
-        await self.session.refresh(player)
-
-        # Deal cards after commit so all players are available
-        if game_started:
-            await self.start_round(game)
-
         return game, player
 
     async def start_round(self, game: GameDB) -> RoundDB:
+        game_round = self._deal_round(game)
+        await self.session.commit()
+        return game_round
+
+    def _deal_round(self, game: GameDB) -> RoundDB:
+        """Deal a new round into the session without flushing or committing"""
         full_deck = deck.create_deck()
         shuffled = deck.shuffle_deck(full_deck)
         hands, remaining = deck.deal_hands(shuffled, game.player_count)
@@ -128,29 +230,31 @@ class GameService:
         round_num = len(game.rounds) + 1
         game_round = RoundDB(
             id=str(uuid4()),
-            game_id=game.id,
             round_number=round_num,
             dealer_seat=game.current_dealer_seat,
             deck_state=json.dumps(remaining),
+            crib_cards="[]",
+            peg_history="[]",
         )
-        self.session.add(game_round)
-        await self.session.flush()
+        # Appending keeps game.rounds current for the rest of this session
+        self._claim(game)
+        game.rounds.append(game_round)
 
         sorted_players = sorted(game.players, key=lambda p: p.seat)
         for i, player in enumerate(sorted_players):
-            hand = PlayerHandDB(
+            cards = json.dumps(hands[i])
+            game_round.hands.append(PlayerHandDB(
                 id=str(uuid4()),
-                round_id=game_round.id,
                 player_id=player.id,
-                dealt_cards=json.dumps(hands[i]),
-                current_cards=json.dumps(hands[i]),
-            )
-            self.session.add(hand)
+                dealt_cards=cards,
+                current_cards=cards,
+                pegged_cards="[]",
+                peg_points=0,
+            ))
 
         game.current_phase = "discard"
         game.cut_card = None
         game.peg_count = 0
-        await self.session.commit()
         return game_round
 
     async def get_current_round(self, game: GameDB) -> RoundDB | None:
@@ -173,6 +277,8 @@ class GameService:
         self, player: PlayerDB, cards: list[str]
     ) -> dict:
         game = player.game
+        if game.current_phase != "discard":
+            raise ValueError("Not in discard phase")
         current_round = await self.get_current_round(game)
         if not current_round:
             raise ValueError("No active round")
@@ -192,20 +298,15 @@ class GameService:
                 raise ValueError(f"Card {card} not in hand")
             current_cards.remove(card)
 
+        self._claim(game)
         hand.current_cards = json.dumps(current_cards)
 
         crib_cards = json.loads(current_round.crib_cards)
         crib_cards.extend(cards)
         current_round.crib_cards = json.dumps(crib_cards)
 
-        await self.session.commit()
-
         # Check if all players have discarded
-        all_hands = await self.session.execute(
-            select(PlayerHandDB).where(PlayerHandDB.round_id == current_round.id)
-        )
-        all_hands = all_hands.scalars().all()
-
+        all_hands = await self.get_all_hands_for_round(current_round.id)
         expected_hand_size = 4
         all_discarded = all(
             len(json.loads(h.current_cards)) == expected_hand_size for h in all_hands
@@ -215,7 +316,8 @@ class GameService:
             game.current_phase = "cut"
             # Set turn to player after dealer (non-dealer cuts)
             game.current_turn_seat = (game.current_dealer_seat + 1) % game.player_count
-            await self.session.commit()
+
+        await self.session.commit()
 
         return {
             "remaining_cards": current_cards,
@@ -238,9 +340,11 @@ class GameService:
         if not remaining_deck:
             raise ValueError("No cards left to cut")
 
+        self._claim(game)
         cut_index = secrets.randbelow(len(remaining_deck))
         cut_card = remaining_deck.pop(cut_index)
         current_round.deck_state = json.dumps(remaining_deck)
+        current_round.cut_card = cut_card
         game.cut_card = cut_card
 
         # Check for His Heels (Jack as cut card = 2 points for dealer)
@@ -288,6 +392,34 @@ class GameService:
             player.last_seen = datetime.utcnow()
             await self.session.commit()
 
+    async def mark_tokens_disconnected(self, tokens: list[str]) -> list:
+        """Mark a batch of sessions disconnected in one UPDATE.
+
+        Returns (id, game_id, name, seat) rows for the affected players.
+        """
+        if not tokens:
+            return []
+        result = await self.session.execute(
+            select(PlayerDB.id, PlayerDB.game_id, PlayerDB.name, PlayerDB.seat)
+            .where(PlayerDB.session_token.in_(tokens))
+        )
+        players = list(result.all())
+        await self.session.execute(
+            update(PlayerDB)
+            .where(PlayerDB.session_token.in_(tokens))
+            .values(is_connected=False, last_seen=datetime.utcnow())
+        )
+        await self.session.commit()
+        return players
+
+    async def abandon_game(self, game: GameDB):
+        """End a game nobody is playing any more, without a winner."""
+        self._claim(game)
+        game.status = "abandoned"
+        game.current_phase = "abandoned"
+        game.current_turn_seat = None
+        await self.session.commit()
+
     async def get_all_hands_for_round(self, round_id: str) -> list[PlayerHandDB]:
         result = await self.session.execute(
             select(PlayerHandDB).where(PlayerHandDB.round_id == round_id)
@@ -320,6 +452,7 @@ class GameService:
             raise ValueError("Play would exceed 31")
 
         # Make the play
+        self._claim(game)
         current_cards.remove(card)
         pegged_cards.append(card)
         hand.current_cards = json.dumps(current_cards)
@@ -333,28 +466,37 @@ class GameService:
         current_sequence = self._get_current_peg_sequence(peg_history)
 
         # Score the play
-        history_cards = [p["card"] for p in current_sequence[:-1]]
+        history_cards = [p["card"] for p in current_sequence[:-1] if "card" in p]
         peg_result = pegging.score_peg_play(history_cards, card)
 
         game.peg_count = peg_result["new_count"]
         player.score += peg_result["points"]
+        self._tally_peg_points(hand, peg_result["points"])
 
         current_round.peg_history = json.dumps(peg_history)
 
         # Determine next turn (pass current player's seat for Go point tracking)
-        await self._advance_peg_turn(game, current_round, last_player_seat=player.seat)
-
-        await self.session.commit()
+        auto_gos = await self._advance_peg_turn(game, current_round, last_player_seat=player.seat)
 
-        return {
+        result = {
             "card": card,
             "points": peg_result["points"],
             "breakdown": peg_result["breakdown"],
             "new_count": peg_result["new_count"],
             "player_seat": player.seat,
             "next_turn_seat": game.current_turn_seat,
+            "dealer_seat": game.current_dealer_seat,
             "phase": game.current_phase,
+            "auto_gos": auto_gos,
+            "scores": [],
+            "next_round": None,
         }
+        if game.current_phase == "hand_scoring":
+            # Last card of the hand: score it and deal the next in this commit
+            result["scores"], result["next_round"] = await self._finish_round(game)
+
+        await self.session.commit()
+        return result
 
     def _get_current_peg_sequence(self, peg_history: list[dict]) -> list[dict]:
         """Get plays since last count reset (31 or all Go)"""
@@ -365,73 +507,100 @@ class GameService:
             sequence.insert(0, play)
         return sequence
 
-    async def _advance_peg_turn(self, game: GameDB, current_round: RoundDB, last_player_seat: int | None = None):
+    def _award_peg_points(self, game: GameDB, hands: list, seat: int, points: int):
+        """Credit pegging points to a player's score and the round's tally"""
+        player = self._get_player_by_seat(game.players, seat)
+        if not player:
+            return
+        player.score += points
+        hand = self._get_hand_by_player_id(hands, player.id)
+        if hand:
+            self._tally_peg_points(hand, points)
+
+    def _tally_peg_points(self, hand: PlayerHandDB, points: int):
+        # Hands dealt before peg_points existed keep NULL; their round's
+        # pegging is replayed when it is scored
+        if hand.peg_points is not None:
+            hand.peg_points += points
+
+    def _gone_seats(self, peg_history: list[dict]) -> set[int]:
+        """Seats that have said Go in the current sequence"""
+        return {
+            play["seat"]
+            for play in self._get_current_peg_sequence(peg_history)
+            if play.get("type") == "go"
+        }
+
+    async def _advance_peg_turn(
+        self, game: GameDB, current_round: RoundDB, last_player_seat: int | None = None
+    ) -> list[int]:
         """Advance to next player's turn in pegging, handling Go and phase transitions.
 
-        last_player_seat: The seat of the player who just played/went Go (for awarding Go points)
+        last_player_seat: The seat of the player who last played a card (for awarding Go points)
+
+        With auto_go, players who hold cards but cannot play are given a Go on
+        the spot, chaining until someone can play or the count resets. Returns
+        the seats given an automatic Go, in order.
         """
         all_hands = await self.get_all_hands_for_round(current_round.id)
+        cards_by_seat = {}
+        for p in game.players:
+            hand = self._get_hand_by_player_id(all_hands, p.id)
+            cards_by_seat[p.seat] = json.loads(hand.current_cards) if hand else []
 
         # Check if all cards have been played
-        all_empty = all(len(json.loads(h.current_cards)) == 0 for h in all_hands)
-        if all_empty:
+        if not any(cards_by_seat.values()):
             # Award last card point if not 31
             if game.peg_count != 31 and last_player_seat is not None:
-                last_player = self._get_player_by_seat(game.players, last_player_seat)
-                if last_player:
-                    last_player.score += 1
+                self._award_peg_points(game, all_hands, last_player_seat, pegging.score_last_card())
 
             # Move to scoring phase
             game.current_phase = "hand_scoring"
             game.current_turn_seat = (game.current_dealer_seat + 1) % game.player_count
-            return
+            return []
+
+        peg_history = json.loads(current_round.peg_history)
 
         # If count hit 31, reset (player who hit 31 already got 2 points)
         if game.peg_count == 31:
             game.peg_count = 0
-            peg_history = json.loads(current_round.peg_history)
             peg_history.append({"type": "reset"})
-            current_round.peg_history = json.dumps(peg_history)
 
-        # Find next player who can play
+        # Find next player who can play, skipping anyone who has said Go
+        auto_gos = []
+        gone = self._gone_seats(peg_history)
         for i in range(1, game.player_count + 1):
             next_seat = (game.current_turn_seat + i) % game.player_count
-            next_player = self._get_player_by_seat(game.players, next_seat)
-            if not next_player:
+            cards = cards_by_seat.get(next_seat)
+            if not cards or next_seat in gone:
                 continue
-            hand = self._get_hand_by_player_id(all_hands, next_player.id)
-            if not hand:
-                continue
-            cards = json.loads(hand.current_cards)
-
-            valid_plays = pegging.valid_peg_plays(cards, game.peg_count)
-            if valid_plays:
+            can_play = bool(pegging.valid_peg_plays(cards, game.peg_count))
+            # In manual mode the turn passes to the player so they declare Go
+            # themselves; the last player to play never owes a Go
+            if can_play or (not game.auto_go and next_seat != last_player_seat):
                 game.current_turn_seat = next_seat
-                return
+                current_round.peg_history = json.dumps(peg_history)
+                return auto_gos
+            if next_seat != last_player_seat:
+                peg_history.append({"seat": next_seat, "type": "go", "auto": True})
+                auto_gos.append(next_seat)
 
         # No one can play - award Go point to last player who played, then reset
         if last_player_seat is not None:
-            last_player = self._get_player_by_seat(game.players, last_player_seat)
-            if last_player:
-                last_player.score += 1  # Go point
+            self._award_peg_points(game, all_hands, last_player_seat, pegging.score_go())
 
         game.peg_count = 0
-        peg_history = json.loads(current_round.peg_history)
         peg_history.append({"type": "reset"})
         current_round.peg_history = json.dumps(peg_history)
 
+        # The player after the last to play leads the next sequence
+        lead_from = game.current_turn_seat if last_player_seat is None else last_player_seat
         for i in range(1, game.player_count + 1):
-            next_seat = (game.current_turn_seat + i) % game.player_count
-            next_player = self._get_player_by_seat(game.players, next_seat)
-            if not next_player:
-                continue
-            hand = self._get_hand_by_player_id(all_hands, next_player.id)
-            if not hand:
-                continue
-            cards = json.loads(hand.current_cards)
-            if cards:
+            next_seat = (lead_from + i) % game.player_count
+            if cards_by_seat.get(next_seat):
                 game.current_turn_seat = next_seat
-                return
+                break
+        return auto_gos
 
     async def process_go(self, player: PlayerDB) -> dict:
         """Handle when a player declares Go (cannot play)"""
@@ -453,6 +622,7 @@ class GameService:
             raise ValueError("You must play a card if possible")
 
         # Record the Go
+        self._claim(game)
         peg_history = json.loads(current_round.peg_history)
         peg_history.append({"seat": player.seat, "type": "go"})
         current_round.peg_history = json.dumps(peg_history)
@@ -464,13 +634,14 @@ class GameService:
                 last_play_seat = entry["seat"]
                 break
 
-        await self._advance_peg_turn(game, current_round, last_player_seat=last_play_seat)
+        auto_gos = await self._advance_peg_turn(game, current_round, last_player_seat=last_play_seat)
         await self.session.commit()
 
         return {
             "player_seat": player.seat,
             "next_turn_seat": game.current_turn_seat,
             "phase": game.current_phase,
+            "auto_gos": auto_gos,
         }
 
     async def get_valid_plays(self, player: PlayerDB) -> list[str]:
@@ -490,8 +661,25 @@ class GameService:
         current_cards = json.loads(hand.current_cards)
         return pegging.valid_peg_plays(current_cards, game.peg_count)
 
-    async def score_hands(self, game: GameDB) -> list[dict]:
-        """Score all hands and the crib"""
+    async def _finish_round(self, game: GameDB) -> tuple[list[dict], RoundDB | None]:
+        """Score the hands and crib and, unless someone has won, rotate the
+        dealer and deal the next round, without committing.
+
+        Returns the scoring results and the new round (None if the game ended).
+        """
+        results, stats = await self._score_round(game)
+        next_round = None
+        if game.status != "finished":
+            next_round = self._deal_round(game)
+        else:
+            stats.game(
+                [(p.name, p.team, p.score) for p in game.players], game.is_teams
+            )
+        await StatsService(self.session).apply(stats)
+        return results, next_round
+
+    async def _score_round(self, game: GameDB) -> tuple[list[dict], StatsDelta]:
+        """Score all hands and the crib without committing"""
         current_round = await self.get_current_round(game)
         if not current_round:
             raise ValueError("No active round")
@@ -518,6 +706,17 @@ class GameService:
         # Reorder so non-dealer scores first
         scoring_order = sorted_players[dealer_idx + 1:] + sorted_players[:dealer_idx + 1]
 
+        # Stats are folded into the same commit as the scores
+        stats = StatsDelta()
+        replayed = None
+        if any(hand.peg_points is None for hand in all_hands):
+            replayed = pegging.replay_peg_points(json.loads(current_round.peg_history))
+        for player in sorted_players:
+            hand = self._get_hand_by_player_id(all_hands, player.id)
+            if hand:
+                points = hand.peg_points if replayed is None else replayed.get(player.seat, 0)
+                stats.pegging(player.name, points)
+
         for player in scoring_order:
             hand = self._get_hand_by_player_id(all_hands, player.id)
             if not hand:
@@ -540,6 +739,7 @@ class GameService:
             score_result = scoring.score_hand(kept_cards, cut_card, is_crib=False)
             player.score += score_result["total"]
             hand.hand_score = score_result["total"]
+            stats.hand(player.name, score_result["total"])
 
             results.append({
                 "player_seat": player.seat,
@@ -552,8 +752,7 @@ class GameService:
             # Check for winner
             if player.score >= 121:
                 game.status = "finished"
-                await self.session.commit()
-                return results
+                return results, stats
 
         # Score crib for dealer
         dealer = self._get_player_by_seat(game.players, game.current_dealer_seat)
@@ -562,6 +761,8 @@ class GameService:
         crib_cards = json.loads(current_round.crib_cards)
         crib_result = scoring.score_hand(crib_cards, cut_card, is_crib=True)
         dealer.score += crib_result["total"]
+        current_round.crib_score = crib_result["total"]
+        stats.crib(dealer.name, crib_result["total"])
 
         results.append({
             "player_seat": dealer.seat,
@@ -580,5 +781,4 @@ class GameService:
             game.current_dealer_seat = (game.current_dealer_seat + 1) % game.player_count
             game.current_phase = "deal"
 
-        await self.session.commit()
-        return results
+        return results, stats
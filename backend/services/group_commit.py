@@ -0,0 +1,232 @@
+"""Optional group commit for WebSocket actions.
+
+Every action normally commits on its own connection, paying for its own
+fsync. With CRIBBAGE_GROUP_COMMIT_ENABLED, actions instead run one at a time
+on a single shared writer connection, each inside a SAVEPOINT so a failed
+action rolls back alone. ``session.commit()`` releases the savepoint into
+the open transaction and waits; the batch is committed once the window
+(CRIBBAGE_GROUP_COMMIT_WINDOW_MS) has passed since its first waiter, or as
+soon as CRIBBAGE_GROUP_COMMIT_MAX_BATCH actions are waiting, and only then
+do their commits return. Actions therefore never broadcast state that
+is not yet durable.
+
+Because actions share one transaction they see each other's uncommitted
+writes, exactly as if they had committed in sequence.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+
+from ..config import settings
+from ..database import DATABASE_URL, SHARDED, async_session, configure_sqlite
+from . import metrics
+from .turn_clock import update_clocks
+
+
+class GroupCommitSession(AsyncSession):
+    """Session whose commit waits for the shared batch to be durable."""
+
+    def __init__(self, committer: "GroupCommitter", **kwargs):
+        super().__init__(**kwargs)
+        self.committer = committer
+        # Turn clocks are updated once the batch commits, not on release
+        self.info["group_commit"] = True
+
+    async def commit(self):
+        await super().commit()
+        clocked = self.info.pop("clocked_games", None)
+        await self.committer.wait_durable()
+        update_clocks(clocked)
+
+
+class _WriterLock:
+    """FIFO lock in which actions resuming after a commit go ahead of new
+    ones, so a batch finishes its work before the next batch grows."""
+
+    def __init__(self):
+        self._locked = False
+        self._urgent: deque[asyncio.Future] = deque()
+        self._normal: deque[asyncio.Future] = deque()
+
+    async def acquire(self, urgent: bool = False):
+        if not self._locked:
+            self._locked = True
+            return
+        future = asyncio.get_running_loop().create_future()
+        queue = self._urgent if urgent else self._normal
+        queue.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Handed the lock just as we were cancelled; pass it on
+                self.release()
+            else:
+                queue.remove(future)
+            raise
+
+    def release(self):
+        for queue in (self._urgent, self._normal):
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self._locked = False
+
+
+class GroupCommitter:
+    def __init__(self, url: str, window: float, max_batch: int):
+        self.url = url
+        self.window = window
+        self.max_batch = max_batch
+        self.engine = None
+        self._conn: AsyncConnection | None = None
+        self._lock = _WriterLock()
+        self._waiters: list[asyncio.Future] = []
+        self._batch_started = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    async def start(self):
+        self.engine = create_async_engine(self.url)
+        configure_sqlite(self.engine)
+
+        # pysqlite's implicit transactions break SAVEPOINT; take control of
+        # BEGIN. IMMEDIATE takes the write lock up front, so a batch never
+        # has to upgrade a read lock (which can deadlock with other writers).
+        @event.listens_for(self.engine.sync_engine, "connect")
+        def _no_implicit_begin(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(self.engine.sync_engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+        self._conn = await self.engine.connect()
+
+    async def close(self):
+        await self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    @asynccontextmanager
+    async def session(self):
+        """Exclusive use of the writer connection for one action."""
+        await self._lock.acquire()
+        try:
+            if not self._conn.in_transaction():
+                await self._conn.begin()
+            async with GroupCommitSession(
+                self,
+                bind=self._conn,
+                join_transaction_mode="create_savepoint",
+                expire_on_commit=False,
+            ) as session:
+                yield session
+            # Nothing waiting on the batch: end it now rather than holding
+            # its locks open until the next write comes along
+            if not self._waiters and self._conn.in_transaction():
+                await self._conn.commit()
+        finally:
+            self._lock.release()
+
+    async def wait_durable(self):
+        """Return once the calling action's writes are committed.
+
+        Called with the writer lock held. The action that fills the batch or
+        arrives after the window has closed commits it; earlier ones hand the
+        lock on while they wait and take it back before returning.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append(future)
+        if len(self._waiters) == 1:
+            self._batch_started = loop.time()
+
+        if (
+            len(self._waiters) >= self.max_batch
+            or loop.time() - self._batch_started >= self.window
+        ):
+            await self._commit_batch()
+            return future.result()
+
+        if self._timer is None:
+            delay = self._batch_started + self.window - loop.time()
+            self._timer = loop.call_later(delay, self._start_flush)
+        self._lock.release()
+        try:
+            await future
+        finally:
+            await self._lock.acquire(urgent=True)
+
+    def _start_flush(self):
+        # Window closed with no further action to commit the batch
+        self._timer = None
+        task = asyncio.create_task(self._flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self):
+        await self._lock.acquire(urgent=True)
+        try:
+            await self._commit_batch()
+        finally:
+            self._lock.release()
+
+    async def _commit_batch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        waiters, self._waiters = self._waiters, []
+        if not waiters:
+            return
+        start = time.perf_counter()
+        try:
+            await self._conn.commit()
+        except Exception as e:
+            with suppress(Exception):
+                await self._conn.rollback()
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+        else:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+        metrics.group_commit_seconds.observe(time.perf_counter() - start)
+        metrics.group_commit_batch_size.observe(len(waiters))
+
+
+# Actions must all use the one writer connection, so this is for the
+# single database only; with shards, each shard's lock is its own writer
+ENABLED = settings.group_commit_enabled and not SHARDED
+
+group_committer = GroupCommitter(
+    DATABASE_URL,
+    settings.group_commit_window_ms / 1000,
+    settings.group_commit_max_batch,
+)
+
+
+def action_session():
+    """Session for one WebSocket action, group-committed when enabled."""
+    if ENABLED:
+        return group_committer.session()
+    return async_session()
+
+
+async def get_action_session():
+    """FastAPI dependency for REST endpoints that write, so that with group
+    commit on they queue on the same writer instead of contending with it."""
+    async with action_session() as session:
+        yield session
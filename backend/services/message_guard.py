@@ -0,0 +1,124 @@
+"""Checks on inbound WebSocket frames that need no database.
+
+Each connection gets a token bucket, and each frame is checked against the
+last state this process committed for its game (GameView): message type,
+payload shape, card names, phase and whose turn it is. A frame that fails
+is answered with the same error GameService would give, without opening a
+session. The view is recorded right after each commit and before the
+broadcasts that tell players about it, so no client can act on newer state
+than the view holds. Games without a view yet (nothing committed through
+this process since it started) skip the phase and turn checks.
+"""
+import time
+from typing import NamedTuple
+
+from ..game_logic.deck import create_deck
+
+CARDS = frozenset(create_deck())
+# Known client message types (besides pong, which the socket loop handles)
+MESSAGE_TYPES = frozenset({"start_game", "discard", "cut", "peg", "go", "sync"})
+
+# Phase each action needs, and the errors GameService raises
+PHASES = {"discard": "discard", "cut": "cut", "peg": "pegging", "go": "pegging"}
+PHASE_ERRORS = {
+    "discard": "Not in discard phase",
+    "cut": "Not in cut phase",
+    "peg": "Not in pegging phase",
+    "go": "Not in pegging phase",
+}
+TURN_ERRORS = {"cut": "Not your turn to cut", "peg": "Not your turn", "go": "Not your turn"}
+
+
+class TokenBucket:
+    """Allows ``rate`` frames a second on average, in bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class GameView(NamedTuple):
+    version: int
+    status: str
+    phase: str
+    turn_seat: int | None
+    player_count: int
+
+
+class GameViews:
+    """Last committed GameView per game with a connected player."""
+
+    def __init__(self):
+        self._views: dict[str, GameView] = {}
+
+    def record(self, game):
+        view = self._views.get(game.id)
+        # Two actions can finish out of order; keep the newer state
+        if view is None or game.version >= view.version:
+            self._views[game.id] = GameView(
+                game.version, game.status, game.current_phase, game.current_turn_seat,
+                game.player_count,
+            )
+
+    def get(self, game_id: str) -> GameView | None:
+        return self._views.get(game_id)
+
+    def forget(self, game_id: str):
+        self._views.pop(game_id, None)
+
+
+game_views = GameViews()
+
+
+def precheck(data, seat: int, view: GameView | None) -> tuple[str, str] | None:
+    """(reason, error message) if the frame can be refused as is, else None."""
+    if not isinstance(data, dict):
+        return "malformed", "Messages must be JSON objects"
+    msg_type = data.get("type")
+    if not isinstance(msg_type, str):
+        return "malformed", "type must be a string"
+    if msg_type not in MESSAGE_TYPES:
+        return "unknown_type", f"Unknown message type: {msg_type}"
+
+    if msg_type == "discard":
+        cards = data.get("cards")
+        if not isinstance(cards, list) or not all(isinstance(c, str) for c in cards):
+            return "malformed", "cards must be a list of cards"
+        unknown = next((card for card in cards if card not in CARDS), None)
+        if unknown is not None:
+            return "malformed", f"Card {unknown} not in hand"
+    elif msg_type == "peg":
+        card = data.get("card")
+        if not card:
+            return "malformed", "No card specified"
+        if not isinstance(card, str):
+            return "malformed", "card must be a card"
+        if card not in CARDS:
+            return "malformed", "Card not in hand"
+
+    if view is None:
+        return None
+    if msg_type == "start_game":
+        if view.status != "waiting":
+            return "wrong_phase", "Game already started"
+        return None
+    if msg_type in PHASES and view.phase != PHASES[msg_type]:
+        return "wrong_phase", PHASE_ERRORS[msg_type]
+    if msg_type in TURN_ERRORS and view.turn_seat != seat:
+        return "not_your_turn", TURN_ERRORS[msg_type]
+    if msg_type == "discard":
+        count = 2 if view.player_count == 2 else 1
+        if len(data["cards"]) != count:
+            return "malformed", f"Must discard exactly {count} cards"
+    return None
@@ -0,0 +1,212 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Everything here is touched from the single event-loop thread (SQLAlchemy's
+async engine runs its cursor hooks in a greenlet on that same thread), so
+updates are plain integer and float ops with no locking. Histogram buckets
+are allocated once per label value and recording is a bisect plus two adds.
+"""
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .tracing import tracer
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _labels(name: str | None, value: str | None, extra: str = "") -> str:
+    parts = [f'{name}="{value}"'] if name else []
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label: str | None = None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[str | None, list] = {}
+
+    def observe(self, value: float, label: str | None = None):
+        series = self._series.get(label)
+        if series is None:
+            series = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, series in sorted(self._series.items(), key=lambda kv: kv[0] or ""):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label, label, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label, label, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label, label)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label, label)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label: str | None = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: dict[str | None, float] = {}
+
+    def inc(self, label: str | None = None, amount: float = 1):
+        self._values[label] = self._values.get(label, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label, value in sorted(self._values.items(), key=lambda kv: kv[0] or ""):
+            lines.append(f"{self.name}{_labels(self.label, label)} {value}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback, so it never goes stale."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.read()}",
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+ws_message_seconds = registry.register(Histogram(
+    "cribbage_ws_message_seconds", "WebSocket message handling time", label="msg_type",
+))
+service_method_seconds = registry.register(Histogram(
+    "cribbage_service_method_seconds", "GameService method time", label="method",
+))
+db_queries = registry.register(Counter(
+    "cribbage_db_queries_total", "SQL statements executed", label="method",
+))
+db_query_seconds = registry.register(Histogram(
+    "cribbage_db_query_seconds", "SQL statement execution time", label="method",
+))
+broadcast_seconds = registry.register(Histogram(
+    "cribbage_broadcast_seconds", "Time to fan one event out to a game",
+))
+broadcast_recipients = registry.register(Histogram(
+    "cribbage_broadcast_recipients", "Sockets reached per broadcast", buckets=COUNT_BUCKETS,
+))
+action_conflicts = registry.register(Counter(
+    "cribbage_action_conflicts_total",
+    "Actions re-run because another action changed the game first",
+    label="msg_type",
+))
+group_commit_seconds = registry.register(Histogram(
+    "cribbage_group_commit_seconds", "Time to commit one group-commit batch",
+))
+group_commit_batch_size = registry.register(Histogram(
+    "cribbage_group_commit_batch_size", "Actions made durable per group commit",
+    buckets=COUNT_BUCKETS,
+))
+turn_clock_moves = registry.register(Counter(
+    "cribbage_turn_clock_moves_total", "Moves the server made for players out of time",
+    label="msg_type",
+))
+games_hibernated = registry.register(Counter(
+    "cribbage_games_hibernated_total", "Idle games whose sockets and cached state were dropped",
+))
+ws_rejected = registry.register(Counter(
+    "cribbage_ws_rejected_total",
+    "WebSocket frames refused before reaching the database",
+    label="reason",
+))
+
+analyze_cache = registry.register(Counter(
+    "cribbage_analyze_cache_total", "Hand analyses served from cache or computed",
+    label="result",
+))
+
+# GameService method currently running, used to attribute SQL statements
+current_method: ContextVar[str] = ContextVar("current_method", default="other")
+
+
+def instrumented(cls):
+    """Class decorator: time every coroutine method and tag the SQL it runs.
+    Each call is also a tracing span when tracing is enabled."""
+    for attr, fn in list(vars(cls).items()):
+        if inspect.iscoroutinefunction(fn):
+            setattr(cls, attr, _observe(fn))
+    return cls
+
+
+def _observe(fn):
+    name = fn.__name__
+    span_name = fn.__qualname__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = current_method.set(name)
+        start = time.perf_counter()
+        try:
+            if tracer.enabled:
+                with tracer.start_as_current_span(span_name):
+                    return await fn(*args, **kwargs)
+            return await fn(*args, **kwargs)
+        finally:
+            service_method_seconds.observe(time.perf_counter() - start, name)
+            current_method.reset(token)
+
+    return wrapper
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    method = current_method.get()
+    db_queries.inc(method)
+    db_query_seconds.observe(elapsed, method)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
@@ -0,0 +1,114 @@
+"""Opt-in cProfile capture of individual WebSocket actions and REST requests.
+
+Capture is armed from the admin endpoints for either every Nth action or
+every action of one game code, and each sampled call is written to
+``<profile_dir>/<time>-<kind>-<label>.pstats`` (open with ``python -m pstats``
+or snakeviz). While disarmed the hooks cost one attribute check.
+
+cProfile hooks the whole thread, so a capture also sees whatever other
+coroutines ran while the sampled one was suspended; only one capture runs at
+a time and samples that arrive during one are skipped.
+"""
+import cProfile
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from ..config import settings
+from ..database import DATA_DIR
+
+_GAME_PATH = re.compile(r"^/api/games/([^/]+)")
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]+")
+# File names of the most recent captures reported by status()
+_RECENT = 50
+
+
+class Profiler:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.armed = False
+        self.sample_every = 1
+        self.game_code: str | None = None
+        self.max_captures = 0
+        self.captured = 0
+        self.recent: deque[str] = deque(maxlen=_RECENT)
+        self._seen = 0
+        self._running = False
+
+    def start(self, sample_every: int = 1, game_code: str | None = None, max_captures: int = 100):
+        self.sample_every = max(1, sample_every)
+        self.game_code = game_code
+        self.max_captures = max_captures
+        self.captured = 0
+        self.recent.clear()
+        self._seen = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.armed = True
+
+    def stop(self):
+        self.armed = False
+
+    def status(self) -> dict:
+        return {
+            "armed": self.armed,
+            "sample_every": self.sample_every,
+            "game_code": self.game_code,
+            "max_captures": self.max_captures,
+            "directory": str(self.directory),
+            "captured": self.captured,
+            "recent": list(self.recent),
+        }
+
+    def _should_sample(self, game_code: str | None) -> bool:
+        if self._running:
+            return False
+        if self.game_code is not None:
+            return game_code == self.game_code
+        self._seen += 1
+        return self._seen % self.sample_every == 0
+
+    @contextmanager
+    def capture(self, kind: str, label: str, game_code: str | None):
+        """Profile the enclosed block if it is picked for sampling."""
+        if not self._should_sample(game_code):
+            yield
+            return
+        profile = cProfile.Profile()
+        self._running = True
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._running = False
+            self._save(profile, kind, label)
+
+    def _save(self, profile: cProfile.Profile, kind: str, label: str):
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now)) + f"{now % 1:.6f}"[1:]
+        path = self.directory / f"{stamp}-{kind}-{_UNSAFE.sub('_', label)[:60]}.pstats"
+        profile.dump_stats(path)
+        self.captured += 1
+        self.recent.append(path.name)
+        if self.max_captures and self.captured >= self.max_captures:
+            self.armed = False
+
+
+profiler = Profiler(Path(settings.profile_dir) if settings.profile_dir else DATA_DIR / "profiles")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles sampled HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not profiler.armed or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        match = _GAME_PATH.match(path)
+        with profiler.capture("http", f"{scope['method']}{path}", match and match.group(1)):
+            await self.app(scope, receive, send)
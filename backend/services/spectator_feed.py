@@ -0,0 +1,83 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from fastapi import WebSocket
+
+
+class Spectator:
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        # (sequence number, pre-encoded frame); a None frame means "resync"
+        self.queue: asyncio.Queue[tuple[int, str | None]] = asyncio.Queue(queue_size)
+        self.task: asyncio.Task | None = None
+
+
+class SpectatorFeed:
+    """Public event stream for one game, shared by all of its spectators.
+
+    Events are encoded once by the broadcaster and pushed onto each
+    spectator's bounded queue without awaiting. A spectator that falls
+    behind has its backlog dropped and is resynced from a public snapshot
+    that is built at most once per burst and shared by every lagging
+    spectator, so a large audience never slows the seated players.
+    """
+
+    def __init__(self, load_snapshot: Callable[[], Awaitable[dict]], encode: Callable[[dict], str]):
+        self.spectators: set[Spectator] = set()
+        self.seq = 0
+        self._load_snapshot = load_snapshot
+        self._encode = encode
+        self._snapshot: tuple[int, str] | None = None
+        self._snapshot_lock = asyncio.Lock()
+
+    def publish(self, frame: str):
+        self.seq += 1
+        self._snapshot = None
+        for spectator in self.spectators:
+            try:
+                spectator.queue.put_nowait((self.seq, frame))
+            except asyncio.QueueFull:
+                self._resync(spectator)
+
+    def add(self, websocket: WebSocket, queue_size: int) -> Spectator:
+        spectator = Spectator(websocket, queue_size)
+        self.spectators.add(spectator)
+        self._resync(spectator)
+        spectator.task = asyncio.create_task(self._pump(spectator))
+        return spectator
+
+    def remove(self, spectator: Spectator):
+        self.spectators.discard(spectator)
+        if spectator.task and spectator.task is not asyncio.current_task():
+            spectator.task.cancel()
+
+    def _resync(self, spectator: Spectator):
+        queue = spectator.queue
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait((self.seq, None))
+
+    async def _get_snapshot(self) -> tuple[int, str]:
+        async with self._snapshot_lock:
+            if self._snapshot is None:
+                # Anything published while loading is replayed on top of the
+                # snapshot, so stamp it with the sequence from before the load.
+                seq = self.seq
+                state = await self._load_snapshot()
+                self._snapshot = (seq, self._encode(state))
+            return self._snapshot
+
+    async def _pump(self, spectator: Spectator):
+        synced_seq = 0
+        try:
+            while True:
+                seq, frame = await spectator.queue.get()
+                if frame is None:
+                    synced_seq, frame = await self._get_snapshot()
+                elif seq <= synced_seq:
+                    continue
+                await spectator.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.remove(spectator)
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..game_logic.stats import COUNTERS, StatsDelta, stat_key
+from ..models import PlayerStats, PlayerStatsDB
+
+# Columns per row in the upsert; keeps a batch under SQLite's variable limit
+_UPSERT_BATCH = 60
+
+
+class StatsService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def apply(self, delta: StatsDelta):
+        """Add a delta to the running totals. Does not commit, so callers can
+        fold it into the transaction that scored the hands."""
+        rows = list(delta.rows.values())
+        now = datetime.utcnow()
+        for i in range(0, len(rows), _UPSERT_BATCH):
+            batch = [
+                {"name_key": stat_key(r["name"]), "updated_at": now, **r}
+                for r in rows[i:i + _UPSERT_BATCH]
+            ]
+            stmt = insert(PlayerStatsDB).values(batch)
+            table = PlayerStatsDB.__table__.c
+            update = {c: table[c] + stmt.excluded[c] for c in COUNTERS}
+            update["highest_hand"] = func.max(table.highest_hand, stmt.excluded.highest_hand)
+            update["name"] = stmt.excluded.name
+            update["updated_at"] = stmt.excluded.updated_at
+            await self.session.execute(
+                stmt.on_conflict_do_update(index_elements=["name_key"], set_=update)
+            )
+
+    async def reset(self):
+        await self.session.execute(delete(PlayerStatsDB))
+
+    async def get_player_stats(self, name: str) -> PlayerStats | None:
+        # With sharded storage each shard holds its own partial totals
+        result = await self.session.execute(
+            select(PlayerStatsDB).where(PlayerStatsDB.name_key == stat_key(name))
+        )
+        rows = result.scalars().all()
+        if not rows:
+            return None
+        totals = {c: sum(getattr(row, c) for row in rows) for c in COUNTERS}
+        latest = max(rows, key=lambda row: row.updated_at)
+        return PlayerStats(
+            name=latest.name,
+            games_played=totals["games_played"],
+            games_won=totals["games_won"],
+            win_rate=_ratio(totals["games_won"], totals["games_played"]),
+            skunks_given=totals["skunks_given"],
+            skunks_received=totals["skunks_received"],
+            average_hand=_ratio(totals["hand_points"], totals["hands_scored"]),
+            average_crib=_ratio(totals["crib_points"], totals["cribs_scored"]),
+            average_pegging=_ratio(totals["pegging_points"], totals["rounds_pegged"]),
+            highest_hand=max(row.highest_hand for row in rows),
+        )
+
+
+def _ratio(total: int, count: int) -> float:
+    return round(total / count, 2) if count else 0.0
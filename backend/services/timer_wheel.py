@@ -0,0 +1,110 @@
+"""Hierarchical timer wheel: O(1) arm and cancel for many coarse timers.
+
+Time is cut into ticks. Level 0 has one slot per tick for the next SLOTS
+ticks; each level above covers SLOTS times the span of the one below, one
+slot per span of the level below. A timer goes into the lowest level whose
+span reaches its deadline, and moves down a level each time the wheel
+comes round to its slot, so it is touched at most LEVELS times however
+many timers there are. Deadlines further out than the top level covers are
+parked in its last slot and re-placed when they come round.
+
+The wheel never reads a clock itself: ``advance(now)`` says what time it
+is, so a real loop and a virtual clock drive it the same way.
+"""
+import math
+from typing import Any, Callable
+
+BITS = 6
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+LEVELS = 4
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "args", "_slot")
+
+    def __init__(self, deadline: int, callback: Callable, args: tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self._slot: dict | None = None
+
+    @property
+    def active(self) -> bool:
+        return self._slot is not None
+
+    def fire(self) -> Any:
+        return self.callback(*self.args)
+
+
+class TimerWheel:
+    def __init__(self, tick: float, start: float = 0.0):
+        self.tick = tick
+        self.start = start
+        self._now = 0
+        # One dict per slot, used as an ordered set so cancel is O(1)
+        self._levels: list[list[dict[Timer, None]]] = [
+            [{} for _ in range(SLOTS)] for _ in range(LEVELS)
+        ]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def arm(self, when: float, callback: Callable, *args) -> Timer:
+        """Call ``callback(*args)`` from the first ``advance`` at or after
+        ``when`` (rounded up to a tick, and never the current one)."""
+        deadline = max(math.ceil((when - self.start) / self.tick), self._now + 1)
+        timer = Timer(deadline, callback, args)
+        self._place(timer)
+        self._count += 1
+        return timer
+
+    def cancel(self, timer: Timer):
+        if timer._slot is not None:
+            del timer._slot[timer]
+            timer._slot = None
+            self._count -= 1
+
+    def advance(self, now: float) -> list[Timer]:
+        """Move the wheel up to ``now`` and return the timers that came due,
+        in deadline order (no longer armed; the caller fires them)."""
+        target = math.floor((now - self.start) / self.tick)
+        due = []
+        while self._now < target:
+            self._now += 1
+            # Each level comes round once the levels below have wrapped.
+            # Cascade from the top, so timers moved down a level are in
+            # place before that level's own slot is emptied.
+            top = 0
+            while top + 1 < LEVELS and not self._now & ((1 << (BITS * (top + 1))) - 1):
+                top += 1
+            for level in range(top, 0, -1):
+                slots = self._levels[level]
+                index = (self._now >> (BITS * level)) & MASK
+                timers, slots[index] = slots[index], {}
+                for timer in timers:
+                    self._place(timer)
+            slots = self._levels[0]
+            index = self._now & MASK
+            if slots[index]:
+                timers, slots[index] = slots[index], {}
+                for timer in timers:
+                    timer._slot = None
+                due.extend(timers)
+        self._count -= len(due)
+        return due
+
+    def _place(self, timer: Timer):
+        delta = timer.deadline - self._now
+        for level in range(LEVELS):
+            if delta < SLOTS << (BITS * level):
+                index = (timer.deadline >> (BITS * level)) & MASK
+                break
+        else:
+            # Beyond the wheel: park it in the slot that comes round last
+            level = LEVELS - 1
+            index = ((self._now >> (BITS * level)) - 1) & MASK
+        slot = self._levels[level][index]
+        slot[timer] = None
+        timer._slot = slot
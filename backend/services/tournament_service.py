@@ -0,0 +1,332 @@
+"""Single-elimination tournaments over tables provisioned in bulk.
+
+The opening round seats every entrant at once. After that, each finished
+table's winner waits for the next round and is seated as soon as
+``table_size`` winners of that round are waiting, so fast tables never
+wait for slow ones. A round's leftovers (fewer than ``table_size`` once
+nobody else can still reach that round) play a smaller table, or a lone
+leftover gets a bye into the next round.
+
+Scheduling is driven by game-finish events (notify_game_finished) and runs
+in a single task, one pass per tournament at a time, so two tables
+finishing together can never seat the same winner twice. A burst of
+finishes is handled in one pass. At startup every running tournament gets
+one catch-up pass for events lost to a restart.
+"""
+import asyncio
+import logging
+import secrets
+from collections import Counter, defaultdict
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..database import read_session
+from ..models import GameDB, PlayerDB, TournamentDB, TournamentEntryDB
+from .game_service import GameService
+from .concurrency import GameConflict, run_action
+from .websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+def opening_tables(count: int, table_size: int) -> list[int]:
+    """Table sizes for the opening round: as few tables as possible, sizes
+    as even as possible and never below two, so nobody starts with a bye."""
+    tables = -(-count // table_size)
+    if count < 2 * tables:
+        tables = count // 2
+    base, extra = divmod(count, tables)
+    return [base + 1] * extra + [base] * (tables - extra)
+
+
+class TournamentService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_tournament(
+        self, name: str, players: list[str], table_size: int = 2, auto_go: bool = True
+    ) -> tuple[TournamentDB, list[tuple[TournamentEntryDB, GameDB, PlayerDB]]]:
+        """Create the tournament and its opening round in one commit.
+
+        Returns the tournament and each entrant with their first seat.
+        """
+        if table_size not in (2, 3):
+            raise ValueError("Tournament tables seat 2 or 3 players")
+        if len(players) < 2:
+            raise ValueError("A tournament needs at least two players")
+
+        tournament = TournamentDB(
+            id=str(uuid4()),
+            code=secrets.token_urlsafe(6)[:8],
+            name=name,
+            table_size=table_size,
+            auto_go=auto_go,
+            status="running",
+        )
+        now = datetime.utcnow()
+        entries = [
+            TournamentEntryDB(
+                id=str(uuid4()),
+                tournament_id=tournament.id,
+                name=player[:50],
+                token=secrets.token_hex(32),
+                round=1,
+                eliminated=False,
+                qualified_at=now,
+            )
+            for player in players
+        ]
+        self.session.add(tournament)
+        self.session.add_all(entries)
+
+        groups, start = [], 0
+        for size in opening_tables(len(entries), table_size):
+            groups.append(entries[start:start + size])
+            start += size
+        games = self._seat(tournament, 1, groups)
+        await self.session.commit()
+        seats = [
+            (entry, game, player)
+            for game, group in zip(games, groups)
+            for entry, player in zip(group, game.players)
+        ]
+        return tournament, seats
+
+    def _seat(self, tournament: TournamentDB, round_number: int, groups: list[list[TournamentEntryDB]]):
+        games = GameService(self.session).create_tables(
+            [[entry.name for entry in group] for group in groups],
+            auto_go=tournament.auto_go,
+            tournament_id=tournament.id,
+            tournament_round=round_number,
+        )
+        for game, group in zip(games, groups):
+            for entry, player in zip(group, game.players):
+                entry.game_id = game.id
+                entry.player_id = player.id
+        return games
+
+    async def advance(self, tournament_id: str) -> list[tuple[str, dict]]:
+        """Resolve the tournament's finished tables and seat everyone who can
+        be seated, in one commit.
+
+        Returns (session token of their last seat, message) per entrant to
+        tell: their new table, or for the champion the end of the tournament.
+        """
+        tournament = await self.session.get(TournamentDB, tournament_id)
+        if tournament is None or tournament.status != "running":
+            return []
+
+        result = await self.session.execute(
+            select(TournamentEntryDB).where(
+                TournamentEntryDB.tournament_id == tournament_id,
+                TournamentEntryDB.eliminated.is_(False),
+            )
+        )
+        active = list(result.scalars().all())
+
+        # Winners move on to the next round; everyone else at the table is out
+        by_game = defaultdict(list)
+        for entry in active:
+            if entry.game_id is not None:
+                by_game[entry.game_id].append(entry)
+        if by_game:
+            result = await self.session.execute(
+                select(GameDB)
+                .where(GameDB.id.in_(by_game), GameDB.status == "finished")
+                .options(selectinload(GameDB.players))
+            )
+            now = datetime.utcnow()
+            for game in result.scalars().all():
+                winner = max(game.players, key=lambda p: p.score)
+                for entry in by_game[game.id]:
+                    if entry.player_id == winner.id:
+                        entry.round += 1
+                        entry.game_id = None
+                        entry.qualified_at = now
+                    else:
+                        entry.eliminated = True
+            active = [entry for entry in active if not entry.eliminated]
+
+        waiting = defaultdict(list)
+        seated = Counter()
+        for entry in sorted(active, key=lambda e: e.qualified_at):
+            if entry.game_id is None:
+                waiting[entry.round].append(entry)
+            else:
+                seated[entry.round] += 1
+
+        # Remember each waiting entrant's last seat to tell them where to go
+        last_seats = {e.player_id for group in waiting.values() for e in group if e.player_id}
+        tokens = {}
+        if last_seats:
+            result = await self.session.execute(
+                select(PlayerDB.id, PlayerDB.session_token).where(PlayerDB.id.in_(last_seats))
+            )
+            tokens = dict(result.all())
+
+        tables = self._pair(tournament, waiting, seated)
+        messages = []
+        if tournament.status == "finished":
+            (champion,) = (e for group in waiting.values() for e in group)
+            if champion.player_id in tokens:
+                messages.append((tokens[champion.player_id], {
+                    "type": "tournament_over",
+                    "tournament": tournament.code,
+                    "winner_name": champion.name,
+                }))
+
+        for round_number, groups in tables.items():
+            last_seat = {e.id: e.player_id for group in groups for e in group}
+            games = self._seat(tournament, round_number, groups)
+            for game, group in zip(games, groups):
+                for entry, player in zip(group, game.players):
+                    token = tokens.get(last_seat[entry.id])
+                    if token is None:
+                        continue
+                    messages.append((token, {
+                        "type": "tournament_table",
+                        "tournament": tournament.code,
+                        "round": round_number,
+                        "game_code": game.code,
+                        "session_token": player.session_token,
+                    }))
+        await self.session.commit()
+        return messages
+
+    def _pair(
+        self,
+        tournament: TournamentDB,
+        waiting: dict[int, list[TournamentEntryDB]],
+        seated: Counter,
+    ) -> dict[int, list[list[TournamentEntryDB]]]:
+        """Group waiting entrants into tables, per round.
+
+        ``waiting`` maps round to entrants in the order they qualified and
+        ``seated`` counts entrants still playing each round. Byes move an
+        entrant to the next round in place; a lone entrant with nobody left
+        to play finishes the tournament.
+        """
+        size = tournament.table_size
+        tables = defaultdict(list)
+        progressed = True
+        while progressed:
+            remaining = sum(map(len, waiting.values())) + sum(seated.values())
+            if remaining == 1 and any(waiting.values()):
+                (champion,) = (e for group in waiting.values() for e in group)
+                tournament.status = "finished"
+                tournament.winner_name = champion.name
+                break
+
+            progressed = False
+            for round_number in sorted(waiting):
+                group = waiting[round_number]
+                while len(group) >= size:
+                    tables[round_number].append(group[:size])
+                    seated[round_number] += size
+                    del group[:size]
+                    progressed = True
+                still_feeding = any(
+                    n for r, n in seated.items() if r < round_number
+                ) or any(waiting[r] for r in waiting if r < round_number)
+                if not group or still_feeding:
+                    continue
+                # Nobody else can reach this round: play short-handed, or
+                # with a single leftover, take a bye into the next round
+                if len(group) >= 2:
+                    tables[round_number].append(group[:])
+                    seated[round_number] += len(group)
+                else:
+                    entry = group[0]
+                    entry.round = round_number + 1
+                    waiting[round_number + 1].append(entry)
+                group.clear()
+                progressed = True
+        return tables
+
+    async def get_tournament(self, code: str) -> TournamentDB | None:
+        result = await self.session.execute(
+            select(TournamentDB).where(TournamentDB.code == code)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_tables(
+        self, tournament: TournamentDB, round_number: int | None = None
+    ) -> list[GameDB]:
+        stmt = (
+            select(GameDB)
+            .where(GameDB.tournament_id == tournament.id)
+            .options(selectinload(GameDB.players))
+            .order_by(GameDB.tournament_round, GameDB.created_at)
+        )
+        if round_number is not None:
+            stmt = stmt.where(GameDB.tournament_round == round_number)
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def count_entries(self, tournament: TournamentDB) -> tuple[int, int]:
+        """(entrants, still in)"""
+        result = await self.session.execute(
+            select(
+                func.count(TournamentEntryDB.id),
+                func.count(TournamentEntryDB.id).filter(TournamentEntryDB.eliminated.is_(False)),
+            ).where(TournamentEntryDB.tournament_id == tournament.id)
+        )
+        return tuple(result.one())
+
+    async def get_entry(self, code: str, token: str):
+        """An entrant with the session token and game code of their current
+        (or last) seat, or None."""
+        result = await self.session.execute(
+            select(TournamentEntryDB, PlayerDB.session_token, GameDB.code.label("game_code"))
+            .join(TournamentDB, TournamentEntryDB.tournament_id == TournamentDB.id)
+            .outerjoin(PlayerDB, PlayerDB.id == TournamentEntryDB.player_id)
+            .outerjoin(GameDB, GameDB.id == PlayerDB.game_id)
+            .where(TournamentDB.code == code, TournamentEntryDB.token == token)
+        )
+        return result.one_or_none()
+
+
+_finished_games: asyncio.Queue[str] = asyncio.Queue()
+
+
+def notify_game_finished(tournament_id: str):
+    """Called once a tournament game's final commit is durable."""
+    _finished_games.put_nowait(tournament_id)
+
+
+async def _advance(tournament_id: str):
+    try:
+        messages = await run_action(
+            lambda session: TournamentService(session).advance(tournament_id), "tournament"
+        )
+    except GameConflict:
+        # Try the pass again shortly rather than lose it
+        asyncio.get_running_loop().call_later(1, notify_game_finished, tournament_id)
+        return
+    for token, message in messages:
+        await manager.send_personal(token, message)
+
+
+async def run_tournament_scheduler():
+    """Seat tournament winners as their games finish."""
+    async with read_session() as session:
+        result = await session.execute(
+            select(TournamentDB.id).where(TournamentDB.status == "running")
+        )
+        for tournament_id in result.scalars():
+            notify_game_finished(tournament_id)
+
+    while True:
+        pending = {await _finished_games.get()}
+        # Fold a burst of finishes into one pass per tournament
+        while not _finished_games.empty():
+            pending.add(_finished_games.get_nowait())
+        for tournament_id in pending:
+            try:
+                await _advance(tournament_id)
+            except Exception:
+                logger.exception("Scheduling tournament %s failed", tournament_id)
@@ -0,0 +1,158 @@
+"""Lightweight tracing with an OpenTelemetry-shaped API, exported as JSON lines.
+
+Spans nest through a context variable, so a WebSocket action's root span
+parents the GameService methods it calls, the SQL each of those runs and the
+sends that follow. Each finished trace is appended to the trace file as one
+span per line, in a flattened OTLP-style layout:
+
+    {"traceId": ..., "spanId": ..., "parentSpanId": ..., "name": "GameService.process_peg",
+     "startTimeUnixNano": ..., "endTimeUnixNano": ..., "attributes": {...}, "status": "OK"}
+
+Root spans carry ``game.code`` and ``action.seq`` so one slow action can be
+pulled out with grep or jq. Disabled unless CRIBBAGE_TRACE_ENABLED is set;
+every hook checks ``tracer.enabled`` first and does nothing else when off.
+"""
+import itertools
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import settings
+from ..database import DATA_DIR
+
+# SQL text is truncated to this many characters in span attributes
+_STATEMENT_CHARS = 200
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "attributes", "status")
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict | None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "OK"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.status = "ERROR"
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start,
+            "endTimeUnixNano": self.end,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class JsonLinesExporter:
+    """Buffers finished spans and appends them when their trace's root ends."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._buffer: list[str] = []
+        self._file = None
+
+    def export(self, span: Span):
+        self._buffer.append(json.dumps(span.to_dict(), separators=(",", ":"), default=str))
+        if span.parent_id is None:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("\n".join(self._buffer) + "\n")
+        self._file.flush()
+        self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, exporter: JsonLinesExporter, enabled: bool):
+        self.exporter = exporter
+        self.enabled = enabled
+        self._action_seq = itertools.count(1)
+
+    def next_action_seq(self) -> int:
+        return next(self._action_seq)
+
+    def start_span(self, name: str, attributes: dict | None = None) -> Span:
+        """Start a child of the current span without making it current."""
+        return Span(name, current_span.get(), attributes)
+
+    def end_span(self, span: Span):
+        span.end = time.time_ns()
+        self.exporter.export(span)
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: dict | None = None):
+        span = self.start_span(name, attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span)
+
+
+tracer = Tracer(
+    JsonLinesExporter(Path(settings.trace_file) if settings.trace_file else DATA_DIR / "traces.jsonl"),
+    settings.trace_enabled,
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if tracer.enabled:
+        span = tracer.start_span("db.query", {
+            "db.system": "sqlite",
+            "db.statement": statement[:_STATEMENT_CHARS],
+        })
+        conn.info.setdefault("trace_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if tracer.enabled and conn.info.get("trace_spans"):
+        tracer.end_span(conn.info["trace_spans"].pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if tracer.enabled and context.connection is not None and context.connection.info.get("trace_spans"):
+        span = context.connection.info["trace_spans"].pop()
+        span.record_exception(context.original_exception)
+        tracer.end_span(span)
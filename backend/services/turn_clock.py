@@ -0,0 +1,210 @@
+"""Turn clocks: the server moves for a player who runs out of time.
+
+With CRIBBAGE_TURN_CLOCK_SECONDS set, every game waiting on a discard, cut
+or peg has one timer on a shared TimerWheel. Clocks follow the game's
+commits rather than any one code path: GameDB rows flushed in a session
+are collected, and once the commit is durable each game's clock is armed,
+kept or stopped for its new state. The discard clock runs from the deal
+until everyone has discarded; cut and pegging clocks restart with every
+move.
+
+When a clock runs out, the handler given to ``run`` (the WebSocket
+router's) sends the moves ``due_moves`` picks as if the players had sent
+them: the discard GreedyStrategy would make, the cut, and the lowest legal
+card or a Go. A game whose clock has moved CRIBBAGE_TURN_CLOCK_ABANDON_MOVES
+times in a row with no frame from any player, and no one connected, is
+abandoned instead (tournament tables are always played out).
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from ..config import settings
+from ..database import read_session
+from ..game_logic import pegging
+from ..game_logic.deck import card_rank_order
+from ..game_logic.strategies import GreedyStrategy
+from ..models import GameDB
+from .game_service import GameService
+from .timer_wheel import Timer, TimerWheel
+
+logger = logging.getLogger(__name__)
+
+CLOCKED_PHASES = ("discard", "cut", "pegging")
+
+
+class TurnClocks:
+    def __init__(self, seconds: float, tick: float):
+        self.seconds = seconds
+        self.wheel = TimerWheel(tick, start=time.monotonic())
+        # game_id -> (timer, what it is timing)
+        self.clocks: dict[str, tuple[Timer, tuple]] = {}
+        # game_id -> clock moves since a player last sent anything
+        self.idle_moves: dict[str, int] = {}
+        self._handler: Callable[[str, int], Awaitable[None]] | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.seconds > 0
+
+    def update(self, game, now: float | None = None):
+        """Arm, keep or stop ``game``'s clock for its committed state."""
+        if game.status != "playing" or game.current_phase not in CLOCKED_PHASES:
+            self.stop(game.id)
+            return
+        # Discards are made together, so one clock covers the whole phase
+        if game.current_phase == "discard":
+            key = ("discard",)
+        else:
+            key = (game.current_phase, game.current_turn_seat, game.version)
+        clock = self.clocks.get(game.id)
+        if clock is not None:
+            if clock[1] == key:
+                return
+            self.wheel.cancel(clock[0])
+        now = time.monotonic() if now is None else now
+        timer = self.wheel.arm(now + self.seconds, self._expired, game.id, game.version)
+        self.clocks[game.id] = (timer, key)
+
+    def stop(self, game_id: str):
+        clock = self.clocks.pop(game_id, None)
+        if clock is not None:
+            self.wheel.cancel(clock[0])
+        self.idle_moves.pop(game_id, None)
+
+    def player_active(self, game_id: str):
+        self.idle_moves.pop(game_id, None)
+
+    def note_clock_move(self, game_id: str) -> int:
+        """Count a move made by the clock; returns how many in a row."""
+        moves = self.idle_moves.get(game_id, 0) + 1
+        self.idle_moves[game_id] = moves
+        return moves
+
+    def _expired(self, game_id: str, version: int):
+        clock = self.clocks.get(game_id)
+        if clock is not None and not clock[0].active:
+            del self.clocks[game_id]
+        if self._handler is None:
+            return
+        task = asyncio.create_task(self._handle(game_id, version))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, game_id: str, version: int):
+        try:
+            await self._handler(game_id, version)
+        except Exception:
+            logger.exception("Turn clock for game %s failed", game_id)
+
+    async def restore(self):
+        """Give every game in play a fresh clock, e.g. after a restart."""
+        async with read_session() as session:
+            rows = await session.execute(
+                select(
+                    GameDB.id, GameDB.status, GameDB.current_phase,
+                    GameDB.current_turn_seat, GameDB.version,
+                ).where(GameDB.status == "playing")
+            )
+            for row in rows:
+                self.update(row)
+
+    async def run(self, handler: Callable[[str, int], Awaitable[None]]):
+        """Drive the wheel off the real clock, calling ``handler(game_id,
+        version)`` for each clock that runs out."""
+        self._handler = handler
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            for timer in self.wheel.advance(time.monotonic()):
+                timer.fire()
+
+
+turn_clocks = TurnClocks(settings.turn_clock_seconds, settings.timer_wheel_tick)
+
+
+async def due_moves(
+    session: AsyncSession, game_id: str, version: int
+) -> tuple[GameDB | None, list[tuple[str, dict]]]:
+    """The game, and (session token, message) for each move it is waiting on.
+
+    Cut and pegging clocks belong to one turn, so they are void once the
+    game has moved on from the version they were armed at.
+    """
+    game = await session.get(
+        GameDB, game_id, options=[selectinload(GameDB.players), selectinload(GameDB.rounds)]
+    )
+    if game is None:
+        return None, []
+    phase = game.current_phase
+    if game.status != "playing" or phase not in CLOCKED_PHASES:
+        return game, []
+    if phase != "discard" and game.version != version:
+        return game, []
+    service = GameService(session)
+    current_round = await service.get_current_round(game)
+    if current_round is None:
+        return game, []
+    hands = {h.player_id: h for h in await service.get_all_hands_for_round(current_round.id)}
+    seats = {p.seat: p for p in game.players}
+
+    if phase == "discard":
+        count = 2 if game.player_count == 2 else 1
+        strategy = GreedyStrategy()
+        moves = []
+        for player in game.players:
+            hand = hands.get(player.id)
+            cards = json.loads(hand.current_cards) if hand else []
+            if hand is None or len(cards) != len(json.loads(hand.dealt_cards)):
+                continue
+            is_dealer = player.seat == game.current_dealer_seat
+            thrown = strategy.discard(cards, count, is_dealer, random.Random())
+            moves.append((player.session_token, {"type": "discard", "cards": thrown}))
+        return game, moves
+
+    player = seats.get(game.current_turn_seat)
+    if player is None:
+        return game, []
+    if phase == "cut":
+        return game, [(player.session_token, {"type": "cut"})]
+    hand = hands.get(player.id)
+    plays = pegging.valid_peg_plays(json.loads(hand.current_cards), game.peg_count) if hand else []
+    if plays:
+        return game, [(player.session_token, {"type": "peg", "card": min(plays, key=card_rank_order)})]
+    return game, [(player.session_token, {"type": "go"})]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_clocked_games(session, flush_context):
+    if not turn_clocks.enabled:
+        return
+    games = session.info.setdefault("clocked_games", {})
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, GameDB):
+            games[obj.id] = obj
+
+
+@event.listens_for(Session, "after_commit")
+def _update_clocks(session):
+    # Group-commit sessions update once their batch is durable instead
+    if session.info.get("group_commit"):
+        return
+    update_clocks(session.info.pop("clocked_games", None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_clocked_games(session):
+    session.info.pop("clocked_games", None)
+
+
+def update_clocks(games: dict[str, GameDB] | None):
+    if games:
+        for game in games.values():
+            turn_clocks.update(game)
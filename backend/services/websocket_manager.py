@@ -1,5 +1,29 @@
+import asyncio
+import json
+import logging
+import time
+from functools import partial
+from typing import Awaitable, Callable
+
 from fastapi import WebSocket
 
+from ..config import settings
+from . import metrics
+from .game_service import GameService
+from .game_cache import game_info_cache, hand_cache
+from .group_commit import action_session
+from .message_guard import game_views
+from .spectator_feed import Spectator, SpectatorFeed
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Close code for a socket whose game was hibernated; see hibernate_idle
+HIBERNATED = 4003
+
+# Same encoding as WebSocket.send_json, done once per broadcast
+encode = partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+
 
 class ConnectionManager:
     def __init__(self):
@@ -7,6 +31,29 @@ class ConnectionManager:
         self.active_connections: dict[str, dict[str, WebSocket]] = {}
         # session_token -> game_id (reverse lookup)
         self.session_games: dict[str, str] = {}
+        # session_token -> monotonic time of last inbound frame
+        self.last_seen: dict[str, float] = {}
+        # Tokens whose socket failed a send; reaped on the next heartbeat
+        self.dead_tokens: set[str] = set()
+        # game_id -> public event stream shared by that game's spectators
+        self.feeds: dict[str, SpectatorFeed] = {}
+        # game_id -> monotonic time of its last connect or game message
+        self.game_activity: dict[str, float] = {}
+
+    @property
+    def connection_count(self) -> int:
+        return len(self.session_games)
+
+    @property
+    def game_count(self) -> int:
+        return len(self.active_connections)
+
+    @property
+    def spectator_count(self) -> int:
+        return sum(len(feed.spectators) for feed in self.feeds.values())
+
+    def is_full(self) -> bool:
+        return self.connection_count >= settings.ws_max_connections
 
     async def connect(self, websocket: WebSocket, game_id: str, session_token: str):
         await websocket.accept()
@@ -14,13 +61,40 @@ class ConnectionManager:
             self.active_connections[game_id] = {}
         self.active_connections[game_id][session_token] = websocket
         self.session_games[session_token] = game_id
+        self.last_seen[session_token] = time.monotonic()
+        self.game_activity[game_id] = time.monotonic()
+        self.dead_tokens.discard(session_token)
 
-    def disconnect(self, session_token: str):
-        game_id = self.session_games.pop(session_token, None)
-        if game_id and game_id in self.active_connections:
-            self.active_connections[game_id].pop(session_token, None)
-            if not self.active_connections[game_id]:
-                del self.active_connections[game_id]
+    def disconnect(self, session_token: str, websocket: WebSocket | None = None) -> bool:
+        """Forget a connection. Returns False if it was already gone.
+
+        When ``websocket`` is given, the entry is only removed if it still
+        belongs to that socket, so a stale handler can't evict a reconnect.
+        """
+        game_id = self.session_games.get(session_token)
+        if game_id is None:
+            return False
+        conns = self.active_connections.get(game_id, {})
+        if websocket is not None and conns.get(session_token) is not websocket:
+            return False
+
+        del self.session_games[session_token]
+        self.last_seen.pop(session_token, None)
+        self.dead_tokens.discard(session_token)
+        conns.pop(session_token, None)
+        if not conns:
+            self.active_connections.pop(game_id, None)
+            self.game_activity.pop(game_id, None)
+            game_views.forget(game_id)
+        return True
+
+    def touch(self, session_token: str):
+        if session_token in self.session_games:
+            self.last_seen[session_token] = time.monotonic()
+
+    def mark_active(self, game_id: str):
+        if game_id in self.active_connections:
+            self.game_activity[game_id] = time.monotonic()
 
     def get_connection(self, session_token: str) -> WebSocket | None:
         game_id = self.session_games.get(session_token)
@@ -31,22 +105,210 @@ class ConnectionManager:
     async def broadcast_to_game(
         self, game_id: str, message: dict, exclude_token: str | None = None
     ):
+        if tracer.enabled:
+            with tracer.start_as_current_span(
+                "ws.broadcast", {"message.type": message.get("type"), "game.id": game_id}
+            ):
+                return await self._broadcast(game_id, message, exclude_token)
+        await self._broadcast(game_id, message, exclude_token)
+
+    async def _broadcast(self, game_id: str, message: dict, exclude_token: str | None):
+        start = time.perf_counter()
+        frame = encode(message)
+        recipients = 0
         if game_id in self.active_connections:
             for token, ws in list(self.active_connections[game_id].items()):
                 if token != exclude_token:
                     try:
-                        await ws.send_json(message)
+                        await self._send_text(ws, frame, message)
+                        recipients += 1
                     except Exception:
                         # Connection may have closed
-                        pass
+                        self.dead_tokens.add(token)
+        feed = self.feeds.get(game_id)
+        if feed:
+            feed.publish(frame)
+            recipients += len(feed.spectators)
+        metrics.broadcast_seconds.observe(time.perf_counter() - start)
+        metrics.broadcast_recipients.observe(recipients)
+
+    async def send_to_players(self, game_id: str, messages: dict[str, dict], public: dict):
+        """Send each seated player its own message (keyed by session token)
+        and the public one to the game's spectators."""
+        start = time.perf_counter()
+        recipients = 0
+        for token, ws in list(self.active_connections.get(game_id, {}).items()):
+            message = messages.get(token)
+            if message is None:
+                continue
+            try:
+                await self._send_text(ws, encode(message), message)
+                recipients += 1
+            except Exception:
+                self.dead_tokens.add(token)
+        feed = self.feeds.get(game_id)
+        if feed:
+            feed.publish(encode(public))
+            recipients += len(feed.spectators)
+        metrics.broadcast_seconds.observe(time.perf_counter() - start)
+        metrics.broadcast_recipients.observe(recipients)
+
+    async def _send_text(self, ws: WebSocket, frame: str, message: dict):
+        if tracer.enabled:
+            with tracer.start_as_current_span(
+                "ws.send", {"message.type": message.get("type"), "message.bytes": len(frame)}
+            ):
+                return await ws.send_text(frame)
+        await ws.send_text(frame)
+
+    async def add_spectator(
+        self,
+        websocket: WebSocket,
+        game_id: str,
+        load_snapshot: Callable[[], Awaitable[dict]],
+    ) -> Spectator | None:
+        feed = self.feeds.get(game_id)
+        if feed and len(feed.spectators) >= settings.spectator_max_per_game:
+            await websocket.close(code=1013, reason="Too many spectators")
+            return None
+        await websocket.accept()
+        if feed is None:
+            feed = self.feeds[game_id] = SpectatorFeed(load_snapshot, encode)
+        return feed.add(websocket, settings.spectator_queue_size)
+
+    def remove_spectator(self, game_id: str, spectator: Spectator):
+        feed = self.feeds.get(game_id)
+        if feed is None:
+            return
+        feed.remove(spectator)
+        if not feed.spectators:
+            del self.feeds[game_id]
 
     async def send_personal(self, session_token: str, message: dict):
         ws = self.get_connection(session_token)
         if ws:
             try:
-                await ws.send_json(message)
+                await self._send_text(ws, encode(message), message)
+            except Exception:
+                self.dead_tokens.add(session_token)
+
+    async def ping_all(self):
+        for token, game_id in list(self.session_games.items()):
+            ws = self.active_connections.get(game_id, {}).get(token)
+            if ws is None:
+                continue
+            try:
+                await ws.send_json({"type": "ping"})
             except Exception:
-                pass
+                self.dead_tokens.add(token)
+
+    def reap_stale(self) -> list[tuple[str, str, WebSocket]]:
+        """Drop connections that failed a send or stopped answering pings.
+
+        Returns (session_token, game_id, websocket) for each reaped entry.
+        """
+        cutoff = time.monotonic() - settings.ws_idle_timeout
+        stale = set(self.dead_tokens)
+        stale.update(t for t, seen in self.last_seen.items() if seen < cutoff)
+
+        reaped = []
+        for token in stale:
+            game_id = self.session_games.get(token)
+            ws = self.get_connection(token)
+            if game_id is not None and ws is not None and self.disconnect(token):
+                reaped.append((token, game_id, ws))
+        self.dead_tokens.clear()
+        return reaped
+
+    def hibernate_idle(self) -> tuple[list[tuple[str, str, WebSocket]], list[WebSocket]]:
+        """Forget every game with no connect or game message (pongs don't
+        count) for CRIBBAGE_HIBERNATE_AFTER_MINUTES, with its sockets,
+        spectators and cached state.
+
+        Returns (session_token, game_id, websocket) for each player and the
+        spectator sockets to close; the next connect brings the game back.
+        """
+        if settings.hibernate_after_minutes <= 0:
+            return [], []
+        cutoff = time.monotonic() - settings.hibernate_after_minutes * 60
+        idle = [game_id for game_id, seen in self.game_activity.items() if seen < cutoff]
+        players, spectators = [], []
+        for game_id in idle:
+            for token, ws in list(self.active_connections.get(game_id, {}).items()):
+                if self.disconnect(token):
+                    players.append((token, game_id, ws))
+            feed = self.feeds.pop(game_id, None)
+            if feed:
+                for spectator in list(feed.spectators):
+                    feed.remove(spectator)
+                    spectators.append(spectator.websocket)
+            hand_cache.evict(game_id)
+        if idle:
+            game_info_cache.evict_games(set(idle))
+        return players, spectators
 
 
 manager = ConnectionManager()
+
+
+async def run_heartbeat():
+    """Ping every socket periodically, reap the ones that went quiet and
+    hibernate idle games."""
+    while True:
+        await asyncio.sleep(settings.ws_ping_interval)
+        try:
+            await manager.ping_all()
+
+            reaped = manager.reap_stale()
+            hibernated, spectators = manager.hibernate_idle()
+            if not reaped and not hibernated and not spectators:
+                continue
+
+            tokens = [token for token, _, _ in (*reaped, *hibernated)]
+            batch_size = settings.ws_reap_batch_size
+            players = []
+            async with action_session() as session:
+                service = GameService(session)
+                for i in range(0, len(tokens), batch_size):
+                    players.extend(
+                        await service.mark_tokens_disconnected(tokens[i:i + batch_size])
+                    )
+
+            # Hibernated games have no one left to tell
+            asleep = {game_id for _, game_id, _ in hibernated}
+            metrics.games_hibernated.inc(amount=len(asleep))
+            for player in players:
+                if player.game_id in asleep:
+                    continue
+                await manager.broadcast_to_game(
+                    player.game_id,
+                    {
+                        "type": "player_status",
+                        "player_id": player.id,
+                        "name": player.name,
+                        "seat": player.seat,
+                        "connected": False,
+                    },
+                )
+
+            # A half-open socket can stall the close handshake, so close in
+            # the background rather than holding up the next cycle.
+            closing = [(ws, 4002, "Heartbeat timeout") for _, _, ws in reaped]
+            closing += [(ws, HIBERNATED, "Game idle") for _, _, ws in hibernated]
+            closing += [(ws, HIBERNATED, "Game idle") for ws in spectators]
+            for ws, code, reason in closing:
+                task = asyncio.create_task(_close_quietly(ws, code, reason))
+                _closing.add(task)
+                task.add_done_callback(_closing.discard)
+        except Exception:
+            logger.exception("Heartbeat cycle failed")
+
+
+_closing: set[asyncio.Task] = set()
+
+
+async def _close_quietly(websocket: WebSocket, code: int, reason: str):
+    try:
+        await websocket.close(code=code, reason=reason)
+    except Exception:
+        pass
@@ -0,0 +1,336 @@
+"""Optional sharded storage: games spread over several SQLite files.
+
+With CRIBBAGE_DATABASE_SHARDS above 1, every game lives in one of N
+databases, chosen by a hash of its code, and each database has its own
+engines and therefore its own write lock. Sessions are SQLAlchemy
+ShardedSessions that route each statement by what it filters on:
+
+- a game or tournament code goes to the shard it hashes to;
+- a session token goes through ``token_index``, which maps every token
+  this process has seen to its shard;
+- an id goes to the shard the session loaded that row from;
+- anything else (listings, cleanup) runs on every shard, results
+  concatenated.
+
+Concatenated results are only ordered within each shard, and a LIMIT
+would apply per shard, so a statement with ORDER BY or LIMIT that spans
+shards is refused. Callers run such reads once per shard (``per_shard``)
+and merge them (``merge_sorted``), or pass the ``per_shard_order``
+execution option when the order only matters among one game's rows,
+which never span shards.
+
+New rows follow their parent: players, rounds and hands their game, a
+tournament's entries and tables their tournament (table codes are redrawn
+until they hash there), so a game's or a tournament's rows always share a
+file and every join stays within one shard. Player stats are upserted in
+whichever shard the game being scored lives in and summed when read.
+"""
+import heapq
+import os
+import secrets
+import zlib
+from typing import AsyncIterator, Callable
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.ext.horizontal_shard import ShardedSession, set_shard_id
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+from .config import settings
+
+# Shard ids are strings: SQLAlchemy treats a falsy identity token as none
+SHARD_IDS = [str(i) for i in range(max(1, settings.database_shards))]
+
+
+def shard_url(url: str, shard: str) -> str:
+    """The URL of one shard: ``{shard}`` filled in, or the shard number
+    appended to the file name (``cribbage.db`` -> ``cribbage-0.db``)."""
+    if "{shard}" in url:
+        return url.format(shard=shard)
+    root, ext = os.path.splitext(url)
+    return f"{root}-{shard}{ext}"
+
+
+def shard_for_code(code: str) -> str:
+    return SHARD_IDS[zlib.crc32(code.encode()) % len(SHARD_IDS)]
+
+
+class TokenIndex:
+    """Session token -> shard, keyed by the token's first 64 bits.
+
+    Tokens are 64 hex digits, so an int key costs a fraction of the token
+    string and the shard ids are shared strings. A token that isn't in the
+    index (or isn't hex) is looked up on every shard.
+    """
+
+    def __init__(self):
+        self._shards: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    @staticmethod
+    def _key(token: str) -> int | None:
+        try:
+            return int(token[:16], 16)
+        except (TypeError, ValueError):
+            return None
+
+    def add(self, token: str, shard: str):
+        key = self._key(token)
+        if key is not None:
+            self._shards[key] = shard
+
+    def get(self, token: str) -> str | None:
+        key = self._key(token)
+        return None if key is None else self._shards.get(key)
+
+    async def load(self, engines: dict[str, object]):
+        """Index every seated player's token, shard by shard."""
+        from .models import PlayerDB
+
+        self._shards.clear()
+        for shard, engine in engines.items():
+            async with engine.connect() as conn:
+                result = await conn.stream(select(PlayerDB.session_token))
+                async for (token,) in result:
+                    self.add(token, shard)
+
+
+token_index = TokenIndex()
+
+
+class _Routes:
+    """What the columns statements filter on say about the shard, built
+    once the models are imported."""
+
+    def __init__(self):
+        from .database import Base
+        from .models import GameDB, PlayerDB, PlayerHandDB, RoundDB, TournamentDB, TournamentEntryDB
+
+        self.game, self.tournament, self.player = GameDB, TournamentDB, PlayerDB
+        self.codes = {GameDB.__table__.c.code, TournamentDB.__table__.c.code}
+        self.tokens = {PlayerDB.__table__.c.session_token}
+        # Column -> the mapped class whose primary key it holds
+        classes = {m.local_table: m.class_ for m in Base.registry.mappers}
+        self.ids = {}
+        for table, cls in classes.items():
+            for column in table.primary_key:
+                self.ids[column] = cls
+            for fk in table.foreign_keys:
+                if fk.column.table in classes:
+                    self.ids[fk.parent] = classes[fk.column.table]
+        self.ids[GameDB.__table__.c.tournament_id] = TournamentDB
+        self.ids[TournamentEntryDB.__table__.c.game_id] = GameDB
+        self.ids[TournamentEntryDB.__table__.c.player_id] = PlayerDB
+        # New rows follow their parent: (relationship, parent class, id column)
+        self.parents = {
+            PlayerDB: [("game", GameDB, "game_id")],
+            RoundDB: [("game", GameDB, "game_id")],
+            PlayerHandDB: [("round", RoundDB, "round_id"), ("player", PlayerDB, "player_id")],
+            TournamentEntryDB: [("tournament", TournamentDB, "tournament_id")],
+        }
+
+
+_routes: _Routes | None = None
+
+
+def _get_routes() -> _Routes:
+    global _routes
+    if _routes is None:
+        _routes = _Routes()
+    return _routes
+
+
+class GameShardedSession(ShardedSession):
+    """ShardedSession routing by code, token and id as described above.
+
+    ``info["shard"]`` is the first shard a statement was routed to alone,
+    normally the game the session is acting on; INSERT statements that
+    name no shard (the stats upsert) go there.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            shard_chooser=self._choose_for_instance,
+            identity_chooser=self._choose_for_identity,
+            execute_chooser=self._choose_for_statement,
+            **kwargs,
+        )
+
+    def _known_shard(self, cls, ident) -> str | None:
+        """The shard a row was loaded from (or placed in) by this session."""
+        for shard in SHARD_IDS:
+            if identity_key(cls, ident, identity_token=shard) in self.identity_map:
+                return shard
+        for obj in self.new:
+            if type(obj) is cls and obj.id == ident:
+                return self.place(obj)
+        return None
+
+    def place(self, obj) -> str:
+        """Choose (once) the shard a new row goes to."""
+        state = inspect(obj)
+        if state.key is not None:
+            return state.key[2]
+        if state.identity_token is not None:
+            return state.identity_token
+        routes = _get_routes()
+        cls = type(obj)
+        if cls is routes.game:
+            shard = None
+            if obj.tournament_id is not None:
+                shard = self._known_shard(routes.tournament, obj.tournament_id)
+            if shard is None:
+                shard = shard_for_code(obj.code)
+            while shard_for_code(obj.code) != shard:
+                obj.code = secrets.token_urlsafe(6)[:8]
+        elif cls is routes.tournament:
+            shard = shard_for_code(obj.code)
+        else:
+            shard = None
+            for attr, parent_cls, column in routes.parents.get(cls, ()):
+                parent = obj.__dict__.get(attr)
+                if parent is not None:
+                    shard = self.place(parent)
+                elif getattr(obj, column) is not None:
+                    shard = self._known_shard(parent_cls, getattr(obj, column))
+                if shard is not None:
+                    break
+            if shard is None:
+                shard = self.info.get("shard", SHARD_IDS[0])
+        state.identity_token = shard
+        if cls is routes.player:
+            token_index.add(obj.session_token, shard)
+        return shard
+
+    def _choose_for_instance(self, mapper, instance, clause=None):
+        if instance is not None:
+            return self.place(instance)
+        return self.info.get("shard", SHARD_IDS[0])
+
+    def _choose_for_identity(self, mapper, primary_key, *, lazy_loaded_from, **kw):
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token is not None:
+            return [lazy_loaded_from.identity_token]
+        if len(primary_key) == 1:
+            shard = self._known_shard(mapper.class_, primary_key[0])
+            if shard is not None:
+                return [shard]
+        return SHARD_IDS
+
+    def _choose_for_statement(self, orm_context) -> list[str]:
+        # Relationship loads run on the shard of the rows they load for
+        parent = orm_context.execution_options.get("identity_token")
+        if parent is not None:
+            return [parent]
+        if orm_context.is_insert:
+            return [self.info.get("shard", SHARD_IDS[0])]
+        params = orm_context.parameters if isinstance(orm_context.parameters, dict) else {}
+        statement = orm_context.statement
+        shards = None
+        for clause in _conjuncts(getattr(statement, "whereclause", None)):
+            found = self._shards_for_clause(clause, params)
+            if found is not None:
+                shards = found if shards is None else shards & found
+        if shards and len(shards) == 1:
+            self.info.setdefault("shard", next(iter(shards)))
+            return sorted(shards)
+        if getattr(statement, "_limit_clause", None) is not None or (
+            getattr(statement, "_order_by_clauses", None)
+            and not orm_context.execution_options.get("per_shard_order")
+        ):
+            raise RuntimeError(
+                "An ordered or limited statement spans shards; run it per_shard and merge"
+            )
+        return sorted(shards) if shards else SHARD_IDS
+
+    def _shards_for_clause(self, clause, params: dict) -> set[str] | None:
+        """Shards a row matching ``column == value`` or ``column IN (...)``
+        can be in, or None if the clause doesn't say."""
+        if not isinstance(clause, BinaryExpression):
+            return None
+        if clause.operator not in (operators.eq, operators.in_op):
+            return None
+        column, param = clause.left, clause.right
+        if not isinstance(param, BindParameter):
+            return None
+        value = params.get(param.key, param.value)
+        if value is None:
+            return None
+        values = value if clause.operator is operators.in_op else [value]
+        table = getattr(column, "table", None)
+        column = getattr(table, "c", {}).get(column.key) if table is not None else None
+        if column is None:
+            return None
+        routes = _get_routes()
+        if column in routes.codes:
+            return {shard_for_code(v) for v in values}
+        if column in routes.tokens:
+            shards = {token_index.get(v) for v in values}
+            return None if None in shards else shards
+        cls = routes.ids.get(column)
+        if cls is None:
+            return None
+        shards = {self._known_shard(cls, v) for v in values}
+        return None if None in shards else shards
+
+
+def per_shard(stmt) -> list:
+    """``stmt`` pinned to each shard in turn, for ordered or limited reads
+    the caller merges itself; just ``stmt`` when storage isn't sharded."""
+    if len(SHARD_IDS) == 1:
+        return [stmt]
+    return [stmt.options(set_shard_id(shard)) for shard in SHARD_IDS]
+
+
+async def merge_sorted(streams: list, key: Callable) -> AsyncIterator:
+    """Merge async row streams that are each already sorted by ``key``."""
+    heap = []
+    for i, stream in enumerate(streams):
+        row = await anext(stream, None)
+        if row is not None:
+            heap.append((key(row), i, row))
+    heapq.heapify(heap)
+    while heap:
+        _, i, row = heap[0]
+        yield row
+        row = await anext(streams[i], None)
+        if row is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (key(row), i, row))
+
+
+def _conjuncts(clause):
+    if clause is None:
+        return []
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        return [c for part in clause.clauses for c in _conjuncts(part)]
+    return [clause]
+
+
+@event.listens_for(Session, "transient_to_pending")
+def _place_new_game(session, instance):
+    # Games are placed as soon as they are added, so a redrawn table code is
+    # already the one callers read back (e.g. to send players to the table)
+    if isinstance(session, GameShardedSession) and type(instance) is _get_routes().game:
+        session.place(instance)
+
+
+@event.listens_for(Session, "before_flush")
+def _place_new_rows(session, flush_context, instances):
+    if isinstance(session, GameShardedSession):
+        for obj in list(session.new):
+            session.place(obj)
+
+
+def sharded_sessionmaker(engines: dict[str, object]) -> async_sessionmaker:
+    return async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=GameShardedSession,
+        shards={shard: engine.sync_engine for shard, engine in engines.items()},
+        expire_on_commit=False,
+    )
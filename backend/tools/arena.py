@@ -0,0 +1,132 @@
+"""Play two bot strategies against each other and say which is stronger.
+
+    python -m backend.tools.arena greedy random
+    python -m backend.tools.arena expected greedy --pairs 4000 --workers 8
+    python -m backend.tools.arena mybots.strategies:Cautious greedy
+
+Games are played in duplicate pairs (backend.game_logic.selfplay): the
+same deals twice with the seats swapped, so a pair's result depends far
+less on the cards than two independent games would. Pairs are played
+--batch at a time across a process pool. After each batch the arena
+stops if the confidence interval on A's score (a won game counts 1) no
+longer contains 50%. Every such check spends part of the error budget
+(Bonferroni over the checks --pairs allows), so stopping early doesn't
+inflate the false-positive rate. The report gives win rate, points per
+game and the Elo difference, each with its interval.
+"""
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist, fmean, stdev
+
+from ..game_logic.selfplay import play_duplicate
+from ..game_logic.strategies import load_strategy
+
+
+def play_pairs(a_spec: str, b_spec: str, seeds: list[int]) -> list[tuple[list[int], list[int]]]:
+    a, b = load_strategy(a_spec), load_strategy(b_spec)
+    return [play_duplicate(a, b, seed, 2 * seed) for seed in seeds]
+
+
+class Tally:
+    """Per-pair results from A's point of view."""
+
+    def __init__(self):
+        self.scores: list[float] = []
+        self.margins: list[float] = []
+        self.points_a: list[int] = []
+        self.points_b: list[int] = []
+
+    def add(self, games: tuple[list[int], list[int]]):
+        self.scores.append(sum(a > b for a, b in games) / 2)
+        self.margins.append(sum(a - b for a, b in games) / 2)
+        for a, b in games:
+            self.points_a.append(a)
+            self.points_b.append(b)
+
+    @property
+    def pairs(self) -> int:
+        return len(self.scores)
+
+    def interval(self, samples: list[float], z: float) -> tuple[float, float, float]:
+        mean = fmean(samples)
+        half = z * stdev(samples) / math.sqrt(len(samples)) if len(samples) > 1 else math.inf
+        return mean, mean - half, mean + half
+
+
+def elo(score: float, games: int) -> float:
+    """Rating difference for an expected score, clamped half a game from 0 and 1."""
+    score = min(max(score, 0.5 / games), 1 - 0.5 / games)
+    return -400 * math.log10(1 / score - 1)
+
+
+def run(a: str, b: str, pairs: int, batch: int, workers: int, confidence: float, seed: int):
+    looks = math.ceil(pairs / batch)
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / (2 * looks))
+    tally = Tally()
+    decided = False
+    chunk = max(1, math.ceil(batch / workers))
+    with ProcessPoolExecutor(workers) as pool:
+        while tally.pairs < pairs and not decided:
+            start = seed + tally.pairs
+            seeds = list(range(start, start + min(batch, pairs - tally.pairs)))
+            chunks = [seeds[i:i + chunk] for i in range(0, len(seeds), chunk)]
+            for results in pool.map(play_pairs, [a] * len(chunks), [b] * len(chunks), chunks):
+                for games in results:
+                    tally.add(games)
+            _, low, high = tally.interval(tally.scores, z)
+            decided = low > 0.5 or high < 0.5
+    return tally, z, looks, decided
+
+
+def report(a: str, b: str, tally: Tally, z: float, looks: int, decided: bool, confidence: float) -> str:
+    games = 2 * tally.pairs
+    score, low, high = tally.interval(tally.scores, z)
+    low, high = max(low, 0.0), min(high, 1.0)
+    margin, margin_low, margin_high = tally.interval(tally.margins, z)
+    wins = round(score * games)
+    lines = [
+        f"{a} vs {b}: {tally.pairs} duplicate pairs ({games} games)",
+        f"intervals: {confidence:.0%} over {looks} checks (z = {z:.2f})",
+        "",
+        f"{a} won {wins}/{games}: {score:.1%} [{low:.1%}, {high:.1%}]",
+        f"points per game: {a} {fmean(tally.points_a):.1f}, {b} {fmean(tally.points_b):.1f}, "
+        f"margin {margin:+.1f} [{margin_low:+.1f}, {margin_high:+.1f}]",
+        f"Elo: {elo(score, games):+.0f} [{elo(low, games):+.0f}, {elo(high, games):+.0f}]",
+        "",
+    ]
+    if decided:
+        lines.append(f"{a if score > 0.5 else b} is stronger")
+    else:
+        lines.append("no significant difference")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("a", help="strategy name or module:attr")
+    parser.add_argument("b", help="strategy name or module:attr")
+    parser.add_argument("--pairs", type=int, default=2000, help="most duplicate pairs to play")
+    parser.add_argument("--batch", type=int, default=200, help="pairs between stopping checks")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, help="first deal seed (default: random)")
+    args = parser.parse_args()
+
+    # Fail on a bad strategy before starting the pool
+    load_strategy(args.a), load_strategy(args.b)
+    seed = args.seed if args.seed is not None else random.randrange(2**32)
+    start = time.perf_counter()
+    tally, z, looks, decided = run(
+        args.a, args.b, args.pairs, args.batch, args.workers, args.confidence, seed
+    )
+    print(report(args.a, args.b, tally, z, looks, decided, args.confidence))
+    elapsed = time.perf_counter() - start
+    print(f"{2 * tally.pairs / elapsed:.0f} games/s on {args.workers} workers, first seed {seed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Rebuild player_stats from the games in the database and the archive.
+
+    python -m backend.tools.backfill_stats [--workers N] [--chunk GAMES]
+
+Games are read in chunks and replayed (JSON decoding and pegging
+replay) across a process pool; the merged totals replace player_stats in
+one transaction. Archived games are replayed from their blobs, so only
+games purged from the archive drop out of the totals. Run it once after
+upgrading, ideally while the server is idle, since hands scored during
+the run are counted by both.
+"""
+import argparse
+import asyncio
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select
+
+from ..database import archive_session, async_session, init_db
+from ..game_logic.stats import StatsDelta, replay_game
+from ..models import ArchivedGameDB, GameDB, PlayerDB, PlayerHandDB, RoundDB
+from ..services.stats_service import StatsService
+
+
+def replay_chunk(games: list[dict]) -> StatsDelta:
+    delta = StatsDelta()
+    for game in games:
+        delta.merge(replay_game(game))
+    return delta
+
+
+def replay_archived_chunk(payloads: list[bytes]) -> StatsDelta:
+    delta = StatsDelta()
+    for payload in payloads:
+        delta.merge(replay_game(from_archive(json.loads(zlib.decompress(payload)))))
+    return delta
+
+
+def from_archive(game: dict) -> dict:
+    """An archived game (see archive_service.serialize_game) in the raw-row
+    shape replay_game takes; seats stand in for player ids."""
+    return {
+        "status": game["status"],
+        "is_teams": game["is_teams"],
+        "players": [{"id": p["seat"], **p} for p in game["players"]],
+        "rounds": [
+            {
+                "dealer_seat": r["dealer_seat"],
+                "crib_score": r["crib_score"],
+                "peg_history": json.dumps(r["peg_history"]),
+                "hands": [
+                    {
+                        "player_id": h["seat"],
+                        "hand_score": h["hand_score"],
+                        "peg_points": h.get("peg_points"),
+                    }
+                    for h in r["hands"]
+                ],
+            }
+            for r in game["rounds"]
+        ],
+    }
+
+
+async def load_games(session, game_ids: list[str]) -> list[dict]:
+    """Raw rows for a chunk of games, JSON columns left encoded."""
+    games = {
+        row.id: {
+            "status": row.status,
+            "is_teams": row.is_teams,
+            "players": [],
+            "rounds": [],
+        }
+        for row in await session.execute(
+            select(GameDB.id, GameDB.status, GameDB.is_teams).where(GameDB.id.in_(game_ids))
+        )
+    }
+    for row in await session.execute(
+        select(PlayerDB.id, PlayerDB.game_id, PlayerDB.name, PlayerDB.seat, PlayerDB.team, PlayerDB.score)
+        .where(PlayerDB.game_id.in_(game_ids))
+    ):
+        games[row.game_id]["players"].append(
+            {"id": row.id, "name": row.name, "seat": row.seat, "team": row.team, "score": row.score}
+        )
+
+    rounds = {}
+    for row in await session.execute(
+        select(
+            RoundDB.id,
+            RoundDB.game_id,
+            RoundDB.dealer_seat,
+            RoundDB.crib_score,
+            RoundDB.peg_history,
+        )
+        .where(RoundDB.game_id.in_(game_ids))
+        .order_by(RoundDB.round_number)
+        .execution_options(per_shard_order=True)
+    ):
+        rounds[row.id] = {
+            "dealer_seat": row.dealer_seat,
+            "crib_score": row.crib_score,
+            "peg_history": row.peg_history,
+            "hands": [],
+        }
+        games[row.game_id]["rounds"].append(rounds[row.id])
+
+    for row in await session.execute(
+        select(
+            PlayerHandDB.round_id,
+            PlayerHandDB.player_id,
+            PlayerHandDB.hand_score,
+            PlayerHandDB.peg_points,
+        )
+        .join(RoundDB, PlayerHandDB.round_id == RoundDB.id)
+        .where(RoundDB.game_id.in_(game_ids))
+    ):
+        rounds[row.round_id]["hands"].append(
+            {"player_id": row.player_id, "hand_score": row.hand_score, "peg_points": row.peg_points}
+        )
+    return list(games.values())
+
+
+async def backfill(workers: int, chunk: int) -> int:
+    await init_db()
+    loop = asyncio.get_running_loop()
+    total = StatsDelta()
+    pending: set[asyncio.Future] = set()
+    game_count = 0
+    hot_ids: set[str] = set()
+
+    def collect(done):
+        for future in done:
+            total.merge(future.result())
+
+    async def submit(replay, chunk_data):
+        nonlocal pending
+        pending.add(loop.run_in_executor(pool, replay, chunk_data))
+        # Keep a bounded number of chunks in flight
+        if len(pending) >= workers * 2:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+
+    with ProcessPoolExecutor(workers) as pool:
+        async with async_session() as session:
+            result = await session.stream_scalars(
+                select(GameDB.id)
+                .order_by(GameDB.created_at)
+                .execution_options(yield_per=chunk, per_shard_order=True)
+            )
+            async for game_ids in result.partitions():
+                hot_ids.update(game_ids)
+                async with async_session() as reader:
+                    games = await load_games(reader, list(game_ids))
+                game_count += len(games)
+                await submit(replay_chunk, games)
+        async with archive_session() as archive:
+            result = await archive.stream(
+                select(ArchivedGameDB.game_id, ArchivedGameDB.payload)
+                .execution_options(yield_per=chunk)
+            )
+            async for rows in result.partitions():
+                # A crash mid-archive can leave a game in both stores
+                payloads = [row.payload for row in rows if row.game_id not in hot_ids]
+                game_count += len(payloads)
+                if payloads:
+                    await submit(replay_archived_chunk, payloads)
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            collect(done)
+
+    async with async_session() as session:
+        service = StatsService(session)
+        await service.reset()
+        await service.apply(total)
+        await session.commit()
+    return game_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=200, help="games per work unit")
+    args = parser.parse_args()
+    games = asyncio.run(backfill(args.workers, args.chunk))
+    print(f"Rebuilt player stats from {games} games")
+
+
+if __name__ == "__main__":
+    main()
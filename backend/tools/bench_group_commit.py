@@ -0,0 +1,54 @@
+"""Benchmark action throughput and latency against the group-commit window.
+
+    python -m backend.tools.bench_group_commit --windows 0,1,2,5,10 --tables 40
+
+Starts a fresh server per window size (0 means group commit off), plays the
+same load against each with backend.tools.loadtest, and prints one row per
+window.
+"""
+import argparse
+import asyncio
+
+from .loadtest import run, spawn_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", default="0,1,2,5,10", help="window sizes in ms; 0 disables")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--players", type=int, default=2, choices=(2, 3, 4))
+    parser.add_argument("--ramp", type=float, default=20.0, help="new tables per second")
+    parser.add_argument("--think", type=float, default=0.0, help="think time per action, ms")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    rows = []
+    for window in (float(w) for w in args.windows.split(",")):
+        overrides = {"CRIBBAGE_GROUP_COMMIT_ENABLED": "true" if window else "false"}
+        if window:
+            overrides["CRIBBAGE_GROUP_COMMIT_WINDOW_MS"] = str(window)
+            overrides["CRIBBAGE_GROUP_COMMIT_MAX_BATCH"] = str(args.max_batch)
+        with spawn_server(**overrides) as base_url:
+            stats = asyncio.run(run(
+                base_url, args.tables, args.players, True, args.ramp,
+                args.think / 1000, args.timeout,
+            ))
+        rows.append((window, stats))
+        print(f"window {window:g}ms done", flush=True)
+
+    print()
+    print(f"{'window ms':>10}{'actions/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'games':>8}{'errors':>8}")
+    for window, stats in rows:
+        print(
+            f"{'off' if not window else f'{window:g}':>10}"
+            f"{stats.actions / stats.elapsed:>12.1f}"
+            f"{stats.percentile(0.5) * 1000:>10.1f}"
+            f"{stats.percentile(0.99) * 1000:>10.1f}"
+            f"{stats.games_finished:>8}"
+            f"{sum(stats.errors.values()):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
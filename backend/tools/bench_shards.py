@@ -0,0 +1,57 @@
+"""Benchmark action throughput and latency against the number of shards.
+
+    python -m backend.tools.bench_shards --shards 1,2,4,8 --tables 40
+
+Starts a fresh server per shard count (1 is the single database), plays
+the same load against each with backend.tools.loadtest, and prints one row
+per count. Every action is a write, so actions/s is write throughput.
+--synchronous sets the SQLite sync mode for all runs: with FULL each commit
+waits for its fsync while holding its database's write lock, which is
+where more locks pay off most.
+"""
+import argparse
+import asyncio
+
+from .loadtest import run, spawn_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", default="1,2,4,8", help="shard counts to compare")
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--players", type=int, default=2, choices=(2, 3, 4))
+    parser.add_argument("--ramp", type=float, default=20.0, help="new tables per second")
+    parser.add_argument("--think", type=float, default=0.0, help="think time per action, ms")
+    parser.add_argument("--synchronous", default="normal", choices=("off", "normal", "full"))
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    rows = []
+    for shards in (int(n) for n in args.shards.split(",")):
+        overrides = {
+            "CRIBBAGE_DATABASE_SHARDS": str(shards),
+            "CRIBBAGE_SQLITE_SYNCHRONOUS": args.synchronous,
+        }
+        with spawn_server(**overrides) as base_url:
+            stats = asyncio.run(run(
+                base_url, args.tables, args.players, True, args.ramp,
+                args.think / 1000, args.timeout,
+            ))
+        rows.append((shards, stats))
+        print(f"{shards} shards done", flush=True)
+
+    print()
+    print(f"{'shards':>8}{'actions/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'games':>8}{'errors':>8}")
+    for shards, stats in rows:
+        print(
+            f"{shards:>8}"
+            f"{stats.actions / stats.elapsed:>12.1f}"
+            f"{stats.percentile(0.5) * 1000:>10.1f}"
+            f"{stats.percentile(0.99) * 1000:>10.1f}"
+            f"{stats.games_finished:>8}"
+            f"{sum(stats.errors.values()):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
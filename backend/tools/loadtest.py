@@ -0,0 +1,291 @@
+"""Load-test a server by playing real games over its public API.
+
+    python -m backend.tools.loadtest --spawn --tables 200 --ramp 20
+    python -m backend.tools.loadtest --url http://127.0.0.1:8000 --tables 50
+
+Each table is created through POST /api/games and /join, then every seat
+opens /ws/{code} and plays a full game by reacting to state_sync,
+round_transition, phase_change and valid_plays. Tables start at --ramp
+tables per second and every action waits --think milliseconds (jittered)
+first. The report gives action-to-broadcast latency (time from sending an
+action until the actor's own socket sees the broadcast it caused),
+throughput and error counts.
+
+--spawn starts uvicorn on a free local port against throwaway databases,
+so nothing touches data/.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+
+import websockets
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.games_finished = 0
+        self.actions = 0
+        self.elapsed = 0.0
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(s for samples in self.latencies.values() for s in samples)
+        return _percentile(ordered, q) if ordered else 0.0
+
+    def report(self) -> str:
+        elapsed = self.elapsed
+        lines = [
+            f"games finished: {self.games_finished}",
+            f"actions: {self.actions} in {elapsed:.1f}s ({self.actions / elapsed:.1f}/s)",
+            "",
+            f"{'action':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+        ]
+        everything = []
+        for action, samples in sorted(self.latencies.items()):
+            everything.extend(samples)
+            lines.append(_latency_row(action, samples))
+        if everything:
+            lines.append(_latency_row("all", everything))
+        lines.append("")
+        if self.errors:
+            lines.extend(f"error {kind}: {n}" for kind, n in sorted(self.errors.items()))
+        else:
+            lines.append("errors: 0")
+        return "\n".join(lines)
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _latency_row(action: str, samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p50, p95, p99 = (_percentile(ordered, q) * 1000 for q in (0.5, 0.95, 0.99))
+    return f"{action:<10}{len(ordered):>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{ordered[-1] * 1000:>10.1f}"
+
+
+def _post(base_url: str, path: str, body: dict) -> dict:
+    req = urllib.request.Request(
+        base_url + path,
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+class Seat:
+    """One player's socket, driven entirely by what the server sends."""
+
+    # Broadcast that acknowledges each action, matched on the actor's seat
+    ACKS = {
+        "discard": "discard_complete",
+        "cut": "cut_card",
+        "peg": "peg_play",
+        "go": "peg_go",
+    }
+
+    def __init__(self, ws_url: str, session_token: str, seat: int, think: float, stats: Stats):
+        self.url = f"{ws_url}?session_token={session_token}"
+        self.seat = seat
+        self.think = think
+        self.stats = stats
+        self.pending: dict[str, float] = {}
+
+    async def act(self, ws, action: str, **payload):
+        if self.think:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.think)
+        self.pending[action] = time.perf_counter()
+        self.stats.actions += 1
+        await ws.send(json.dumps({"type": action, **payload}))
+
+    def acknowledge(self, msg: dict):
+        for action, ack in self.ACKS.items():
+            if msg["type"] == ack and msg.get("player_seat", self.seat) == self.seat:
+                sent = self.pending.pop(action, None)
+                if sent is not None:
+                    self.stats.latencies[action].append(time.perf_counter() - sent)
+
+    async def play(self, timeout: float):
+        async with websockets.connect(self.url, max_queue=None) as ws:
+            while True:
+                msg = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                if await self.handle(ws, msg):
+                    return True
+
+    async def handle(self, ws, msg: dict) -> bool:
+        """React to one server message; True once the game is over."""
+        kind = msg["type"]
+        self.acknowledge(msg)
+
+        if kind == "ping":
+            await ws.send(json.dumps({"type": "pong"}))
+        elif kind == "round_transition":
+            for event in msg["events"]:
+                if await self.handle(ws, event):
+                    return True
+            if msg.get("state"):
+                return await self.handle(ws, msg["state"])
+        elif kind == "state_sync":
+            game = msg["game"]
+            if game["phase"] == "discard":
+                await self.discard(ws, game["player_count"], msg["your_hand"])
+            elif game["phase"] == "cut" and game["current_turn_seat"] == self.seat:
+                await self.cut(ws)
+        elif kind == "phase_change":
+            if msg["phase"] == "cut" and msg["turn_seat"] == self.seat:
+                await self.cut(ws)
+        elif kind == "valid_plays":
+            if msg["cards"]:
+                await self.act(ws, "peg", card=random.choice(msg["cards"]))
+            else:
+                await self.act(ws, "go")
+        elif kind == "game_over":
+            return True
+        elif kind == "error":
+            self.stats.errors[msg.get("message", "error")] += 1
+        return False
+
+    async def cut(self, ws):
+        # Both state_sync and phase_change can announce the cut
+        if "cut" not in self.pending:
+            await self.act(ws, "cut")
+
+    async def discard(self, ws, player_count: int, hand: list[str]):
+        count = 2 if player_count == 2 else 1
+        if len(hand) == 4 + count:
+            await self.act(ws, "discard", cards=random.sample(hand, count))
+
+
+async def run_table(base_url: str, players: int, auto_go: bool, think: float, timeout: float, stats: Stats):
+    try:
+        created = await asyncio.to_thread(
+            _post, base_url, "/api/games",
+            {"player_count": players, "player_name": "bot0", "auto_go": auto_go},
+        )
+        code = created["game_code"]
+        seats = [created]
+        for i in range(1, players):
+            seats.append(await asyncio.to_thread(
+                _post, base_url, f"/api/games/{code}/join", {"player_name": f"bot{i}"}
+            ))
+    except Exception as e:
+        stats.errors[f"http {type(e).__name__}"] += 1
+        return
+
+    ws_url = base_url.replace("http", "ws", 1) + f"/ws/{code}"
+    bots = [Seat(ws_url, s["session_token"], s["seat"], think, stats) for s in seats]
+    results = await asyncio.gather(
+        *(bot.play(timeout) for bot in bots), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            stats.errors[f"socket {type(result).__name__}"] += 1
+    if any(r is True for r in results):
+        stats.games_finished += 1
+
+
+async def run(
+    base_url: str, tables: int, players: int, auto_go: bool, ramp: float, think: float, timeout: float
+) -> Stats:
+    stats = Stats()
+    tasks = []
+    start = time.perf_counter()
+    for i in range(tables):
+        tasks.append(asyncio.create_task(run_table(base_url, players, auto_go, think, timeout, stats)))
+        # Start tables at a steady rate rather than all at once
+        delay = start + (i + 1) / ramp - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await asyncio.gather(*tasks)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def spawn_server(**overrides: str):
+    """Run uvicorn on a free port with databases in a temp directory.
+
+    Keyword arguments are extra environment variables for the server.
+    """
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            CRIBBAGE_DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/load.db",
+            CRIBBAGE_ARCHIVE_DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/archive.db",
+            CRIBBAGE_ARCHIVE_ENABLED="false",
+            # Bots answer every frame at once, faster than any player could
+            CRIBBAGE_WS_RATE_LIMIT="1000",
+            CRIBBAGE_WS_RATE_BURST="1000",
+            **overrides,
+        )
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(100):
+                try:
+                    urllib.request.urlopen(base_url + "/api/health", timeout=1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("server did not start")
+            yield base_url
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base URL of a running server")
+    target.add_argument("--spawn", action="store_true", help="start a local server")
+    parser.add_argument("--tables", type=int, default=20, help="games to play")
+    parser.add_argument("--players", type=int, default=2, choices=(2, 3, 4))
+    parser.add_argument("--manual-go", action="store_true", help="make players send their own Go")
+    parser.add_argument("--ramp", type=float, default=5.0, help="new tables per second")
+    parser.add_argument("--think", type=float, default=0.0, help="think time per action, ms")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for any frame")
+    parser.add_argument("--memory", action="store_true", help="spawned server keeps its databases in memory")
+    args = parser.parse_args()
+
+    def go(base_url: str):
+        stats = asyncio.run(run(
+            base_url.rstrip("/"), args.tables, args.players, not args.manual_go, args.ramp,
+            args.think / 1000, args.timeout,
+        ))
+        print(stats.report())
+
+    if args.spawn:
+        overrides = {"CRIBBAGE_DATABASE_IN_MEMORY": "true"} if args.memory else {}
+        with spawn_server(**overrides) as base_url:
+            go(base_url)
+    else:
+        go(args.url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Race duplicate actions against a server and check every game still adds up.
+
+    python -m backend.tools.stress_actions --tables 20 --players 3 --sockets 3
+
+Every player opens --sockets WebSockets with the same session token and
+sends each action on all of them at once, so the server sees the same
+discard, cut, peg or Go several times concurrently. Exactly one copy may
+win. Once the games are over, every finished game is pulled from the
+NDJSON export and checked:
+
+- each round's crib is exactly the cards discarded into it
+- every card is dealt once and pegged once
+- the peg points recorded per hand match a replay of the peg history
+- each player's score is their pegging, hands, cribs and His Heels
+
+Violations are printed and the exit status is 1. Runs against a spawned
+server on throwaway databases (see backend.tools.loadtest); pass
+--group-commit to race through the group-commit writer instead.
+"""
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import sys
+import urllib.request
+from collections import Counter, defaultdict
+
+import websockets
+
+from ..game_logic import pegging
+from .loadtest import Seat, Stats, _post, spawn_server
+
+
+class RacingSeat(Seat):
+    """A Seat that sends every action on several sockets at once.
+
+    Only the last socket to connect receives the game's broadcasts; the
+    others just send and collect the errors for their losing copies.
+    """
+
+    def __init__(self, *args, sockets: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sockets = sockets
+        self.extra: list = []
+        self.rejected: Counter = Counter()
+
+    async def act(self, ws, action: str, **payload):
+        await super().act(ws, action, **payload)
+        frame = json.dumps({"type": action, **payload})
+        await asyncio.gather(*(extra.send(frame) for extra in self.extra))
+
+    async def play(self, timeout: float):
+        for _ in range(self.sockets - 1):
+            self.extra.append(await websockets.connect(self.url, max_queue=None))
+        drains = [asyncio.create_task(self.drain(extra)) for extra in self.extra]
+        try:
+            return await super().play(timeout)
+        finally:
+            for extra in self.extra:
+                await extra.close()
+            await asyncio.gather(*drains, return_exceptions=True)
+
+    async def drain(self, ws):
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg["type"] == "error":
+                self.rejected[msg["message"]] += 1
+
+
+async def race_table(base_url: str, players: int, sockets: int, timeout: float, stats: Stats) -> list[RacingSeat]:
+    created = await asyncio.to_thread(
+        _post, base_url, "/api/games",
+        {"player_count": players, "player_name": "racer0", "auto_go": False},
+    )
+    code = created["game_code"]
+    seats = [created]
+    for i in range(1, players):
+        seats.append(await asyncio.to_thread(
+            _post, base_url, f"/api/games/{code}/join", {"player_name": f"racer{i}"}
+        ))
+    ws_url = base_url.replace("http", "ws", 1) + f"/ws/{code}"
+    bots = [
+        RacingSeat(ws_url, s["session_token"], s["seat"], 0.0, stats, sockets=sockets)
+        for s in seats
+    ]
+    results = await asyncio.gather(*(bot.play(timeout) for bot in bots), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            stats.errors[f"socket {type(result).__name__}"] += 1
+    if any(r is True for r in results):
+        stats.games_finished += 1
+    return bots
+
+
+def check_game(game: dict, rounds: list[dict]) -> list[str]:
+    problems = []
+    code = game["code"]
+    expected = defaultdict(int)
+    for rnd in rounds:
+        where = f"{code} round {rnd['round_number']}"
+        discards = Counter(c for h in rnd["hands"] for c in h["discarded"])
+        if Counter(rnd["crib"]) != discards:
+            problems.append(f"{where}: crib {rnd['crib']} is not the discards {sorted(discards)}")
+
+        dealt = [c for h in rnd["hands"] for c in h["dealt"]]
+        if len(set(dealt)) != len(dealt) or rnd["cut_card"] in dealt:
+            problems.append(f"{where}: a card was dealt twice")
+
+        played = [e["card"] for e in rnd["pegging"] if "card" in e]
+        if len(set(played)) != len(played):
+            problems.append(f"{where}: a card was pegged twice: {played}")
+        complete = len(played) == 4 * len(rnd["hands"])
+
+        replayed = pegging.replay_peg_points(rnd["pegging"], complete)
+        for hand in rnd["hands"]:
+            seat = hand["seat"]
+            if hand["peg_points"] != replayed.get(seat, 0):
+                problems.append(
+                    f"{where}: seat {seat} has {hand['peg_points']} peg points, "
+                    f"its peg history gives {replayed.get(seat, 0)}"
+                )
+            expected[seat] += hand["peg_points"] + (hand["hand_score"] or 0)
+        expected[rnd["dealer_seat"]] += rnd["crib_score"] or 0
+        if rnd["cut_card"] and rnd["cut_card"][0] == "J":
+            expected[rnd["dealer_seat"]] += 2
+
+    for player in game["players"]:
+        if player["score"] != expected[player["seat"]]:
+            problems.append(
+                f"{code}: seat {player['seat']} scored {player['score']}, "
+                f"its rounds add up to {expected[player['seat']]}"
+            )
+    return problems
+
+
+def check_export(base_url: str, admin_token: str) -> tuple[int, list[str]]:
+    games: dict[str, tuple[dict, list]] = {}
+    req = urllib.request.Request(
+        base_url + "/api/games/export", headers={"X-Admin-Token": admin_token}
+    )
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        for line in resp:
+            record = json.loads(line)
+            if record["type"] == "game":
+                games[record["code"]] = (record, [])
+            else:
+                games[record["code"]][1].append(record)
+    problems = []
+    for game, rounds in games.values():
+        problems.extend(check_game(game, rounds))
+    return len(games), problems
+
+
+def conflicts_retried(base_url: str) -> int:
+    with urllib.request.urlopen(base_url + "/metrics", timeout=10) as resp:
+        text = resp.read().decode()
+    return int(sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line.startswith("cribbage_action_conflicts_total")
+    ))
+
+
+async def race(base_url: str, tables: int, players: int, sockets: int, timeout: float):
+    stats = Stats()
+    results = await asyncio.gather(
+        *(race_table(base_url, players, sockets, timeout, stats) for _ in range(tables)),
+        return_exceptions=True,
+    )
+    rejected: Counter = Counter()
+    for result in results:
+        if isinstance(result, BaseException):
+            stats.errors[f"table {type(result).__name__}"] += 1
+            continue
+        for bot in result:
+            rejected.update(bot.rejected)
+    return stats, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--players", type=int, default=2, choices=(2, 3, 4))
+    parser.add_argument("--sockets", type=int, default=2, help="sockets per player sending each action")
+    parser.add_argument("--timeout", type=float, default=15.0, help="seconds to wait for any frame")
+    parser.add_argument("--group-commit", action="store_true")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    # The bulk export is an admin endpoint
+    admin_token = secrets.token_hex(16)
+    overrides = {
+        "CRIBBAGE_GROUP_COMMIT_ENABLED": "true" if args.group_commit else "false",
+        "CRIBBAGE_ADMIN_TOKEN": admin_token,
+    }
+    with spawn_server(**overrides) as base_url:
+        stats, rejected = asyncio.run(
+            race(base_url, args.tables, args.players, args.sockets, args.timeout)
+        )
+        checked, problems = check_export(base_url, admin_token)
+        retried = conflicts_retried(base_url)
+
+    print(f"games finished: {stats.games_finished}/{args.tables}")
+    print(f"actions: {stats.actions} x {args.sockets} sockets, conflicts retried: {retried}")
+    for message, n in rejected.most_common():
+        print(f"duplicate rejected ({message}): {n}")
+    for kind, n in sorted(stats.errors.items()):
+        print(f"error {kind}: {n}")
+    print(f"games checked: {checked}, invariant violations: {len(problems)}")
+    for problem in problems:
+        print(f"  {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
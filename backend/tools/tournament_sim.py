@@ -0,0 +1,154 @@
+"""Provision tables in bulk and play tournaments through to a champion.
+
+    python -m backend.tools.tournament_sim --provision 1000
+    python -m backend.tools.tournament_sim --entrants 16 --table-size 2
+
+--provision N times POST /api/admin/tables creating N two-seat tables in
+one request, then GET /api/games/{code} on a sample of them. --entrants
+starts a tournament and has one bot per entrant play every table it is
+seated at, following the server's tournament_table pushes from one table
+to the next; it reports each round's tables and the champion, and exits 1
+if the tournament does not finish with exactly one winner. Runs against a
+spawned server on throwaway databases (see backend.tools.loadtest).
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import urllib.request
+
+import websockets
+
+from .loadtest import Seat, Stats, spawn_server
+
+ADMIN_TOKEN = "tournament-sim"
+
+
+def _admin(base_url: str, method: str, path: str, body: dict | None = None):
+    req = urllib.request.Request(
+        base_url + path,
+        method=method,
+        data=json.dumps(body).encode() if body is not None else None,
+        headers={"Content-Type": "application/json", "X-Admin-Token": ADMIN_TOKEN},
+    )
+    with urllib.request.urlopen(req, timeout=300) as resp:
+        return json.loads(resp.read())
+
+
+class EntrantSeat(Seat):
+    """Plays one entrant's tables until they are knocked out or win."""
+
+    def __init__(self, ws_base: str, game_code: str, session_token: str, think: float, stats: Stats):
+        super().__init__("", session_token, 0, think, stats)
+        self.ws_base = ws_base
+        self.game_code = game_code
+        self.session_token = session_token
+        self.tables: list[str] = []
+        self.won = False
+        self.champion = False
+
+    async def handle(self, ws, msg: dict) -> bool:
+        if msg["type"] == "state_sync" and msg.get("your_seat") is not None:
+            self.seat = msg["your_seat"]
+        if msg["type"] == "game_over":
+            self.won = msg["winner_seat"] == self.seat
+        return await super().handle(ws, msg)
+
+    async def run(self, timeout: float):
+        while self.game_code:
+            self.tables.append(self.game_code)
+            self.url = f"{self.ws_base}/ws/{self.game_code}?session_token={self.session_token}"
+            self.game_code = None
+            async with websockets.connect(self.url, max_queue=None) as ws:
+                while not await self.handle(ws, json.loads(await asyncio.wait_for(ws.recv(), timeout))):
+                    pass
+                if not self.won:
+                    return
+                # Winners stay on their last socket until they are seated again
+                while True:
+                    msg = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                    if msg["type"] == "ping":
+                        await ws.send(json.dumps({"type": "pong"}))
+                    elif msg["type"] == "tournament_table":
+                        self.game_code = msg["game_code"]
+                        self.session_token = msg["session_token"]
+                        break
+                    elif msg["type"] == "tournament_over":
+                        self.champion = True
+                        return
+
+
+def provision(base_url: str, tables: int) -> None:
+    seatings = [[f"p{i}a", f"p{i}b"] for i in range(tables)]
+    start = time.perf_counter()
+    created = _admin(base_url, "POST", "/api/admin/tables", {"tables": seatings})
+    elapsed = time.perf_counter() - start
+    print(f"created {len(created)} tables ({2 * len(created)} seats) in {elapsed * 1000:.0f} ms")
+    sample = random.sample(created, min(20, len(created)))
+    for table in sample:
+        with urllib.request.urlopen(f"{base_url}/api/games/{table['game_code']}", timeout=10) as resp:
+            info = json.loads(resp.read())
+        assert info["current_phase"] == "discard", info
+    print(f"sampled {len(sample)} tables: all dealt and in discard")
+
+
+async def play_tournament(base_url: str, entrants: int, table_size: int, think: float, timeout: float):
+    created = await asyncio.to_thread(
+        _admin, base_url, "POST", "/api/admin/tournaments",
+        {"name": "sim", "players": [f"e{i}" for i in range(entrants)], "table_size": table_size},
+    )
+    stats = Stats()
+    ws_base = base_url.replace("http", "ws", 1)
+    bots = [
+        EntrantSeat(ws_base, e["game_code"], e["session_token"], think, stats)
+        for e in created["entries"]
+    ]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(bot.run(timeout) for bot in bots), return_exceptions=True)
+    stats.elapsed = time.perf_counter() - start
+    for result in results:
+        if isinstance(result, BaseException):
+            stats.errors[f"socket {type(result).__name__}"] += 1
+    info = await asyncio.to_thread(_admin, base_url, "GET", f"/api/tournaments/{created['code']}")
+    return info, bots, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provision", type=int, default=0, help="tables to create in one request")
+    parser.add_argument("--entrants", type=int, default=0, help="tournament entrants to play out")
+    parser.add_argument("--table-size", type=int, default=2, choices=(2, 3))
+    parser.add_argument("--think", type=float, default=0.0, help="think time per action, ms")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for any frame")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    ok = True
+    with spawn_server(CRIBBAGE_ADMIN_TOKEN=ADMIN_TOKEN) as base_url:
+        if args.provision:
+            provision(base_url, args.provision)
+        if args.entrants:
+            info, bots, stats = asyncio.run(play_tournament(
+                base_url, args.entrants, args.table_size, args.think / 1000, args.timeout
+            ))
+            rounds: dict[int, int] = {}
+            for table in info["tables"]:
+                rounds[table["round"]] = rounds.get(table["round"], 0) + 1
+            for number, count in sorted(rounds.items()):
+                print(f"round {number}: {count} tables")
+            champions = [bot for bot in bots if bot.champion]
+            print(f"status: {info['status']}, winner: {info['winner_name']}, "
+                  f"remaining: {info['remaining']}/{info['entrants']}")
+            print(f"played in {stats.elapsed:.1f}s, {stats.actions} actions, "
+                  f"longest run: {max(len(bot.tables) for bot in bots)} tables")
+            for kind, n in sorted(stats.errors.items()):
+                print(f"error {kind}: {n}")
+            ok = info["status"] == "finished" and info["remaining"] == 1 and len(champions) == 1
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,13 @@ interface ScoreResult {
     flush: number;
     nobs: number;
     total: number;
+    groups?: {
+      fifteens: string[][];
+      pairs: string[][];
+      runs: string[][];
+      flush: string[];
+      nobs: string[];
+    };
   };
   new_total: number;
   is_crib?: boolean;
@@ -120,19 +127,27 @@ export default function ScoringOverlay({
                   transition={{ delay: index * 0.15 + 0.4 }}
                 >
                   {result.score.fifteens > 0 && (
-                    <ScoreRow label="Fifteens" value={result.score.fifteens} />
+                    <ScoreRow label="Fifteens" value={result.score.fifteens} groups={result.score.groups?.fifteens} />
                   )}
                   {result.score.pairs > 0 && (
-                    <ScoreRow label="Pairs" value={result.score.pairs} />
+                    <ScoreRow label="Pairs" value={result.score.pairs} groups={result.score.groups?.pairs} />
                   )}
                   {result.score.runs > 0 && (
-                    <ScoreRow label="Runs" value={result.score.runs} />
+                    <ScoreRow label="Runs" value={result.score.runs} groups={result.score.groups?.runs} />
                   )}
                   {result.score.flush > 0 && (
-                    <ScoreRow label="Flush" value={result.score.flush} />
+                    <ScoreRow
+                      label="Flush"
+                      value={result.score.flush}
+                      groups={result.score.groups && [result.score.groups.flush]}
+                    />
                   )}
                   {result.score.nobs > 0 && (
-                    <ScoreRow label="Nobs" value={result.score.nobs} />
+                    <ScoreRow
+                      label="Nobs"
+                      value={result.score.nobs}
+                      groups={result.score.groups && [result.score.groups.nobs]}
+                    />
                   )}
                 </motion.div>
 
@@ -174,11 +189,26 @@ export default function ScoringOverlay({
   );
 }
 
-function ScoreRow({ label, value }: { label: string; value: number }) {
+function ScoreRow({
+  label,
+  value,
+  groups,
+}: {
+  label: string;
+  value: number;
+  groups?: string[][];
+}) {
   return (
-    <div className="flex justify-between">
-      <span className="text-slate-400">{label}:</span>
-      <span className="text-white font-medium">{value}</span>
+    <div className="col-span-2">
+      <div className="flex justify-between">
+        <span className="text-slate-400">{label}:</span>
+        <span className="text-white font-medium">{value}</span>
+      </div>
+      {groups && groups.length > 0 && (
+        <div className="text-xs text-slate-500">
+          {groups.map((group) => group.join(' ')).join(' · ')}
+        </div>
+      )}
     </div>
   );
 }
@@ -1,4 +1,5 @@
 import { createContext, useContext, useEffect, useRef, useState, useCallback } from "react";
+import { saveSession } from "./useGameApi";
 
 export interface PlayerState {
   id: string;
@@ -19,7 +20,11 @@ export interface ScoreResult {
   player_seat: number;
   player_name: string;
   cards: string[];
-  score: { fifteens: number; pairs: number; runs: number; flush: number; nobs: number; total: number };
+  score: {
+    fifteens: number; pairs: number; runs: number; flush: number; nobs: number; total: number;
+    // The cards behind each category's points
+    groups?: Record<"fifteens" | "pairs" | "runs", string[][]> & Record<"flush" | "nobs", string[]>;
+  };
   new_total: number;
   is_crib?: boolean;
 }
@@ -39,6 +44,8 @@ export interface GameState {
   winner?: { seat: number; name: string };
   // Track total cards played per seat (doesn't reset on 31)
   cardsPlayedPerSeat: Record<number, number>;
+  // Tournament table this player was moved on to after winning
+  nextTable?: string;
 }
 
 export interface LocalPlayerState {
@@ -56,6 +63,9 @@ interface GameSocketContextValue {
   error: string | null;
 }
 
+// Close code the server uses when it hibernates an idle game
+const HIBERNATED = 4003;
+
 export const GameSocketContext = createContext<GameSocketContextValue | null>(null);
 
 export function useGameSocketConnection(
@@ -68,9 +78,16 @@ export function useGameSocketConnection(
   const [playerState, setPlayerState] = useState<LocalPlayerState | null>(null);
   const [error, setError] = useState<string | null>(null);
   const reconnectTimeoutRef = useRef<number>();
+  // Delay the server asked for before it restarted, in ms
+  const reconnectAfterRef = useRef<number | null>(null);
+  // Set when the server hibernated the idle game; we reconnect on next use
+  const hibernatedRef = useRef(false);
+  const pendingRef = useRef<object[]>([]);
 
   const connect = useCallback(() => {
-    if (wsRef.current?.readyState === WebSocket.OPEN) return;
+    const state = wsRef.current?.readyState;
+    if (state === WebSocket.OPEN || state === WebSocket.CONNECTING) return;
+    hibernatedRef.current = false;
 
     const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
     const ws = new WebSocket(
@@ -80,14 +97,23 @@ export function useGameSocketConnection(
     ws.onopen = () => {
       setConnected(true);
       setError(null);
+      for (const message of pendingRef.current.splice(0)) {
+        ws.send(JSON.stringify(message));
+      }
     };
 
-    ws.onclose = () => {
+    ws.onclose = (event) => {
       setConnected(false);
-      // Attempt reconnect after 2 seconds
+      if (event.code === HIBERNATED) {
+        hibernatedRef.current = true;
+        return;
+      }
+      // Attempt reconnect after 2 seconds, or when a restarting server said to
+      const delay = reconnectAfterRef.current ?? 2000;
+      reconnectAfterRef.current = null;
       reconnectTimeoutRef.current = window.setTimeout(() => {
         connect();
-      }, 2000);
+      }, delay);
     };
 
     ws.onerror = () => {
@@ -97,6 +123,14 @@ export function useGameSocketConnection(
     ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
+        if (data.type === "ping") {
+          ws.send(JSON.stringify({ type: "pong" }));
+          return;
+        }
+        if (data.type === "server_restart") {
+          reconnectAfterRef.current = data.reconnect_after;
+          return;
+        }
         handleMessage(data);
       } catch {
         console.error("Failed to parse WebSocket message");
@@ -129,6 +163,14 @@ export function useGameSocketConnection(
         break;
       }
 
+      case "round_transition":
+        // End-of-round events and the next deal, batched into one frame
+        (msg.events as Record<string, unknown>[]).forEach(handleMessage);
+        if (msg.state) {
+          handleMessage(msg.state as Record<string, unknown>);
+        }
+        break;
+
       case "your_hand":
         setPlayerState((prev) =>
           prev ? { ...prev, hand: msg.cards as string[] } : null
@@ -275,8 +317,19 @@ export function useGameSocketConnection(
         );
         break;
 
+      case "tournament_table":
+        saveSession(msg.game_code as string, msg.session_token as string);
+        setGameState((prev) =>
+          prev ? { ...prev, nextTable: msg.game_code as string } : null
+        );
+        break;
+
       case "error":
         setError(msg.message as string);
+        // The game moved on under the action; refresh before the retry
+        if (msg.retriable && wsRef.current?.readyState === WebSocket.OPEN) {
+          wsRef.current.send(JSON.stringify({ type: "sync" }));
+        }
         break;
     }
   }, []);
@@ -284,12 +337,25 @@ export function useGameSocketConnection(
   const send = useCallback((message: object) => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
       wsRef.current.send(JSON.stringify(message));
+    } else if (hibernatedRef.current) {
+      pendingRef.current.push(message);
+      connect();
     }
-  }, []);
+  }, [connect]);
 
   useEffect(() => {
     connect();
+    // Wake a hibernated game when the player comes back to the tab
+    const wake = () => {
+      if (hibernatedRef.current && document.visibilityState === "visible") {
+        connect();
+      }
+    };
+    document.addEventListener("visibilitychange", wake);
+    window.addEventListener("focus", wake);
     return () => {
+      document.removeEventListener("visibilitychange", wake);
+      window.removeEventListener("focus", wake);
       if (reconnectTimeoutRef.current) {
         clearTimeout(reconnectTimeoutRef.current);
       }
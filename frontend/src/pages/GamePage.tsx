@@ -268,7 +268,7 @@ function GameView({ gameState, playerState, send, error }: GameViewProps) {
   };
 
   const handlePlayAgain = () => {
-    navigate("/");
+    navigate(gameState.nextTable ? `/game/${gameState.nextTable}` : "/");
   };
 
   // Reset selection when phase changes